@@ -11,6 +11,9 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from TestQuiz.staticfiles import ASGIPrecompressedStaticFiles
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TestQuiz.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
-application = get_asgi_application()
+application = ASGIPrecompressedStaticFiles(get_asgi_application())
@@ -0,0 +1,61 @@
+"""
+Database configuration layer.
+
+    * ``configure_sqlite_connection`` applies the SQLITE_PRAGMAS to every new SQLite connection
+      (connected to the ``connection_created`` signal in ``QuizappConfig.ready``);
+    * ``ReadReplicaRouter`` sends the reads of the quiz and cards models to the ``replica`` database
+      while a read-only view is being processed (see ``quizapp.mixins.ReadReplicaMixin``).
+      Without the ``replica`` database all queries go to ``default``.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+REPLICA_ALIAS = 'replica'
+
+#: the apps whose models may be read from the replica
+REPLICA_APPS = {'quizapp', 'cards_app'}
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Applies the SQLITE_PRAGMAS to a new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+    logger.debug('SQLite pragmas applied to the "%s" connection', connection.alias)
+
+
+@contextmanager
+def read_from_replica():
+    """Within the block, the reads of the REPLICA_APPS models are routed to the replica."""
+    token = replica_reads.set(True)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ReadReplicaRouter:
+    """Routes the reads of read-only views to the replica database; all writes go to ``default``."""
+
+    def db_for_read(self, model, **hints):
+        """Returns the replica alias inside ``read_from_replica`` blocks (if the replica is configured)."""
+        if replica_reads.get() and model._meta.app_label in REPLICA_APPS and REPLICA_ALIAS in settings.DATABASES:
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        """Writes always go to the default database."""
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """The replica contains the same data, so relations between the databases are allowed."""
+        return True
@@ -0,0 +1,90 @@
+"""
+Logging pipeline helpers used by the LOGGING setting.
+
+    * ``QueueListenerHandler``: the only handler attached to the loggers; it puts records into a queue,
+      and a ``QueueListener`` thread passes them to the real (console, file) handlers,
+      so logging calls in views do not wait for disk I/O;
+    * ``JsonFormatter``: one JSON object per line for the log files.
+
+The records are queued with their exception already formatted into ``exc_text`` (separately from
+the message), so the handlers format the message and the traceback their own way.
+"""
+import atexit
+import copy
+import json
+import logging
+from logging.config import ConvertingList
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+#: formats the exceptions of the queued records
+exception_formatter = logging.Formatter()
+
+
+def resolve_handlers(handlers):
+    """Returns the handler objects for the ``cfg://handlers.<name>`` references from the logging config
+    (the referenced handlers are created by dictConfig first, as their names sort before ``queue``)."""
+    if not isinstance(handlers, ConvertingList):
+        return handlers
+    return [handlers[index] for index in range(len(handlers))]
+
+
+class QueueListenerHandler(QueueHandler):
+    """Puts log records into a queue that is processed by the handlers in a background thread.
+
+    Args:
+
+        * handlers(list): the handlers that actually emit the records;
+        * respect_handler_level(bool): the listener checks the level of each handler;
+
+    """
+
+    def __init__(self, handlers, respect_handler_level=True):
+        super().__init__(SimpleQueue())
+        self.listener = QueueListener(self.queue, *resolve_handlers(handlers),
+                                      respect_handler_level=respect_handler_level)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def prepare(self, record):
+        """Returns a copy of the record for the queue: the message is merged with its arguments,
+        the exception is formatted into ``exc_text`` and the traceback objects are dropped
+        (unlike ``QueueHandler.prepare``, the traceback is not merged into the message)."""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def stop(self):
+        """Processes the records left in the queue and stops the listener thread."""
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        """Stops the listener when the handler is closed (e.g. on logging reconfiguration)."""
+        self.stop()
+        super().close()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a log record as a JSON object (without colors) for the log files."""
+
+    def format(self, record):
+        """Returns a JSON line with the time, level, logger name, message and exception of the record."""
+        entry = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False)
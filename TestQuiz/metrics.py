@@ -0,0 +1,272 @@
+"""
+Per-view latency and query metrics.
+
+``MetricsMiddleware`` records for every resolved URL name (``index``, ``questions:test_body``,
+``cards:cards_list``, ...) the request latency histogram, the number and the time of SQL queries
+and the response size. The queries are counted by ``count_queries``, the execute wrapper installed on every
+database connection; it adds them to the counter of the current request kept in a context variable,
+so the queries of async views run in worker threads are counted too.
+
+The numbers are aggregated in the memory of the process. Every METRICS_FLUSH_INTERVAL seconds
+a daemon thread of the process writes its snapshot to a JSON file in METRICS_DIR, and ``metrics_view`` merges
+the snapshots of all worker processes and returns them in the Prometheus text format. The snapshots
+of the exited processes (and the ones not written for STALE_FLUSH_INTERVALS intervals) are deleted.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.decorators import user_passes_test
+from django.http import HttpResponse
+
+#: upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+UNRESOLVED_VIEW = 'unresolved'
+
+COUNTERS = ('count', 'latency_sum', 'queries', 'query_time', 'response_bytes')
+
+#: a snapshot not rewritten for this number of flush intervals belongs to a stopped process
+STALE_FLUSH_INTERVALS = 3
+
+logger = logging.getLogger(__name__)
+
+
+def empty_metrics():
+    """Returns the initial metrics of a view."""
+    return {'count': 0, 'latency_sum': 0.0, 'buckets': [0] * len(LATENCY_BUCKETS),
+            'queries': 0, 'query_time': 0.0, 'response_bytes': 0}
+
+
+class QueryCounter:
+    """Counts the number and the total time of the queries executed within the ``execute_wrapper``."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - started
+
+
+current_counter = ContextVar('metrics_query_counter', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    """Execute wrapper that adds the query to the counter of the current request (if any)."""
+    counter = current_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """Adds ``count_queries`` to a new database connection (connected to the ``connection_created`` signal).
+    The wrapper goes first, so the ``execute_wrapper`` blocks that pop the last wrapper keep it."""
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_queries)
+
+
+class MetricsRegistry:
+    """Metrics of the current process: view name => counters and latency histogram."""
+
+    def __init__(self):
+        self.views = {}
+        self.lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.flusher_pid = None
+
+    def observe(self, view, latency, queries, query_time, response_bytes):
+        """Adds the measurements of one request to the metrics of the view."""
+        with self.lock:
+            metrics = self.views.get(view)
+            if metrics is None:
+                metrics = self.views[view] = empty_metrics()
+            metrics['count'] += 1
+            metrics['latency_sum'] += latency
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    metrics['buckets'][index] += 1
+            metrics['queries'] += queries
+            metrics['query_time'] += query_time
+            metrics['response_bytes'] += response_bytes
+
+    def snapshot(self):
+        """Returns a copy of the metrics."""
+        with self.lock:
+            return json.loads(json.dumps(self.views))
+
+    def start_flusher(self):
+        """Starts the thread that writes the snapshot to METRICS_DIR (once per process, also after a fork)."""
+        if self.flusher_pid == os.getpid() or not settings.METRICS_DIR:
+            return
+        with self.start_lock:
+            if self.flusher_pid != os.getpid():
+                self.flusher_pid = os.getpid()
+                threading.Thread(target=self.run_flusher, name='metrics-flusher', daemon=True).start()
+
+    def run_flusher(self):
+        """Writes the snapshot every METRICS_FLUSH_INTERVAL seconds (also when the process is idle,
+        so that its snapshot does not look stale)."""
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError as err:
+                logger.error('Failed to write the metrics snapshot: %s', err)
+
+    def flush(self):
+        """Writes the snapshot of the process to METRICS_DIR."""
+        metrics_dir = Path(settings.METRICS_DIR)
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = metrics_dir / f'.metrics-{os.getpid()}.tmp'
+        tmp_path.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp_path, metrics_dir / f'metrics-{os.getpid()}.json')
+
+
+registry = MetricsRegistry()
+
+
+def process_exists(pid):
+    """Checks whether the process with the pid is running (always True where it can not be checked)."""
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def snapshot_is_stale(path):
+    """Checks whether the snapshot file belongs to an exited process or has not been rewritten
+    for STALE_FLUSH_INTERVALS flush intervals."""
+    pid = int(path.stem.rpartition('-')[2])
+    max_age = STALE_FLUSH_INTERVALS * settings.METRICS_FLUSH_INTERVAL
+    return not process_exists(pid) or time.time() - path.stat().st_mtime > max_age
+
+
+def collect_metrics():
+    """Merges the snapshots of all running processes (the current process is taken from memory).
+    The stale snapshots are deleted."""
+    snapshots = [registry.snapshot()]
+    if settings.METRICS_DIR and Path(settings.METRICS_DIR).is_dir():
+        own_file = f'metrics-{os.getpid()}.json'
+        for path in Path(settings.METRICS_DIR).glob('metrics-*.json'):
+            if path.name == own_file:
+                continue
+            try:
+                if snapshot_is_stale(path):
+                    path.unlink(missing_ok=True)
+                    continue
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+
+    merged = {}
+    for snapshot in snapshots:
+        for view, metrics in snapshot.items():
+            total = merged.setdefault(view, empty_metrics())
+            for key in COUNTERS:
+                total[key] += metrics[key]
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], metrics['buckets'])]
+    return merged
+
+
+def prometheus_text(metrics):
+    """Formats the metrics in the Prometheus text exposition format."""
+    lines = [
+        '# HELP django_view_latency_seconds Request latency by view.',
+        '# TYPE django_view_latency_seconds histogram',
+    ]
+    for view, values in sorted(metrics.items()):
+        label = f'view="{view}"'
+        for bound, count in zip(LATENCY_BUCKETS, values['buckets']):
+            lines.append(f'django_view_latency_seconds_bucket{{{label},le="{bound}"}} {count}')
+        lines.append(f'django_view_latency_seconds_bucket{{{label},le="+Inf"}} {values["count"]}')
+        lines.append(f'django_view_latency_seconds_sum{{{label}}} {values["latency_sum"]:.6f}')
+        lines.append(f'django_view_latency_seconds_count{{{label}}} {values["count"]}')
+
+    counters = (
+        ('django_view_queries_total', 'SQL queries executed by view.', 'queries', '{}'),
+        ('django_view_query_seconds_total', 'Time spent in SQL queries by view.', 'query_time', '{:.6f}'),
+        ('django_view_response_bytes_total', 'Response body size by view.', 'response_bytes', '{}'),
+    )
+    for name, description, key, value_format in counters:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        for view, values in sorted(metrics.items()):
+            lines.append(f'{name}{{view="{view}"}} {value_format.format(values[key])}')
+    return '\n'.join(lines) + '\n'
+
+
+def view_name(request):
+    """Returns the URL name of the request with its application namespaces (e.g. ``cards:cards_list``)."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.url_name:
+        return UNRESOLVED_VIEW
+    return ':'.join([*match.app_names, match.url_name])
+
+
+class MetricsMiddleware:
+    """Measures the latency, the SQL queries and the response size of every request.
+    Supports both sync and async request handling, so async views are not run through a thread."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # marks the instance as a coroutine function for the handler, as Django's MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        counter = QueryCounter()
+        token = current_counter.set(counter)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_counter.reset(token)
+        self.observe(request, response, time.perf_counter() - started, counter)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        token = current_counter.set(counter)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_counter.reset(token)
+        self.observe(request, response, time.perf_counter() - started, counter)
+        return response
+
+    @staticmethod
+    def observe(request, response, latency, counter):
+        """Adds the measurements of the request to the registry."""
+        response_bytes = 0 if response.streaming else len(response.content)
+        registry.observe(view_name(request), latency, counter.count, counter.time, response_bytes)
+        registry.start_flusher()
+
+
+@user_passes_test(lambda u: u.is_staff)
+def metrics_view(request):
+    """Returns the metrics of all processes in the Prometheus text format (staff only)."""
+    return HttpResponse(prometheus_text(collect_metrics()), content_type='text/plain; version=0.0.4; charset=utf-8')
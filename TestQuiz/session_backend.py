@@ -0,0 +1,282 @@
+"""
+Write-coalescing session engine.
+
+Sessions are stored in the database (``django_session``) as by the default engine,
+but the hot sessions are kept decoded in the memory of the process:
+
+    * reading a session synced with the database less than SESSION_FLUSH_INTERVAL seconds ago
+      does not query the database, an older session is read from the database again
+      (its pending changes are written first);
+    * saving a session only updates the local store and marks it dirty;
+      dirty sessions are encoded and written to the database by a background thread
+      every SESSION_FLUSH_INTERVAL seconds;
+    * creating (login) and deleting (logout) a session are written to the database immediately;
+    * expired sessions are deleted from the database in batches every SESSION_CLEANUP_INTERVAL seconds.
+
+A dirty session is written only if the row still holds the data the local copy was read from
+(a conditional UPDATE per session). If the session was deleted (logout, ``cycle_key``) or changed
+by another worker process in the meantime, the local changes are dropped and the database wins.
+So another worker process sees a logout or a change of the session at most SESSION_FLUSH_INTERVAL
+seconds later. Set SESSION_FLUSH_INTERVAL = 0 to write through.
+"""
+import atexit
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.contrib.sessions.models import Session
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CLEANUP_BATCH_SIZE = 1000
+
+
+class LocalSessionStore:
+    """Decoded sessions of the process: session key => [session data, expire date, dirty flag,
+    encoded data of the database row, time.monotonic() of the last sync with the database].
+    Clean sessions are evicted in LRU order when there are more than max_entries of them."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, session_key):
+        """Returns a copy of the session data, its expire date, the dirty flag and the time of the last sync,
+        or None if the session is not stored."""
+        with self.lock:
+            entry = self.entries.get(session_key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(session_key)
+            return copy.deepcopy(entry[0]), entry[1], entry[2], entry[4]
+
+    def put_synced(self, session_key, data, expire_date, row_data):
+        """Stores a copy of the session data that is the same as in the database row."""
+        with self.lock:
+            self.entries[session_key] = [copy.deepcopy(data), expire_date, False, row_data, time.monotonic()]
+            self.entries.move_to_end(session_key)
+            if len(self.entries) > self.max_entries:
+                self.evict()
+
+    def put_dirty(self, session_key, data, expire_date):
+        """Stores a copy of the changed session data. Returns False if the session is not stored
+        (the database row it is based on is unknown)."""
+        with self.lock:
+            entry = self.entries.get(session_key)
+            if entry is None:
+                return False
+            entry[0:3] = [copy.deepcopy(data), expire_date, True]
+            self.entries.move_to_end(session_key)
+            return True
+
+    def evict(self):
+        """Removes the least recently used clean sessions."""
+        for session_key in [key for key, entry in self.entries.items() if not entry[2]]:
+            if len(self.entries) <= self.max_entries:
+                break
+            del self.entries[session_key]
+
+    def pop(self, session_key):
+        """Removes the session from the store."""
+        with self.lock:
+            self.entries.pop(session_key, None)
+
+    def take_dirty(self, session_keys=None):
+        """Marks the dirty sessions (all or the given ones) clean and returns them as
+        (session key, data, expire date, encoded data of the row) tuples.
+        Expired sessions are removed from the store."""
+        now = timezone.now()
+        dirty = []
+        with self.lock:
+            keys = list(self.entries) if session_keys is None else session_keys
+            for session_key in keys:
+                entry = self.entries.get(session_key)
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del self.entries[session_key]
+                elif entry[2]:
+                    entry[2] = False
+                    dirty.append((session_key, copy.deepcopy(entry[0]), entry[1], entry[3]))
+        return dirty
+
+    def mark_synced(self, session_key, row_data):
+        """Records the data written to the database row of the session."""
+        with self.lock:
+            entry = self.entries.get(session_key)
+            if entry is not None:
+                entry[3], entry[4] = row_data, time.monotonic()
+
+    def mark_dirty(self, session_key):
+        """Marks the session that failed to be written dirty again."""
+        with self.lock:
+            entry = self.entries.get(session_key)
+            if entry is not None:
+                entry[2] = True
+
+
+local_store = LocalSessionStore(settings.SESSION_LOCAL_MAX_ENTRIES)
+
+
+def is_fresh(entry):
+    """Checks whether the stored session is not expired and was synced with the database
+    less than SESSION_FLUSH_INTERVAL seconds ago."""
+    return entry[1] > timezone.now() and time.monotonic() - entry[3] < settings.SESSION_FLUSH_INTERVAL
+
+
+class SessionStore(DBStore):
+    """Database-backed session store that coalesces session writes in the memory of the process."""
+
+    def load(self):
+        """Returns the session data from the local store if it is fresh, otherwise loads it from the database
+        (the pending changes of the stored session are written first)."""
+        entry = local_store.get(self._session_key) if self._session_key else None
+        if entry is not None:
+            if is_fresh(entry):
+                return entry[0]
+            if entry[2]:
+                flush_dirty_sessions([self._session_key])
+            local_store.pop(self._session_key)
+
+        session = self._get_session_from_db()
+        if session is None:
+            self._session_key = None
+            return {}
+        data = self.decode(session.session_data)
+        local_store.put_synced(session.session_key, data, session.expire_date, session.session_data)
+        return data
+
+    async def aload(self):
+        """Loads the session for an async view: a fresh session from the local store is taken
+        without a thread switch, the others are loaded from the database in a worker thread."""
+        if self._session_key is None or hasattr(self, '_session_cache'):
+            self._get_session()  # no database access
+            return
+        entry = local_store.get(self._session_key)
+        if entry is not None and is_fresh(entry):
+            self.accessed = True
+            self._session_cache = entry[0]
+            return
+        await sync_to_async(self._get_session)()
+
+    def create_model_instance(self, data):
+        """Remembers the encoded data written to the database row by ``save``."""
+        obj = super().create_model_instance(data)
+        self._row_data = obj.session_data
+        return obj
+
+    def save(self, must_create=False):
+        """Saves the session to the local store; it will be written to the database by the flush.
+        New sessions and the sessions missing in the local store are written to the database immediately."""
+        if self.session_key is None:
+            return self.create()
+        if not must_create and settings.SESSION_FLUSH_INTERVAL > 0 and \
+                local_store.put_dirty(self.session_key, self._get_session(), self.get_expiry_date()):
+            background_writer.start()
+            return
+        super().save(must_create=must_create)
+        local_store.put_synced(self.session_key, self._get_session(no_load=must_create), self.get_expiry_date(),
+                               self._row_data)
+
+    def delete(self, session_key=None):
+        """Deletes the session both from the local store and from the database."""
+        local_store.pop(session_key or self.session_key)
+        super().delete(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        """Deletes the expired sessions from the database in batches (used by ``clearsessions``)."""
+        deleted = 0
+        while True:
+            keys = list(Session.objects.filter(expire_date__lt=timezone.now()).
+                        values_list('session_key', flat=True)[:CLEANUP_BATCH_SIZE])
+            if not keys:
+                return deleted
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+
+
+def flush_dirty_sessions(session_keys=None):
+    """Writes the dirty sessions (all or the given ones) to the database in one transaction.
+    Returns the number of written sessions.
+
+    A session is written only if its row still holds the data the local copy is based on;
+    the sessions deleted or changed by another process in the meantime are dropped from the local store.
+    """
+    dirty = local_store.take_dirty(session_keys)
+    if not dirty:
+        return 0
+    encoder = SessionStore()
+    written, conflicts = [], []
+    try:
+        with transaction.atomic():
+            for session_key, data, expire_date, row_data in dirty:
+                encoded = encoder.encode(data)
+                if Session.objects.filter(session_key=session_key, session_data=row_data).update(
+                        session_data=encoded, expire_date=expire_date):
+                    written.append((session_key, encoded))
+                else:
+                    conflicts.append(session_key)
+    except DatabaseError:
+        for session_key, *_ in dirty:
+            local_store.mark_dirty(session_key)
+        raise
+    for session_key, encoded in written:
+        local_store.mark_synced(session_key, encoded)
+    for session_key in conflicts:
+        local_store.pop(session_key)
+    if conflicts:
+        logger.info('Sessions deleted or changed by another process, local changes dropped: %s', len(conflicts))
+    return len(written)
+
+
+class BackgroundWriter:
+    """A daemon thread that periodically flushes the dirty sessions and clears the expired ones."""
+
+    def __init__(self):
+        self.thread = None
+        self.lock = threading.Lock()
+        self.last_cleanup = time.monotonic()
+
+    def start(self):
+        """Starts the thread (once per process)."""
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='session-writer', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        """Flushes the sessions every SESSION_FLUSH_INTERVAL seconds."""
+        while True:
+            time.sleep(settings.SESSION_FLUSH_INTERVAL)
+            try:
+                flush_dirty_sessions()
+                if time.monotonic() - self.last_cleanup >= settings.SESSION_CLEANUP_INTERVAL:
+                    self.last_cleanup = time.monotonic()
+                    deleted = SessionStore.clear_expired()
+                    logger.info('Expired sessions deleted: %s', deleted)
+            except DatabaseError as err:
+                logger.error('Failed to flush sessions: %s', err)
+            finally:
+                connection.close()
+
+
+background_writer = BackgroundWriter()
+
+
+@atexit.register
+def flush_on_exit():
+    """Writes the dirty sessions when the process stops."""
+    try:
+        flush_dirty_sessions()
+    except Exception as err:
+        logger.error('Failed to flush sessions on exit: %s', err)
@@ -2,7 +2,6 @@
 Django settings for TestQuiz project.
 """
 import os
-from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -24,7 +23,7 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
-    'django.contrib.staticfiles',
+    'TestQuiz.staticfiles.StaticFilesConfig',
     'quizapp',
     'users',
     'cards_app',
@@ -32,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'TestQuiz.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -43,6 +43,11 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'TestQuiz.urls'
 
+# per-view metrics of every worker process are merged from this directory by the /metrics endpoint
+# (the directory belongs to this project, the snapshots of the exited processes are deleted)
+METRICS_DIR = os.getenv('METRICS_DIR', str(BASE_DIR / 'metrics'))
+METRICS_FLUSH_INTERVAL = 10
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -61,12 +66,74 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'TestQuiz.wsgi.application'
+ASGI_APPLICATION = 'TestQuiz.asgi.application'
+# the native async versions of the quiz and card views are routed (set by asgi.py)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '0') == '1'
+
+# sessions are kept in the memory of the process and written to the database in batches
+SESSION_ENGINE = 'TestQuiz.session_backend'
+SESSION_FLUSH_INTERVAL = 5
+SESSION_CLEANUP_INTERVAL = 3600
+SESSION_LOCAL_MAX_ENTRIES = 10000
+
+# seconds between the writes of the buffered per-question answer statistics
+ANSWER_STATS_FLUSH_INTERVAL = 10
+
+# spaced repetition: the number of the due questions asked in one review batch
+# and the minutes before a wrongly answered question is asked again
+REVIEW_BATCH_SIZE = 10
+REVIEW_RELEARN_DELAY = 10
+
+# the compiled question bank read by the workers through mmap (see quizapp.question_bank):
+# the file (None disables it), the seconds between the checks of the file for a new version
+# and the seconds the changes of the content are collected before the bank is recompiled
+QUESTION_BANK_PATH = BASE_DIR / 'question_bank.bin'
+QUESTION_BANK_CHECK_INTERVAL = 2
+QUESTION_BANK_COMPILE_DELAY = 1
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# a copy of the database for the read-only views (a mirror of default in tests)
+if os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('DB_REPLICA_NAME'),
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['TestQuiz.database.ReadReplicaRouter']
+
+# applied to every new SQLite connection
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # rendered page fragments and model generations (shared by the worker processes of this project,
+    # the generations are not scoped to a database, so the directory must not be shared with other instances)
+    'render': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'render',
+        'TIMEOUT': 3600,
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
 }
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -103,8 +170,17 @@ AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',
 )
 
+# login attempts limits: key type => (burst of attempts, seconds to restore one attempt)
+LOGIN_THROTTLE_RATES = {
+    'username': (5, 60),
+    'ip': (30, 10),
+}
+
 STATIC_URL = '/static/'
 STATICFILES_DIRS = (BASE_DIR / 'static',)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+# hashed names + gzip/brotli copies, built by `manage.py build_static` (collectstatic)
+STATICFILES_STORAGE = 'TestQuiz.staticfiles.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -121,8 +197,22 @@ ADMIN_USERNAME=['admin',]
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = f'{BASE_DIR}/emails'
 
-LEVEL = 'DEBUG'
+# transactional emails are queued by views and sent by the send_outbox command
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60
 
+# broadcasts to all the active users are sent by the send_broadcasts command,
+# the number of emails sent between two checkpoints of a broadcast
+BROADCAST_CHUNK_SIZE = 100
+
+LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+
+# the loggers only put records into a queue, the console and file handlers
+# are run by a listener thread (see TestQuiz.log_handlers).
+# TimedRotatingFileHandler rotates the file from the process that writes it and is not safe
+# when several processes write the same file: run several worker processes with their own
+# LOG_FILE each, or let an external tool (logrotate) rotate a shared file.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -131,43 +221,56 @@ LOGGING = {
     'formatters': {
         'colored': {
             '()': 'colorlog.ColoredFormatter',
-            'format': '%(log_color)s[%(levelname)s] %(asctime)s :: %(message)s'
+            'format': '%(log_color)s[%(levelname)s] %(asctime)s :: %(message)s',
+            # colors only if the console is a TTY
+            'stream': 'ext://sys.stderr',
+        },
+        'json': {
+            '()': 'TestQuiz.log_handlers.JsonFormatter',
         },
     },
     'handlers': {
         'console': {
             'level': LEVEL,
-            'class': 'colorlog.StreamHandler',
+            'class': 'logging.StreamHandler',
             'formatter': 'colored',
         },
         'file': {
             'level': LEVEL,
-            'class': 'logging.FileHandler',
-            'filename': f'{BASE_DIR}/TestQuiz/logging/{LEVEL}_{datetime.today().date()}.log',
-            'formatter': 'colored',
+            'class': 'logging.handlers.TimedRotatingFileHandler',
+            'filename': os.getenv('LOG_FILE', f'{BASE_DIR}/TestQuiz/logging/{LEVEL}.log'),
+            'when': 'midnight',
+            'backupCount': 30,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'json',
+        },
+        'queue': {
+            'level': LEVEL,
+            '()': 'TestQuiz.log_handlers.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console', 'cfg://handlers.file'],
         },
     },
     'loggers': {
         '': {
             'level': LEVEL,
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'propagate': False,
         },
         'django.request': {
             'level': 'WARNING',
-            'handlers': ['console', 'file']
+            'handlers': ['queue']
         },
         'django.security.*': {
             'level': 'WARNING',
-            'handlers': ['console', 'file']
+            'handlers': ['queue']
         },
         'django.security.csrf': {
             'level': 'WARNING',
-            'handlers': ['console', 'file']
+            'handlers': ['queue']
         },
         'loggers.authnapp': {
             'level': 'ERROR',
-            'handlers': ['file'],
             'propagate': True
         },
     }
@@ -0,0 +1,298 @@
+"""
+Fingerprinted, precompressed static files.
+
+    * ``StaticFilesConfig``: skips the unused variants of the vendored libraries
+      (non-minified builds, the slim jQuery, the bootstrap css replaced by ``css/auth-admin.css``) in ``collectstatic``;
+    * ``CompressedManifestStaticFilesStorage``: the hashed names of ``ManifestStaticFilesStorage``
+      plus ``.gz`` (and ``.br``, if the optional ``brotli`` package is installed) copies of the text files;
+    * ``PrecompressedStaticFiles``/``ASGIPrecompressedStaticFiles``: WSGI/ASGI wrappers of the Django application
+      serving STATIC_ROOT with ``Accept-Encoding`` negotiation and immutable cache headers for the hashed names;
+    * ``page_savings``: the bytes of the static files of every page before and after the compression
+      (reported by the ``build_static`` command).
+"""
+import asyncio
+import gzip
+import mimetypes
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import apps as staticfiles_apps, finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.contrib.staticfiles.utils import matches_patterns
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+
+try:
+    import brotli
+except ImportError:  # brotli is an optional dependency, gzip only is used without it
+    brotli = None
+
+#: the variants of the vendored libraries that are not used by the templates
+UNUSED_STATIC_VARIANTS = [
+    'bootstrap/css/*',
+    'bootstrap/js/bootstrap.js*',
+    'bootstrap/js/bootstrap.min.js*',
+    'bootstrap/js/bootstrap.bundle.js*',
+    'jquery/jquery.js',
+    'jquery/jquery.slim*',
+]
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ttf', '.eot')
+#: the compressed copy is kept only if it is smaller than this part of the original
+MIN_COMPRESSION_RATIO = 0.95
+
+#: content encoding => file suffix, in the order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=60'
+READ_CHUNK_SIZE = 1 << 16
+
+
+class StaticFilesConfig(staticfiles_apps.StaticFilesConfig):
+    """``django.contrib.staticfiles`` that does not collect the unused library variants."""
+    ignore_patterns = staticfiles_apps.StaticFilesConfig.ignore_patterns + UNUSED_STATIC_VARIANTS
+
+
+def dropped_variants_size():
+    """Returns the total size of the source static files that are not collected as unused variants."""
+    total = 0
+    for finder in finders.get_finders():
+        for path, storage in finder.list([]):
+            if matches_patterns(path, UNUSED_STATIC_VARIANTS):
+                total += storage.size(path)
+    return total
+
+
+def compress_file(path):
+    """Writes the compressed copies of the file next to it. Returns the sizes by encoding
+    (``identity`` is the original size; an encoding is missing if its copy is not worth keeping)."""
+    path = Path(path)
+    data = path.read_bytes()
+    sizes = {'identity': len(data)}
+    compressors = {'gzip': lambda raw: gzip.compress(raw, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressors['br'] = lambda raw: brotli.compress(raw, quality=11)
+    for encoding, suffix in ENCODINGS:
+        if encoding not in compressors:
+            continue
+        compressed = compressors[encoding](data)
+        target = path.with_name(path.name + suffix)
+        if len(compressed) < len(data) * MIN_COMPRESSION_RATIO:
+            target.write_bytes(compressed)
+            sizes[encoding] = len(compressed)
+        elif target.exists():
+            target.unlink()
+    return sizes
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Stores the files with the content hash in their names and compresses the text files."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(paths) | set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                compress_file(self.path(name))
+
+    def stored_name(self, name):
+        # before the first collectstatic (development, tests) the original names are used
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            if self.manifest_storage.exists(self.manifest_name):
+                raise
+            return name
+
+
+def parse_accept_encoding(header):
+    """Returns the set of the encodings accepted by the client (the encodings with ``q=0`` are excluded)."""
+    accepted = set()
+    for item in header.split(','):
+        encoding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if encoding and quality > 0:
+            accepted.add(encoding.strip().lower())
+    return accepted
+
+
+class StaticFileResolver:
+    """Finds the file of a static URL in STATIC_ROOT and the variant for the accepted encodings.
+
+    Args:
+
+        * root(str): the directory of the collected files (STATIC_ROOT);
+        * prefix(str): the URL prefix of the files (STATIC_URL);
+
+    """
+
+    def __init__(self, root, prefix):
+        self.root = Path(root).resolve()
+        self.prefix = '/' + prefix.strip('/') + '/'
+        self.files = {}
+
+    def matches(self, path):
+        return path.startswith(self.prefix)
+
+    def variants(self, name):
+        """Returns the paths of the file by encoding (the found files are cached,
+        the collected files do not change while running)."""
+        if name in self.files:
+            return self.files[name]
+        path = (self.root / name).resolve()
+        if not path.is_relative_to(self.root) or not path.is_file():
+            return {}
+        variants = {'identity': path}
+        for encoding, suffix in ENCODINGS:
+            compressed = path.with_name(path.name + suffix)
+            if compressed.is_file():
+                variants[encoding] = compressed
+        self.files[name] = variants
+        return variants
+
+    def resolve(self, path, accept_encoding):
+        """Returns the file path and the response headers for the URL path, or None if there is no such file."""
+        variants = self.variants(path[len(self.prefix):])
+        if not variants:
+            return None
+        accepted = parse_accept_encoding(accept_encoding)
+        encoding = next((encoding for encoding, _ in ENCODINGS
+                         if encoding in variants and (encoding in accepted or '*' in accepted)), 'identity')
+        file_path = variants[encoding]
+        content_type, _ = mimetypes.guess_type(variants['identity'].name)
+        if content_type is None:
+            content_type = 'application/octet-stream'
+        elif content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        headers = [
+            ('Content-Type', content_type),
+            ('Content-Length', str(file_path.stat().st_size)),
+            ('Cache-Control', IMMUTABLE_CACHE_CONTROL if HASHED_NAME_RE.search(path) else DEFAULT_CACHE_CONTROL),
+        ]
+        if len(variants) > 1:
+            headers.append(('Vary', 'Accept-Encoding'))
+        if encoding != 'identity':
+            headers.append(('Content-Encoding', encoding))
+        return file_path, headers
+
+
+class PrecompressedStaticFiles:
+    """WSGI wrapper of the application serving the collected static files; other requests
+    (and the files missing in STATIC_ROOT) are passed to the application."""
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.resolver = StaticFileResolver(root or settings.STATIC_ROOT, prefix or settings.STATIC_URL)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD') or not self.resolver.matches(path):
+            return self.application(environ, start_response)
+        found = self.resolver.resolve(path, environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if found is None:
+            return self.application(environ, start_response)
+        file_path, headers = found
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file = open(file_path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(file, READ_CHUNK_SIZE)
+        return iter_file(file)
+
+
+def iter_file(file):
+    """Yields the file content by chunks and closes the file."""
+    with file:
+        while chunk := file.read(READ_CHUNK_SIZE):
+            yield chunk
+
+
+class ASGIPrecompressedStaticFiles:
+    """ASGI wrapper of the application serving the collected static files (see ``PrecompressedStaticFiles``)."""
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.resolver = StaticFileResolver(root or settings.STATIC_ROOT, prefix or settings.STATIC_URL)
+
+    async def __call__(self, scope, receive, send):
+        if (scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD')
+                or not self.resolver.matches(scope['path'])):
+            return await self.application(scope, receive, send)
+        request_headers = dict(scope['headers'])
+        accept_encoding = request_headers.get(b'accept-encoding', b'').decode('latin-1')
+        found = await asyncio.to_thread(self.resolver.resolve, scope['path'], accept_encoding)
+        if found is None:
+            return await self.application(scope, receive, send)
+        file_path, headers = found
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        })
+        body = b'' if scope['method'] == 'HEAD' else await asyncio.to_thread(file_path.read_bytes)
+        await send({'type': 'http.response.body', 'body': body})
+
+
+TEMPLATE_REFERENCE_RE = re.compile(r"""{%\s*(static|extends|include)\s+(['"])(.+?)\2""")
+
+
+def template_static_files(template_name, seen=None):
+    """Returns the static files referenced by the template and by the templates it extends and includes
+    (only the literal names are followed)."""
+    seen = set() if seen is None else seen
+    if template_name in seen:
+        return []
+    seen.add(template_name)
+    try:
+        origin = get_template(template_name).origin.name
+    except TemplateDoesNotExist:
+        return []
+    static_files = []
+    for tag, _, name in TEMPLATE_REFERENCE_RE.findall(Path(origin).read_text(encoding='utf-8')):
+        if tag == 'static':
+            static_files.append(name)
+        else:
+            static_files.extend(template_static_files(name, seen))
+    return list(dict.fromkeys(static_files))
+
+
+def page_templates():
+    """Returns the names of the page templates (the project templates extending a base template)."""
+    names = []
+    for templates_dir in settings.TEMPLATES[0]['DIRS']:
+        for path in sorted(Path(templates_dir).rglob('*.html')):
+            if re.search(r'{%\s*extends\s', path.read_text(encoding='utf-8')):
+                names.append(path.relative_to(templates_dir).as_posix())
+    return names
+
+
+def page_savings(storage):
+    """Returns the static bytes of every page: the served files without compression and with gzip
+    or brotli (the bytes without compression if there is no compressed copy). Needs the collected files."""
+    pages = {}
+    for template_name in page_templates():
+        totals = {'files': 0, 'identity': 0, 'gzip': 0, 'br': 0}
+        for name in template_static_files(template_name):
+            if finders.find(name) is None:
+                continue
+            served = Path(storage.path(storage.stored_name(name)))
+            identity = served.stat().st_size
+            totals['files'] += 1
+            totals['identity'] += identity
+            for encoding, suffix in ENCODINGS:
+                compressed = served.with_name(served.name + suffix)
+                totals[encoding] += compressed.stat().st_size if compressed.is_file() else identity
+        pages[template_name] = totals
+    return pages
@@ -1,14 +1,19 @@
 """TestQuiz URL Configuration
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
-from quizapp.views import MainPageView
+from TestQuiz.metrics import metrics_view
+from quizapp.views import MainPageView, AsyncMainPageView
+
+main_page_view = AsyncMainPageView if settings.ASYNC_VIEWS else MainPageView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('', MainPageView.as_view(), name='index'),
+    path('', main_page_view.as_view(), name='index'),
     path('questions/', include('quizapp.urls', namespace='quizapp')),
     path('users/', include('users.urls', namespace='users')),
     path('cards/', include('cards_app.urls', namespace='cards')),
+    path('metrics', metrics_view, name='metrics'),
 ]
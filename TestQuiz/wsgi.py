@@ -11,11 +11,11 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from TestQuiz.staticfiles import PrecompressedStaticFiles
+
 if os.path.isfile(os.path.join(os.path.dirname(__file__), 'settings_local.py')):
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TestQuiz.settings_local')
 else:
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TestQuiz.settings')
 
-
-
-application = get_wsgi_application()
+application = PrecompressedStaticFiles(get_wsgi_application())
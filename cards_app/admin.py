@@ -5,10 +5,11 @@ from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.http import urlencode
 
+from quizapp.admin import SoftDeleteAdmin
 from .models import Card, Order
 
 
-class CardAdmin(admin.ModelAdmin):
+class CardAdmin(SoftDeleteAdmin):
     """A class for working with the Card model in the admin panel."""
     list_display = ('title', 'is_active', 'view_orders_link',)
     search_fields = ('title',)
@@ -25,7 +26,7 @@ class CardAdmin(admin.ModelAdmin):
 
     view_orders_link.short_description = "Покупок с этой картой"
 
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(SoftDeleteAdmin):
     """A class for working with the Order model in the admin panel."""
     list_display = ('use_time', 'order_amount', 'card_used', 'is_active',)
     search_fields = ('use_time',)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CardsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cards_app'
+
+    def ready(self):
+        """Connects the render cache invalidation to the models shown on the card list page."""
+        from quizapp.render_cache import connect_invalidation
+        connect_invalidation(self.get_model('Card'))
@@ -0,0 +1,100 @@
+"""Streaming export of cards (optionally joined with their orders) to CSV or JSON Lines.
+
+Rows are pulled from the database as ``values_list`` tuples with ``.iterator()``,
+so the memory used does not depend on the number of exported cards and
+the header goes out before the first chunk is fetched.
+
+Attributes:
+
+    * EXPORT_CHUNK_SIZE (int): the number of rows fetched from the database (and sent to the client) at once.
+    * CARD_COLUMNS (tuple): card fields included in every export row.
+    * TOTALS_COLUMNS (tuple): per card order totals (used when orders are not joined).
+    * ORDER_COLUMNS (tuple): order fields included in every row when orders are joined.
+
+Only the active orders are exported and counted (as ``Card.active_orders``).
+"""
+import csv
+import datetime
+import json
+from decimal import Decimal
+
+from django.db.models import Count, FilteredRelation, Q, Sum
+
+EXPORT_CHUNK_SIZE = 2000
+
+CARD_COLUMNS = ('title', 'card_series', 'card_number', 'release_date', 'expiration_date', 'card_status',
+                'is_active')
+TOTALS_COLUMNS = ('orders_count', 'orders_total')
+ORDER_COLUMNS = ('active_order__use_time', 'active_order__order_amount')
+ACTIVE_ORDERS = Q(order__is_active=True)
+
+
+class Echo:
+    """A pseudo-buffer: ``csv.writer`` returns the written line instead of storing it."""
+
+    def write(self, value):
+        """Returns the value instead of writing it to a buffer."""
+        return value
+
+
+def export_columns(with_orders: bool):
+    """Returns the column names of the export (in the order of the values in each row)."""
+    extra_columns = ('use_time', 'order_amount') if with_orders else TOTALS_COLUMNS
+    return CARD_COLUMNS + extra_columns
+
+
+def export_rows(queryset, with_orders: bool):
+    """Returns an iterator over the rows (tuples) of the export for the cards queryset.
+
+    Args:
+
+        * queryset(QuerySet): filtered cards queryset;
+        * with_orders(bool): one row per active card order (LEFT JOIN) instead of one row per card with totals;
+
+    """
+    if with_orders:
+        rows = queryset.annotate(active_order=FilteredRelation('order', condition=ACTIVE_ORDERS)). \
+            order_by('-expiration_date', 'id', 'active_order__use_time').values_list(*CARD_COLUMNS, *ORDER_COLUMNS)
+    else:
+        rows = queryset.annotate(orders_count=Count('order', filter=ACTIVE_ORDERS),
+                                 orders_total=Sum('order__order_amount', filter=ACTIVE_ORDERS)). \
+            values_list(*CARD_COLUMNS, *TOTALS_COLUMNS)
+    return rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def value_to_text(value):
+    """Converts a database value to its text representation in the export."""
+    if value is None:
+        return ''
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def chunked_lines(lines):
+    """Joins the lines into chunks of EXPORT_CHUNK_SIZE lines so that the response is not sent row by row."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def stream_csv(queryset, with_orders: bool = False):
+    """Yields the CSV export of the cards queryset: the header first, then chunks of rows."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(export_columns(with_orders))
+    yield from chunked_lines(writer.writerow([value_to_text(value) for value in row])
+                             for row in export_rows(queryset, with_orders))
+
+
+def stream_jsonl(queryset, with_orders: bool = False):
+    """Yields the JSON Lines export of the cards queryset (one JSON object per row)."""
+    columns = export_columns(with_orders)
+    yield from chunked_lines(json.dumps(dict(zip(columns, map(value_to_text, row))), ensure_ascii=False) + '\n'
+                             for row in export_rows(queryset, with_orders))
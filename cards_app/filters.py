@@ -0,0 +1,81 @@
+"""
+Structured filter of the cards search (used by ``CardSearchView`` and ``CardExportView``).
+
+Only the conditions actually specified by the user become predicates, so a search without
+conditions is a plain (paginated) scan in the index order of the cards. A date is turned into
+a half-open range of the day on the indexed ``release_date``/``expiration_date`` column.
+"""
+import datetime
+
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils import timezone
+
+from cards_app.models import Card
+
+DATE_FORMAT = '%Y-%m-%d'
+
+#: the GET parameters of the search form
+SEARCH_PARAMETERS = ('card_series', 'card_number', 'start_date', 'expired_date', 'status')
+
+
+class CardFilter:
+    """The conditions of the cards search given as GET parameters.
+
+    Args:
+
+        * params(QueryDict): the request parameters (``card_series``, ``card_number``,
+          ``start_date``, ``expired_date``, ``status``), the empty ones are skipped;
+
+    Raises ``ValueError`` if a date or the status is invalid.
+    """
+
+    #: parameter name => the lookup of the text condition
+    text_conditions = {
+        'card_series': 'card_series__icontains',
+        'card_number': 'card_number__icontains',
+    }
+    #: parameter name => the indexed date column of the date condition
+    date_conditions = {
+        'start_date': 'release_date',
+        'expired_date': 'expiration_date',
+    }
+
+    def __init__(self, params):
+        self.values = {}
+        for name in self.text_conditions:
+            if params.get(name, '').strip():
+                self.values[name] = params[name].strip()
+        for name in self.date_conditions:
+            if params.get(name, '').strip():
+                self.values[name] = datetime.datetime.strptime(params[name].strip(), DATE_FORMAT).date()
+        if params.get('status'):
+            if params['status'] not in dict(Card.STATUS_CHOICES):
+                raise ValueError(f'Unknown card status: {params["status"]}')
+            self.values['status'] = params['status']
+
+    def predicates(self):
+        """Returns the Q objects of the specified conditions."""
+        predicates = []
+        for name, value in self.values.items():
+            if name in self.date_conditions:
+                column = self.date_conditions[name]
+                start = timezone.make_aware(datetime.datetime.combine(value, datetime.time.min))
+                predicates.append(Q(**{f'{column}__gte': start,
+                                       f'{column}__lt': start + datetime.timedelta(days=1)}))
+            elif name in self.text_conditions:
+                predicates.append(Q(**{self.text_conditions[name]: value}))
+            else:
+                predicates.append(Q(card_status=value))
+        return predicates
+
+    def filter(self, queryset):
+        """Returns the queryset filtered by the specified conditions."""
+        return queryset.filter(*self.predicates())
+
+    def query_string(self):
+        """Returns the GET parameters of the specified conditions (for the pagination links)."""
+        params = QueryDict(mutable=True)
+        for name, value in self.values.items():
+            params[name] = value.strftime(DATE_FORMAT) if isinstance(value, datetime.date) else value
+        return params.urlencode()
@@ -0,0 +1,35 @@
+# Generated by Django 4.1.4 on 2026-10-19 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards_app', '0006_alter_order_options_alter_order_card_used_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='card',
+            options={'ordering': ('-expiration_date', 'id'), 'verbose_name': 'Карта', 'verbose_name_plural': 'Карты'},
+        ),
+        migrations.AlterField(
+            model_name='card',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='активен'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='активен'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-expiration_date', 'id'], name='card_active_expiration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['card_used', 'use_time'], name='order_active_card_use_time_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.1.4 on 2026-10-19 15:00
+
+import datetime
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards_app', '0007_active_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='card',
+            name='expiration_date',
+            field=models.DateTimeField(db_index=True, default=datetime.datetime(2050, 1, 1, 0, 0), verbose_name='дата окончания действия'),
+        ),
+        migrations.AlterField(
+            model_name='card',
+            name='release_date',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='дата выпуска карты'),
+        ),
+    ]
@@ -7,7 +7,7 @@ from django.db import models
 from django.utils import timezone
 
 
-from quizapp.models import BaseModel
+from quizapp.models import ActiveManager, BaseModel, SoftDeleteQuerySet
 
 logger: Logger = logging.getLogger(__name__)
 
@@ -27,17 +27,21 @@ class Card(BaseModel):
 
     card_series = models.CharField(max_length=20, blank=True, verbose_name='серия карты')
     card_number = models.CharField(max_length=20, verbose_name='номер карты')
-    release_date = models.DateTimeField(default=timezone.now, verbose_name="дата выпуска карты")
+    release_date = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="дата выпуска карты")
     expiration_date = models.DateTimeField(default=timezone.datetime(year=2050,
                                                                      month=1,
                                                                      day=1
-                                                                     ), verbose_name="дата окончания действия")
+                                                                     ), db_index=True,
+                                           verbose_name="дата окончания действия")
     card_status = models.CharField(choices=STATUS_CHOICES, verbose_name='статус карты', max_length=2,
                                    default=DEACTIVATED, db_index=True)
 
     class Meta:
-        """Ordering cards according to their id."""
+        """Ordering cards according to their expiration date and id.
+        The index is used to list the active cards in this order."""
         ordering = ('-expiration_date', 'id')
+        indexes = [models.Index(fields=['-expiration_date', 'id'], condition=models.Q(is_active=True),
+                                name='card_active_expiration_idx')]
         verbose_name = 'Карта'
         verbose_name_plural = 'Карты'
 
@@ -50,6 +54,11 @@ class Card(BaseModel):
         """Returns formed url for the object."""
         return super().get_absolute_url(urlpattern_name=urlpattern_name)
 
+    @property
+    def active_orders(self):
+        """Returns the active orders of the card (the purchase history)."""
+        return self.order_set(manager='active').all()
+
 
 class Order(models.Model):
     """The model for the order."""
@@ -57,16 +66,33 @@ class Order(models.Model):
     create_time = models.DateTimeField(default=timezone.now, verbose_name="время создания")
     update_time = models.DateTimeField(default=timezone.now, verbose_name="время изменения")
     use_time = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="время использования карты")
-    is_active = models.BooleanField(default=True, db_index=True, verbose_name="активен")
+    is_active = models.BooleanField(default=True, verbose_name="активен")
     order_amount = models.DecimalField(max_digits=8, decimal_places=2, verbose_name="сумма покупки")
     card_used = models.ForeignKey(Card, to_field='title', on_delete=models.CASCADE,
                                   verbose_name="использованная карта")
 
+    objects = SoftDeleteQuerySet.as_manager()
+    active = ActiveManager()
+
     class Meta:
+        """Ordering orders according to their use time.
+        The index is used to show the purchase history of the card."""
         ordering = ['-use_time']
+        indexes = [models.Index(fields=['card_used', 'use_time'], condition=models.Q(is_active=True),
+                                name='order_active_card_use_time_idx')]
         verbose_name = 'Покупка по карте'
         verbose_name_plural = 'Покупки по карте'
 
+    def save(self, *args, **kwargs):
+        """Automatic filling in update_time when saving (the card profile validators depend on it)."""
+        self.update_time = timezone.now()
+        super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        """The object will not be deleted, but deactivated (as ``BaseModel.delete``)."""
+        self.is_active = not self.is_active
+        self.save()
+
     def __str__(self):
         """Forms and returns a printable representation of the object."""
         return f'Покупка с картой {self.card_used} | {self.use_time.date()} | {self.order_amount} руб.'
@@ -7,15 +7,21 @@ Attributes:
                          when using the urls specified in the list.
 """
 
+from django.conf import settings
 from django.urls import path
 
-from cards_app.views import CardListView, CardSearchView, CardDetail, CardDeleteView, CardGeneratorView
+from cards_app.views import CardListView, CardSearchView, CardDetail, CardDeleteView, CardGeneratorView, \
+    CardExportView, AsyncCardListView, AsyncCardDetail
+
+card_list_view = AsyncCardListView if settings.ASYNC_VIEWS else CardListView
+card_detail_view = AsyncCardDetail if settings.ASYNC_VIEWS else CardDetail
 
 app_name = 'cards'
 urlpatterns = [
-    path('', CardListView.as_view(), name='cards_list'),
+    path('', card_list_view.as_view(), name='cards_list'),
     path('search-options', CardSearchView.as_view(), name='search-options'),
-    path('detail/<slug:card_slug>/', CardDetail.as_view(), name='card_read'),
+    path('detail/<slug:card_slug>/', card_detail_view.as_view(), name='card_read'),
     path('cards-delete/<slug:card_slug>/', CardDeleteView.as_view(), name='card_delete'),
     path('cards-generator', CardGeneratorView.as_view(), name='cards_generator'),
+    path('export', CardExportView.as_view(), name='cards_export'),
 ]
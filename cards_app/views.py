@@ -1,24 +1,30 @@
-import datetime
 import logging
 import random
 import time
 from logging import Logger
 
-from dateutil.relativedelta import relativedelta
-from django.db.models import Q
-from django.http import HttpResponseRedirect
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Coalesce, Greatest
+from django.http import HttpResponseRedirect, StreamingHttpResponse, HttpResponseBadRequest
 from django.shortcuts import render
 from django.urls import reverse_lazy, reverse
 from django.utils import timezone
 from django.views.generic import ListView, DetailView, DeleteView
 
+from cards_app.export import stream_csv, stream_jsonl
+from cards_app.filters import CardFilter, SEARCH_PARAMETERS
 from cards_app.models import Card
-from quizapp.mixins import TitleMixin, AuthorizedOnlyDispatchMixin
+from quizapp.render_cache import bump_generation
+from quizapp.mixins import TitleMixin, AuthorizedOnlyDispatchMixin, ReadReplicaMixin, AsyncAuthorizedOnlyDispatchMixin, \
+    AsyncDetailMixin, AsyncListMixin, AsyncReadReplicaMixin, ConditionalGetMixin, AsyncConditionalGetMixin
 
 logger: Logger = logging.getLogger(__name__)
 
 
-class CardListView(ListView, TitleMixin):
+class CardListView(ListView, TitleMixin, ReadReplicaMixin):
     """View for the card list.
     Сhecking whether the status of expired cards needs to be changed."""
     model = Card
@@ -31,91 +37,142 @@ class CardListView(ListView, TitleMixin):
         Returns a queryset of all active cards.
         """
         self.processing_exp_date_cards()
-        return Card.objects.filter(is_active=True)
+        return Card.active.all()
 
     @staticmethod
     def processing_exp_date_cards():
-        """Сhecking whether the status of expired cards needs to be changed."""
-        exp_date_cards_ids = list(Card.objects.filter(expiration_date__lte=timezone.now()).
-                                  exclude(card_status='EX').
-                                  values_list('id', flat=True))
-        if exp_date_cards_ids:
-            for card_id in exp_date_cards_ids:
-                card = Card.objects.get(id=card_id)
-                card.card_status = 'EX'
-                card.save()
-
-
-class CardSearchView(ListView, TitleMixin):
+        """Сhecking whether the status of expired cards needs to be changed.
+        The statuses are changed with one UPDATE on the primary database (the view reads from the replica),
+        the UPDATE sends no signals, so the cached card list fragments are invalidated here."""
+        now = timezone.now()
+        expired = Card.objects.using(DEFAULT_DB_ALIAS).filter(expiration_date__lte=now).\
+            exclude(card_status=Card.EXPIRED).update(card_status=Card.EXPIRED, update_time=now)
+        if expired:
+            bump_generation(Card._meta.label)
+
+
+class AsyncCardListView(AsyncListMixin, ListView, TitleMixin, AsyncReadReplicaMixin):
+    """Async version of ``CardListView`` (used under ASGI)."""
+    model = Card
+    template_name = 'cards/cards_list.html'
+    title = CardListView.title
+    paginate_by = CardListView.paginate_by
+
+    async def aget_queryset(self):
+        await self.aprocessing_exp_date_cards()
+        return Card.active.all()
+
+    @staticmethod
+    async def aprocessing_exp_date_cards():
+        """Async version of ``CardListView.processing_exp_date_cards``."""
+        await sync_to_async(CardListView.processing_exp_date_cards)()
+
+
+class CardSearchView(ListView, TitleMixin, ReadReplicaMixin):
     """View to display the search results for cards (when using the site search bar).
     The search is performed by card_series, card_number, release_date,
-    expiration_date, card_status.
+    expiration_date, card_status given as GET parameters; without them the search form is shown.
     """
     model = Card
     template_name = 'cards/search_options_page.html'
     title = 'Поиск по картам'
+    paginate_by = 5
 
-    def post(self, request, *args, **kwargs):
-        """Returns a queryset filtered for the presence of a match with the data entered by the user."""
+    def get(self, request, *args, **kwargs):
+        """Returns the search form or a page of the cards matching the conditions entered by the user."""
+        if not any(name in request.GET for name in SEARCH_PARAMETERS):
+            return render(request, self.template_name, context={'title': self.title})
         try:
-            search_options = ['card_series', 'card_number', 'start_date', 'expired_date', 'status']
-            searсh_conditions = [request.POST.get(i) for i in search_options if i in request.POST]
-            release_start_date, release_end_date = self.search_date_conditions_processing(searсh_conditions[2])
-            expiration_start_date, expiration_end_date = self.search_date_conditions_processing(searсh_conditions[3])
-
-            query = Card.objects.filter(Q(card_series__icontains=searсh_conditions[0])
-                                        & Q(card_number__icontains=searсh_conditions[1])
-                                        & Q(release_date__gte=release_start_date,
-                                            release_date__lte=release_end_date
-                                            )
-                                        & Q(expiration_date__gte=expiration_start_date,
-                                            expiration_date__lte=expiration_end_date
-                                            ))
-            if searсh_conditions[4]:
-                query = query.filter(card_status=searсh_conditions[4])
-
-            context = {
-                'card_list': query,
-                'title': self.title,
-            }
-
-            return render(request, 'cards/cards_list.html', context=context)
-        except Exception as err:
-            template = "An exception of type {0} occurred during processing cards search conditions. Arguments:\n{1!r}"
-            message = template.format(type(err).__name__, err.args)
-            logger.info(message)
+            self.card_filter = CardFilter(request.GET)
+        except ValueError as err:
+            logger.info('An exception of type %s occurred during processing cards search conditions. '
+                        'Arguments:\n%r', type(err).__name__, err.args)
             context = {
                 'error_checking': 'Извините, при поиске произошла ошибка. Пожалуйста, попробуйте еще раз',
                 'title': self.title,
             }
-
             return render(request, 'cards/cards_list.html', context=context)
+        return super().get(request, *args, **kwargs)
 
-    def search_date_conditions_processing(self, datetime_str: str):
-        """
-        Processes and returns datetime objects of the search start and end dates (search time range).
-        If the date is not set by the user, returns datetime objects: 1900.01.01 and 2050.01.01.
-        """
-        if datetime_str:
-            start_date = self.datetime_processing(datetime_str)
-            end_date = start_date + datetime.timedelta(days=1)
-        else:
-            start_date = self.datetime_processing('1900-01-01')
-            end_date = self.datetime_processing('2050-01-01')
-        return start_date, end_date
+    def get_queryset(self):
+        """Returns a queryset filtered by the conditions entered by the user.
+        The query plan is logged in the debug mode if the DEBUG log level is enabled."""
+        queryset = self.card_filter.filter(Card.objects.all())
+        if settings.DEBUG and logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Cards search plan for %s:\n%s', self.card_filter.values, queryset.explain())
+        return queryset
+
+    def get_template_names(self):
+        return ['cards/cards_list.html']
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_query'] = self.card_filter.query_string()
+        return context
+
+
+class CardExportView(AuthorizedOnlyDispatchMixin):
+    """View for the streaming export of cards (optionally with their orders) to CSV or JSON Lines.
+    Accepts the same filter conditions as the cards search (as GET parameters);
+    only the conditions actually specified by the user are applied.
+    """
+    #: export format => (rows generator, content type, file extension)
+    export_formats = {
+        'csv': (stream_csv, 'text/csv; charset=utf-8', 'csv'),
+        'jsonl': (stream_jsonl, 'application/x-ndjson; charset=utf-8', 'jsonl'),
+    }
+
+    def get(self, request, *args, **kwargs):
+        """Returns a streaming response with the export of the filtered cards."""
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in self.export_formats:
+            return HttpResponseBadRequest(f'Unknown export format: {export_format}')
+        try:
+            queryset = self.get_queryset()
+        except ValueError as err:
+            logger.info('Invalid cards export conditions: %s', err)
+            return HttpResponseBadRequest('Invalid export conditions')
+
+        stream, content_type, extension = self.export_formats[export_format]
+        with_orders = request.GET.get('with_orders') in ('1', 'true', 'on')
+        response = StreamingHttpResponse(stream(queryset, with_orders), content_type=content_type)
+        file_name = f'cards{"_orders" if with_orders else ""}_{timezone.now().date()}.{extension}'
+        response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+        logger.info('Cards export started: format=%s, with_orders=%s', export_format, with_orders)
+        return response
+
+    def get_queryset(self):
+        """Returns a queryset of cards filtered by the conditions from the GET parameters."""
+        return CardFilter(self.request.GET).filter(Card.objects.all())
 
-    @staticmethod
-    def datetime_processing(datetime_str: str):
-        """Gets a string, returns a datetime object."""
-        return datetime.datetime.strptime(datetime_str, '%Y-%m-%d')
 
+def card_validator_queryset(card_slug):
+    """Returns the validators of the card profile: the last change of the card and its orders
+    and the number of the active orders (a deleted order does not change the last change time)."""
+    return Card.objects.filter(slug=card_slug).annotate(
+        orders_count=Count('order', filter=Q(order__is_active=True)),
+        last_modified=Greatest('update_time', Coalesce(Max('order__update_time'), 'update_time')),
+    ).values('id', 'last_modified', 'orders_count')
 
-class CardDetail(TitleMixin, DetailView, AuthorizedOnlyDispatchMixin):
-    """View to viewing a card profile with its purchase history."""
+
+class CardDetail(TitleMixin, DetailView, AuthorizedOnlyDispatchMixin, ReadReplicaMixin, ConditionalGetMixin):
+    """View to viewing a card profile with its purchase history.
+    A reload of an unchanged profile is answered with 304 Not Modified."""
     title = 'Профиль карты'
     model = Card
     template_name = 'cards/card_detail.html'
     slug_url_kwarg = 'card_slug'
+    validator_queryset = staticmethod(card_validator_queryset)
+
+
+class AsyncCardDetail(AsyncDetailMixin, TitleMixin, DetailView, AsyncAuthorizedOnlyDispatchMixin, AsyncReadReplicaMixin,
+                      AsyncConditionalGetMixin):
+    """Async version of ``CardDetail`` (used under ASGI)."""
+    title = CardDetail.title
+    model = Card
+    template_name = 'cards/card_detail.html'
+    slug_url_kwarg = 'card_slug'
+    validator_queryset = staticmethod(card_validator_queryset)
 
 
 class CardDeleteView(DeleteView, AuthorizedOnlyDispatchMixin):
@@ -158,6 +215,8 @@ class CardGeneratorView(TitleMixin, ListView):
         Create cards according to the conditions.
         Switching to the page with the list of generated cards.
         """
+        # imported on first use to keep it out of the startup
+        from dateutil.relativedelta import relativedelta
         try:
             new_cards_queryset = Card.objects.none()
 
@@ -180,9 +239,8 @@ class CardGeneratorView(TitleMixin, ListView):
                 new_cards_queryset |= Card.objects.filter(id=instance.id)
 
         except Exception as err:
-            template = "An exception of type {0} occurred processing cards generator conditions. Arguments:\n{1!r}"
-            message = template.format(type(err).__name__, err.args)
-            logger.info(message)
+            logger.info('An exception of type %s occurred processing cards generator conditions. '
+                        'Arguments:\n%r', type(err).__name__, err.args)
             context = {
                 'error_checking': 'Извините, при генерации карт произошла ошибка. Пожалуйста, попробуйте еще раз',
                 'title': self.title,
@@ -1,9 +1,12 @@
 from django.contrib import admin
-from django.contrib.contenttypes.admin import GenericStackedInline
+from django.contrib.admin.models import DELETION, LogEntry
+from django.contrib.admin.options import get_content_type_for_model
+from django.db.models import Sum
 from django.forms import ModelForm, Textarea
 from django.utils.html import format_html
 
-from quizapp.models import Category, Question, QuestionSet
+from quizapp.models import Category, Question, QuestionSet, QuestionSetMembership, QuestionStats
+from users.broadcast import queue_question_set_broadcast
 
 admin.site.site_header = 'Админ-панель тестового задания для ИП Авдеев В.Ю. "'
 admin.site.site_title = 'Тестовое задание для ИП Авдеев В.Ю. "'
@@ -21,19 +24,44 @@ class BigTextBodyForm(ModelForm):
         fields = '__all__'
 
 
-class CategoryAdmin(admin.ModelAdmin):
+class SoftDeleteAdmin(admin.ModelAdmin):
+    """Base class for the admin panels of the soft-deleted models.
+    The deletion log entries are collected on the request and written with one INSERT
+    when the objects are deactivated."""
+
+    def log_deletion(self, request, obj, object_repr):
+        """Collects the deletion log entry of the object."""
+        entry = LogEntry(user_id=request.user.pk, content_type_id=get_content_type_for_model(obj).pk,
+                         object_id=str(obj.pk), object_repr=object_repr[:200], action_flag=DELETION)
+        if not hasattr(request, 'deletion_log'):
+            request.deletion_log = []
+        request.deletion_log.append(entry)
+        return entry
+
+    def write_deletion_log(self, request):
+        """Writes the collected deletion log entries."""
+        LogEntry.objects.bulk_create(getattr(request, 'deletion_log', []))
+        request.deletion_log = []
+
+    def delete_model(self, request, obj):
+        """Defines the behavior when deleting an object (see ``BaseModel.delete``)."""
+        super().delete_model(request, obj)
+        self.write_deletion_log(request)
+
+    def delete_queryset(self, request, queryset):
+        """Defines the behavior when deleting the selected objects.
+        The objects will not be deleted, but deactivated with one UPDATE per batch."""
+        queryset.soft_delete()
+        self.write_deletion_log(request)
+
+
+class CategoryAdmin(SoftDeleteAdmin):
     """A class for working with the Category model in the admin panel."""
     list_display = ('title', 'is_active', 'view_questions_link',)
     search_fields = ('title',)
     list_filter = ('is_active',)
     fields = (('title', 'is_active'), 'description',)
 
-    def delete_queryset(self, request, queryset):
-        """Defines the behavior when deleting a set.
-        The object will not be deleted, but deactivated."""
-        for item in queryset:
-            item.delete()
-
     def view_questions_link(self, obj: Category):
         """Сreating a table list field with number of questions in this category."""
         count = obj.question_set.count()
@@ -42,25 +70,96 @@ class CategoryAdmin(admin.ModelAdmin):
     view_questions_link.short_description = "Вопросов в категории"
 
 
-class QuestionInline(GenericStackedInline):
-    """A class for working with the Question model in the admin panel (inline,
-    as part of editing QuestionSet)."""
-    model = Question
+def question_stats_html(question: Question):
+    """Returns the difficulty of the question and the numbers of the chosen answers."""
+    stats = getattr(question, 'stats', None) if question.pk else None
+    if stats is None or not stats.attempts:
+        return QuestionStats.difficulty(0, 0)
+    return format_html(
+        '<span>{}: {} из {} правильно ({}%); выбраны ответы №1-4: {} / {} / {} / {}</span>',
+        QuestionStats.difficulty(stats.attempts, stats.correct), stats.correct, stats.attempts,
+        round(100 * stats.correct / stats.attempts), stats.option_1, stats.option_2, stats.option_3,
+        stats.option_4,
+    )
+
+
+class QuestionAdmin(admin.ModelAdmin):
+    """A class for working with the Question model in the admin panel
+    (the questions are added to the sets in the question set admin panel)."""
     form = BigTextBodyForm
+    list_display = ('text', 'category', 'is_active', 'answer_stats')
+    search_fields = ('text',)
+    list_filter = ('is_active', 'category')
     fields = ('text', ('category', 'is_active'),
               ('answer_01', 'answer_02', 'answer_03', 'answer_04',),
-              'right_answers',)
+              'right_answers', 'answer_stats',)
+    readonly_fields = ('answer_stats',)
+
+    def get_queryset(self, request):
+        """Loads the answer statistics with the questions."""
+        return super().get_queryset(request).select_related('category', 'stats')
+
+    def answer_stats(self, obj: Question):
+        """Сreating a field with the difficulty of the question and the numbers of the chosen answers."""
+        return question_stats_html(obj)
+
+    answer_stats.short_description = "Статистика ответов"
+
+
+class QuestionSetMembershipInline(admin.TabularInline):
+    """A class for working with the questions of the set in the admin panel (inline,
+    as part of editing QuestionSet). A question can be added to several sets."""
+    model = QuestionSetMembership
+    fields = ('position', 'question', 'answer_stats')
+    readonly_fields = ('answer_stats',)
+    autocomplete_fields = ('question',)
     extra = 1
 
+    def get_queryset(self, request):
+        """Loads the questions and their answer statistics with the memberships."""
+        return super().get_queryset(request).select_related('question__stats')
+
+    def answer_stats(self, obj: QuestionSetMembership):
+        """Сreating a field with the difficulty of the question and the numbers of the chosen answers."""
+        return question_stats_html(obj.question) if obj.question_id else QuestionStats.difficulty(0, 0)
+
+    answer_stats.short_description = "Статистика ответов"
 
-class QuestionSetAdmin(admin.ModelAdmin):
+
+class QuestionSetAdmin(SoftDeleteAdmin):
     """A class for working with the QuestionSet model in the admin panel."""
-    list_display = ('title', 'is_active')
+    list_display = ('title', 'is_active', 'difficulty')
     search_fields = ('title',)
     list_filter = ('is_active',)
     fields = (('title', 'is_active'), 'description', )
-    inlines = [QuestionInline, ]
+    inlines = [QuestionSetMembershipInline, ]
+    actions = ['broadcast_question_sets']
+
+    def get_queryset(self, request):
+        """Adds the total numbers of answers and correct answers to the questions of the set."""
+        return super().get_queryset(request).annotate(attempts=Sum('questions__stats__attempts'),
+                                                      correct=Sum('questions__stats__correct'))
+
+    def difficulty(self, obj: QuestionSet):
+        """Сreating a table list field with the difficulty and the share of correct answers of the set."""
+        if not obj.attempts:
+            return QuestionStats.difficulty(0, 0)
+        return format_html('<span>{} ({}% правильно)</span>', QuestionStats.difficulty(obj.attempts, obj.correct),
+                           round(100 * obj.correct / obj.attempts))
+
+    difficulty.short_description = "Сложность"
+    difficulty.admin_order_field = 'correct'
+
+    def broadcast_question_sets(self, request, queryset):
+        """Queues the broadcasts about the selected active sets (sent by the send_broadcasts command)."""
+        question_sets = list(queryset.filter(is_active=True))
+        for question_set in question_sets:
+            queue_question_set_broadcast(question_set)
+        self.message_user(request, f'Рассылок поставлено в очередь: {len(question_sets)}')
+
+    broadcast_question_sets.short_description = "Разослать уведомление о наборе всем пользователям"
 
 
 admin.site.register(Category, CategoryAdmin)
+admin.site.register(Question, QuestionAdmin)
 admin.site.register(QuestionSet, QuestionSetAdmin)
@@ -0,0 +1,125 @@
+"""
+Buffered per-question answer statistics.
+
+``AnswerQuestion`` records every answer into the buffer of the process (no database access).
+A background thread flushes the buffer every ANSWER_STATS_FLUSH_INTERVAL seconds with one
+``UPDATE ... SET attempts = attempts + %s, ...`` per question; the statistics rows of the questions
+answered for the first time are inserted first. The buffer is also flushed when the process stops.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+
+from quizapp.models import Question, QuestionStats
+
+logger = logging.getLogger(__name__)
+
+OPTION_FIELDS = ('option_1', 'option_2', 'option_3', 'option_4')
+
+
+class AnswerStatsBuffer:
+    """Counters of the answers of the process: question id => Counter of the QuestionStats fields."""
+
+    def __init__(self):
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def record(self, question_id, correct, chosen_numbers):
+        """Adds one answer to the counters of the question.
+
+        Args:
+
+            * question_id(int): the id of the answered question;
+            * correct(bool): whether the answer is right;
+            * chosen_numbers(list): the numbers (1-4) of the chosen answer options;
+
+        """
+        with self.lock:
+            counter = self.counters.setdefault(question_id, Counter())
+            counter['attempts'] += 1
+            counter['correct'] += int(correct)
+            for number in chosen_numbers:
+                counter[OPTION_FIELDS[number - 1]] += 1
+        background_flusher.start()
+
+    def take(self):
+        """Returns the buffered counters and empties the buffer."""
+        with self.lock:
+            counters, self.counters = self.counters, {}
+        return counters
+
+    def put_back(self, counters):
+        """Puts the counters that failed to be written back into the buffer."""
+        with self.lock:
+            for question_id, counter in counters.items():
+                self.counters.setdefault(question_id, Counter()).update(counter)
+
+
+buffer = AnswerStatsBuffer()
+
+
+def flush_answer_stats():
+    """Writes the buffered counters to the database. Returns the number of answered questions in the buffer."""
+    counters = buffer.take()
+    if not counters:
+        return 0
+    try:
+        with transaction.atomic():
+            # the counters of the questions deleted in the meantime are dropped
+            question_ids = list(Question.objects.filter(id__in=counters).values_list('id', flat=True))
+            # the questions answered for the first time get their rows
+            QuestionStats.objects.bulk_create([QuestionStats(question_id=question_id) for question_id in question_ids],
+                                              ignore_conflicts=True)
+            for question_id in question_ids:
+                QuestionStats.objects.filter(question_id=question_id).update(
+                    **{field: F(field) + value for field, value in counters[question_id].items() if value})
+    except DatabaseError:
+        buffer.put_back(counters)
+        raise
+    return len(counters)
+
+
+class BackgroundFlusher:
+    """A daemon thread that periodically flushes the answer statistics."""
+
+    def __init__(self):
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Starts the thread (once per process)."""
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='answer-stats-flusher', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        """Flushes the statistics every ANSWER_STATS_FLUSH_INTERVAL seconds."""
+        while True:
+            time.sleep(settings.ANSWER_STATS_FLUSH_INTERVAL)
+            try:
+                flush_answer_stats()
+            except DatabaseError as err:
+                logger.error('Failed to flush answer statistics: %s', err)
+            finally:
+                connection.close()
+
+
+background_flusher = BackgroundFlusher()
+
+
+@atexit.register
+def flush_on_exit():
+    """Writes the buffered statistics when the process stops."""
+    try:
+        flush_answer_stats()
+    except Exception as err:
+        logger.error('Failed to flush answer statistics on exit: %s', err)
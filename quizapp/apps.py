@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class QuizappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quizapp'
+
+    def ready(self):
+        """Connects the SQLite connection setup and the metrics query counter to every new database connection.
+        Connects the render cache invalidation to the models shown on the main page
+        and the recompilation of the question bank to the models compiled into it."""
+        from TestQuiz.database import configure_sqlite_connection
+        from TestQuiz.metrics import install_query_counter
+        from quizapp.question_bank import connect_recompilation
+        from quizapp.render_cache import connect_invalidation
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='configure_sqlite_connection')
+        connection_created.connect(install_query_counter, dispatch_uid='install_query_counter')
+        content_models = (self.get_model('QuestionSet'), self.get_model('Question'),
+                          self.get_model('QuestionSetMembership'))
+        connect_invalidation(*content_models)
+        connect_recompilation(*content_models)
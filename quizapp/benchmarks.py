@@ -0,0 +1,302 @@
+"""
+End-to-end load and latency benchmarks (run by the ``benchmark`` command).
+
+The flows are driven through the test client against a seeded test database:
+
+    * ``quiz_run``: login and a full run of a question set (``TestProcessView``/``AnswerQuestion``);
+    * ``cards_paging``: paging through ``CardListView``;
+    * ``cards_search``: ``CardSearchView`` queries;
+    * ``card_detail``: ``CardDetail`` of a card with a long order history;
+    * ``cards_generator``: ``CardGeneratorView`` batches.
+
+For every flow the throughput, p50/p95/p99 latency and the number of queries per request are reported.
+
+The concurrent flows (``--concurrency``) drive the ASGI handler with many ``AsyncClient`` instances
+at once, as an ASGI server would; run them with ``ASYNC_VIEWS=0`` and ``ASYNC_VIEWS=1`` to compare
+the sync and the async views (the queries of overlapping requests are not counted):
+
+    * ``concurrent_reads``: the main page, a card list page and a card profile;
+    * ``concurrent_quiz``: a full run of a question set.
+
+The plans of the main queries of the pages are checked to use the partial ``WHERE is_active`` indexes
+(``INDEXED_QUERIES``).
+"""
+import asyncio
+import math
+import re
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.utils import timezone
+
+from TestQuiz.metrics import QueryCounter
+from cards_app.models import Card, Order
+from quizapp.models import Category, Question, QuestionSet, QuestionSetMembership
+from users.models import QuizUser
+
+QUESTIONS_PER_SET = 10
+BENCHMARK_PASSWORD = 'Benchmark-pass-1'
+RIGHT_ANSWER = 'right'
+ANSWER_URL_RE = re.compile(r'/questions/answers/\d+/')
+
+
+class BenchmarkError(Exception):
+    """A benchmark request returned an unexpected response."""
+
+
+def percentile(values, percent):
+    """Returns the percentile of the values (nearest-rank method)."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class FlowRecorder:
+    """Sends the requests of a flow through the test client and records their latency and queries."""
+
+    def __init__(self, client):
+        self.client = client
+        self.latencies = []
+        self.queries = []
+
+    def request(self, method, path, data=None, expected_status=(200, 302), **extra):
+        """Sends the request and records its measurements. Returns the response."""
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connections['default'].execute_wrapper(counter):
+            response = getattr(self.client, method)(path, data or {}, **extra)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.latencies.append(time.perf_counter() - started)
+        self.queries.append(counter.count)
+        if response.status_code not in expected_status:
+            raise BenchmarkError(f'{method.upper()} {path} returned {response.status_code}')
+        return response
+
+    async def arequest(self, client, method, path, data=None, expected_status=(200, 302), **extra):
+        """Sends the request with the async client and records its latency. Returns the response."""
+        started = time.perf_counter()
+        response = await getattr(client, method)(path, data or {}, **extra)
+        self.latencies.append(time.perf_counter() - started)
+        if response.status_code not in expected_status:
+            raise BenchmarkError(f'{method.upper()} {path} returned {response.status_code}')
+        return response
+
+    def summary(self, elapsed):
+        """Returns the results of the flow."""
+        return {
+            'requests': len(self.latencies),
+            'throughput': round(len(self.latencies) / elapsed, 2) if elapsed else 0,
+            'p50_ms': round(percentile(self.latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(self.latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(self.latencies, 99) * 1000, 3),
+            'queries_per_request': round(sum(self.queries) / len(self.queries), 2) if self.queries else 0,
+        }
+
+
+def seed_dataset(scale, users):
+    """Creates the benchmark data. Returns the dict with the objects used by the flows.
+
+    Args:
+
+        * scale(int): multiplier of the number of question sets, cards and orders;
+        * users(int): the number of active users (one per quiz run);
+
+    """
+    category = Category.objects.create(title='Benchmark category')
+    question_sets = [QuestionSet.objects.create(title=f'Benchmark set {number}') for number in range(2 * scale)]
+    questions = Question.objects.bulk_create(
+        Question(text=f'Question {number} of {question_set.title}', category=category, right_answers='1,',
+                 answer_01=RIGHT_ANSWER, answer_02='wrong', answer_03='wrong')
+        for question_set in question_sets for number in range(QUESTIONS_PER_SET)
+    )
+    QuestionSetMembership.objects.bulk_create(
+        QuestionSetMembership(question_set=question_set, question=questions[index * QUESTIONS_PER_SET + number],
+                              position=number + 1)
+        for index, question_set in enumerate(question_sets) for number in range(QUESTIONS_PER_SET)
+    )
+
+    now = timezone.now()
+    Card.objects.bulk_create(
+        Card(title=f'Benchmark_card_{number}', slug=f'benchmark-card-{number}', card_series=f'S{number % 10}',
+             card_number=f'{number:08d}', release_date=now, expiration_date=now + timezone.timedelta(days=365),
+             card_status=Card.ACTIVATED)
+        for number in range(50 * scale)
+    )
+    long_history_card = Card.objects.get(title='Benchmark_card_0')
+    Order.objects.bulk_create(
+        Order(card_used=long_history_card, order_amount=Decimal(number % 1000) + Decimal('0.99'),
+              use_time=now - timezone.timedelta(minutes=number))
+        for number in range(200 * scale)
+    )
+
+    password = make_password(BENCHMARK_PASSWORD)
+    QuizUser.objects.bulk_create(
+        QuizUser(username=f'benchmark_user_{number}', email=f'benchmark_{number}@example.com',
+                 password=password, is_active=True)
+        for number in range(users)
+    )
+    return {'question_set': question_sets[0], 'card': long_history_card}
+
+
+def quiz_run_flow(recorder, data, iteration):
+    """Logs in and answers all the questions of the question set."""
+    recorder.request('post', '/users/login/', {'username': f'benchmark_user_{iteration}',
+                                               'password': BENCHMARK_PASSWORD},
+                     expected_status=(302,), REMOTE_ADDR=f'10.0.{iteration // 250}.{iteration % 250 + 1}')
+    recorder.request('get', '/')
+    test_body_url = f'/questions/test_body/{data["question_set"].slug}/'
+    while True:
+        response = recorder.request('get', test_body_url)
+        question = response.context['current_question']
+        if question == 'Stop':
+            break
+        recorder.request('get', f'/questions/answers/{question.id}/',
+                         {'csrfmiddlewaretoken': 'benchmark', 'answers1': question.answer_01})
+
+
+def cards_paging_flow(recorder, data, iteration):
+    """Pages through the first pages of the card list."""
+    for page in range(1, 11):
+        recorder.request('get', '/cards/', {'page': page})
+
+
+def cards_search_flow(recorder, data, iteration):
+    """Searches the cards by series, by number and by status."""
+    conditions = (
+        {'card_series': f'S{iteration % 10}', 'status': ''},
+        {'card_number': f'{iteration:04d}', 'status': ''},
+        {'status': Card.ACTIVATED},
+    )
+    for condition in conditions:
+        search = {'card_series': '', 'card_number': '', 'start_date': '', 'expired_date': '', **condition}
+        recorder.request('get', '/cards/search-options', search)
+
+
+def card_detail_flow(recorder, data, iteration):
+    """Opens the profile of the card with a long order history."""
+    recorder.request('get', data['card'].get_absolute_url())
+
+
+def cards_generator_flow(recorder, data, iteration):
+    """Generates a batch of cards."""
+    recorder.request('post', '/cards/cards-generator', {'card_series': 'GEN', 'quantity': 10, 'exp_date': 'year'})
+
+
+#: flow name => (flow function, whether the flow needs a logged in client)
+FLOWS = {
+    'quiz_run': (quiz_run_flow, False),
+    'cards_paging': (cards_paging_flow, False),
+    'cards_search': (cards_search_flow, False),
+    'card_detail': (card_detail_flow, True),
+    'cards_generator': (cards_generator_flow, False),
+}
+
+
+def run_flows(data, iterations, flow_names=None):
+    """Runs every flow the given number of times. Returns the results by the flow name."""
+    results = {}
+    user = QuizUser.objects.get(username='benchmark_user_0')
+    for name in FLOWS if flow_names is None else flow_names:
+        flow, needs_login = FLOWS[name]
+        recorder = FlowRecorder(Client())
+        started = time.perf_counter()
+        for iteration in range(iterations):
+            recorder.client = Client()
+            if needs_login:
+                recorder.client.force_login(user)
+            flow(recorder, data, iteration)
+        results[name] = recorder.summary(time.perf_counter() - started)
+    return results
+
+
+async def concurrent_reads_flow(recorder, client, data, iteration):
+    """Opens the main page, a card list page and the profile of a card."""
+    for path in ('/', f'/cards/?page={iteration % 10 + 1}', data['card'].get_absolute_url()):
+        await recorder.arequest(client, 'get', path)
+
+
+async def concurrent_quiz_flow(recorder, client, data, iteration):
+    """Answers all the questions of the question set. The question is taken from the page
+    (``response.context`` collects the templates rendered for all the concurrent requests)."""
+    test_body_url = f'/questions/test_body/{data["question_set"].slug}/'
+    while True:
+        response = await recorder.arequest(client, 'get', test_body_url)
+        answer_url = ANSWER_URL_RE.search(response.content.decode())
+        if answer_url is None:
+            break
+        await recorder.arequest(client, 'get', answer_url.group(),
+                                {'csrfmiddlewaretoken': 'benchmark', 'answers1': RIGHT_ANSWER})
+
+
+CONCURRENT_FLOWS = {
+    'concurrent_reads': concurrent_reads_flow,
+    'concurrent_quiz': concurrent_quiz_flow,
+}
+
+
+async def run_clients(flow, recorder, clients, data, iterations):
+    """Runs the flow with all the clients at once, every client repeats it the given number of times."""
+    async def run_client(client):
+        for iteration in range(iterations):
+            await flow(recorder, client, data, iteration)
+
+    await asyncio.gather(*(run_client(client) for client in clients))
+
+
+def run_concurrent_flows(data, iterations, concurrency, flow_names=None):
+    """Runs every concurrent flow with the given number of logged in clients at once.
+    Returns the results by the flow name."""
+    results = {}
+    users = list(QuizUser.objects.filter(username__startswith='benchmark_user_')[:concurrency])
+    for name in CONCURRENT_FLOWS if flow_names is None else flow_names:
+        recorder = FlowRecorder(None)
+        clients = []
+        for user in users:
+            client = AsyncClient()
+            client.force_login(user)
+            clients.append(client)
+        started = time.perf_counter()
+        asyncio.run(run_clients(CONCURRENT_FLOWS[name], recorder, clients, data, iterations))
+        results[name] = recorder.summary(time.perf_counter() - started)
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Returns the list of regressions: p95 latency above the baseline by more than the tolerance
+    or more queries per request than in the baseline."""
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {current["p95_ms"]} ms > baseline {base["p95_ms"]} ms')
+        if current['queries_per_request'] > base['queries_per_request']:
+            regressions.append(f'{name}: {current["queries_per_request"]} queries per request '
+                               f'> baseline {base["queries_per_request"]}')
+    return regressions
+
+
+#: query name => (function returning the queryset from the benchmark data, the index its plan must use)
+INDEXED_QUERIES = {
+    'main_page': (lambda data: QuestionSet.active.exclude(questions__isnull=True)[:5], 'questionset_active_id_idx'),
+    'categories': (lambda data: Category.active.order_by('id')[:5], 'category_active_id_idx'),
+    'card_list': (lambda data: Card.active.all()[:5], 'card_active_expiration_idx'),
+    'card_orders': (lambda data: data['card'].active_orders, 'order_active_card_use_time_idx'),
+    'question_set': (lambda data: QuestionSetMembership.question_ids(data['question_set'].id),
+                     'questionset_position_idx'),
+}
+
+
+def check_query_plans(data):
+    """Returns the list of the INDEXED_QUERIES whose plans do not use their index."""
+    problems = []
+    for name, (queryset, index_name) in INDEXED_QUERIES.items():
+        plan = queryset(data).explain()
+        if index_name not in plan:
+            problems.append(f'{name} does not use {index_name}:\n{plan}')
+    return problems
@@ -0,0 +1,211 @@
+"""
+Compressed, content-hashed question bank bundles (used by the ``export_questions`` and ``import_questions`` commands).
+
+A bundle is a gzip-compressed JSON Lines file: the header line, then for every model (``Category``,
+``QuestionSet``, ``Question``, ``QuestionSetMembership``) a line with its columns followed by one line
+per row, and the trailer line with the version and the numbers of rows. The name of the file contains
+the SHA-256 of the file, which is checked on import; the gzip header has no timestamp,
+so the same content always gives the same file.
+
+The version of the bank is the latest ``update_time`` of its categories, question sets and questions
+(in microseconds since the epoch). A bundle exported ``since`` a version contains only the rows changed
+after it and all the memberships of the changed question sets, so applying it to an instance synced
+to that version brings the instance to the bundle version. The rows are applied with bulk upserts and
+keep their primary keys and ``update_time``: the instances are synced from one source instance,
+and the version of an instance is computed from its own rows. Deleted rows are not synced
+(the content is soft-deleted, which changes ``update_time``).
+"""
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from django.db import connections, transaction
+from django.db.models import Max
+
+from quizapp.fixture_loader import reset_sequences
+from quizapp.models import Category, Question, QuestionSet, QuestionSetMembership
+from quizapp.render_cache import bump_generation
+
+BUNDLE_FORMAT = 1
+CHUNK_SIZE = 1000
+READ_SIZE = 1 << 16
+
+#: the models with ``update_time`` that define the version of the bank
+CONTENT_MODELS = (Category, QuestionSet, Question)
+BUNDLE_MODELS = CONTENT_MODELS + (QuestionSetMembership,)
+
+BUNDLE_NAME_RE = re.compile(r'-(?P<digest>[0-9a-f]{64})\.jsonl\.gz$')
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class BundleError(Exception):
+    """The bundle is damaged or can not be applied to this instance."""
+
+
+def to_version(value):
+    """Returns the version (microseconds since the epoch) of the update time."""
+    return (value - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def from_version(version):
+    """Returns the update time of the version."""
+    return EPOCH + datetime.timedelta(microseconds=version)
+
+
+def current_version(using='default'):
+    """Returns the version of the question bank of the database (0 for an empty bank)."""
+    versions = [model._base_manager.using(using).aggregate(latest=Max('update_time'))['latest']
+                for model in CONTENT_MODELS]
+    return max((to_version(value) for value in versions if value is not None), default=0)
+
+
+def file_digest(path):
+    """Returns the SHA-256 of the file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(READ_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def bundle_querysets(since, using='default'):
+    """Returns the querysets of the rows of the bundle by model: the rows changed after the version
+    and the memberships of the changed question sets."""
+    since_time = from_version(since)
+    querysets = {model: model._base_manager.using(using).filter(update_time__gt=since_time).order_by('pk')
+                 for model in CONTENT_MODELS}
+    querysets[QuestionSetMembership] = QuestionSetMembership._base_manager.using(using).filter(
+        question_set__in=querysets[QuestionSet].values('pk')).order_by('pk')
+    return querysets
+
+
+def export_bundle(directory, since=0, using='default'):
+    """Writes the bundle of the rows changed after the ``since`` version to the directory.
+    Returns the path of the bundle and its trailer (the version and the numbers of rows by model label)."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    version, counts = since, {}
+    descriptor, temp_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as raw, \
+                gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) as file:
+            write_line(file, {'format': BUNDLE_FORMAT, 'since': since})
+            for model, queryset in bundle_querysets(since, using).items():
+                columns = [field.attname for field in model._meta.concrete_fields]
+                write_line(file, {'model': model._meta.label, 'columns': columns})
+                counts[model._meta.label] = 0
+                update_time = columns.index('update_time') if model in CONTENT_MODELS else None
+                for row in queryset.values_list(*columns).iterator(chunk_size=CHUNK_SIZE):
+                    write_line(file, row)
+                    counts[model._meta.label] += 1
+                    if update_time is not None:
+                        version = max(version, to_version(row[update_time]))
+            trailer = {'version': version, 'counts': counts}
+            write_line(file, trailer)
+        path = directory / f'questions-{since}-{version}-{file_digest(temp_name)}.jsonl.gz'
+        os.replace(temp_name, path)
+    except BaseException:
+        os.unlink(temp_name)
+        raise
+    return path, trailer
+
+
+def write_line(file, data):
+    """Writes the JSON line to the bundle file."""
+    file.write(json.dumps(data, default=encode_value, ensure_ascii=False, separators=(',', ':')).encode())
+    file.write(b'\n')
+
+
+def encode_value(value):
+    """Encodes the date and time values (with the microseconds, they define the version)."""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+class BundleImporter:
+    """Applies the rows of the bundle with bulk upserts in chunks.
+
+    Args:
+
+        * using(str): the database alias;
+        * chunk_size(int): the number of rows of one model written at once;
+
+    """
+
+    def __init__(self, using='default', chunk_size=CHUNK_SIZE):
+        self.using = using
+        self.chunk_size = chunk_size
+        self.model = None
+        self.fields = []
+        self.rows = []
+        self.question_set_ids = []
+        self.counts = {}
+
+    def apply(self, path):
+        """Checks and applies the bundle. Returns its trailer."""
+        match = BUNDLE_NAME_RE.search(Path(path).name)
+        if match is None or file_digest(path) != match['digest']:
+            raise BundleError(f'{path}: the content does not match the hash in the file name')
+        trailer = None
+        with gzip.open(path, 'rt', encoding='utf-8') as file, transaction.atomic(using=self.using):
+            header = json.loads(file.readline())
+            if header.get('format') != BUNDLE_FORMAT:
+                raise BundleError(f'{path}: unknown bundle format {header.get("format")}')
+            if header['since'] > current_version(self.using):
+                raise BundleError(f'{path}: the bundle is exported since version {header["since"]}, '
+                                  f'this instance has version {current_version(self.using)}')
+            for line in file:
+                data = json.loads(line)
+                if isinstance(data, list):
+                    self.rows.append(data)
+                    if len(self.rows) >= self.chunk_size:
+                        self.flush()
+                elif 'model' in data:
+                    self.flush()
+                    self.start_model(data['model'], data['columns'])
+                else:
+                    self.flush()
+                    trailer = data
+            if trailer is None or trailer['counts'] != self.counts:
+                raise BundleError(f'{path}: the bundle is incomplete')
+            reset_sequences(connections[self.using], BUNDLE_MODELS)
+        # bulk writes do not send signals, so the cached fragments are invalidated here
+        for model in BUNDLE_MODELS:
+            bump_generation(model._meta.label)
+        return trailer
+
+    def start_model(self, label, columns):
+        """Starts the rows of the model. The memberships of the changed question sets are replaced."""
+        self.model = next(model for model in BUNDLE_MODELS if model._meta.label == label)
+        fields = {field.attname: field for field in self.model._meta.concrete_fields}
+        self.fields = [fields[column] for column in columns]
+        self.counts[label] = 0
+        if self.model is QuestionSetMembership:
+            for start in range(0, len(self.question_set_ids), self.chunk_size):
+                QuestionSetMembership._base_manager.using(self.using).filter(
+                    question_set_id__in=self.question_set_ids[start:start + self.chunk_size]).delete()
+
+    def flush(self):
+        """Writes the buffered rows of the current model with one bulk upsert."""
+        if not self.rows:
+            return
+        rows, self.rows = self.rows, []
+        objs = [self.model(**{field.attname: field.to_python(value) for field, value in zip(self.fields, row)})
+                for row in rows]
+        self.model._base_manager.using(self.using).bulk_create(
+            objs, update_conflicts=True, unique_fields=[self.model._meta.pk.name],
+            update_fields=[field.name for field in self.fields if not field.primary_key])
+        if self.model is QuestionSet:
+            self.question_set_ids.extend(obj.pk for obj in objs)
+        self.counts[self.model._meta.label] += len(objs)
+
+
+def import_bundle(path, using='default', chunk_size=CHUNK_SIZE):
+    """Applies the bundle to the database. Returns the trailer of the bundle."""
+    return BundleImporter(using=using, chunk_size=chunk_size).apply(path)
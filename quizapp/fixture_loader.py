@@ -0,0 +1,235 @@
+"""
+Streaming loader for large JSON fixtures (used by the ``stream_loaddata`` command).
+
+Unlike ``loaddata``, the fixture is never read into memory as a whole:
+
+    * the objects are parsed one by one from the JSON array (or JSON Lines) with ``raw_decode``;
+    * the objects are buffered by model and inserted with ``bulk_create`` in chunks, the models
+      are flushed in dependency order (a model is flushed after the models it depends on);
+    * the many-to-many rows of the objects are inserted right after the chunk of the objects;
+    * the whole load runs in one transaction with deferred constraint checks,
+      the constraints are checked before the commit;
+    * foreign keys given as natural keys (e.g. ``content_type``) are resolved once
+      and kept in an in-memory cache; primary keys (including ``QuizUser`` UUIDs) are converted by their fields.
+"""
+import gzip
+import json
+import time
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.core.serializers import sort_dependencies
+from django.db import connections, transaction
+
+from quizapp.render_cache import bump_generation
+
+READ_SIZE = 1 << 16
+SEPARATORS = ' \t\r\n,'
+
+
+def open_fixture(path):
+    """Opens the fixture file as text (gzip-compressed fixtures are supported)."""
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def iter_json_objects(stream, read_size=READ_SIZE):
+    """Yields the objects of a JSON array (or of JSON Lines) reading the stream by chunks."""
+    decoder = json.JSONDecoder()
+    buffer, position, eof, in_array = '', 0, False, False
+    while True:
+        while position < len(buffer) and buffer[position] in SEPARATORS:
+            position += 1
+        if position < len(buffer) and buffer[position] == '[' and not in_array:
+            in_array, position = True, position + 1
+            continue
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        if position < len(buffer):
+            try:
+                obj, position = decoder.raw_decode(buffer, position)
+                yield obj
+                continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        elif eof:
+            return
+        # the next object is not read completely yet
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buffer, position = buffer[position:] + chunk, 0
+
+
+@contextmanager
+def raw_date_fields(model):
+    """Disables auto_now/auto_now_add of the model fields, so the dates from the fixture are kept."""
+    changed = [(field, field.auto_now, field.auto_now_add) for field in model._meta.concrete_fields
+               if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    for field, _, _ in changed:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class StreamingFixtureLoader:
+    """Loads the fixture objects into the database with ``bulk_create`` in chunks.
+
+    Args:
+
+        * using(str): the database alias;
+        * chunk_size(int): the number of objects of one model inserted at once;
+        * update_existing(bool): update the rows with the same primary key instead of failing;
+
+    """
+
+    def __init__(self, using='default', chunk_size=1000, update_existing=False):
+        self.using = using
+        self.chunk_size = chunk_size
+        self.update_existing = update_existing
+        self.order = sort_dependencies([(app_config, None) for app_config in apps.get_app_configs()],
+                                       allow_cycles=True)
+        self.buffers = {}
+        self.m2m_buffers = {}
+        self.natural_keys = {}
+        self.counts = {}
+
+    def load(self, stream):
+        """Loads all the objects of the stream. Returns the numbers of loaded objects by model label."""
+        connection = connections[self.using]
+        with transaction.atomic(using=self.using):
+            with connection.constraint_checks_disabled():
+                for data in iter_json_objects(stream):
+                    model = apps.get_model(data['model'])
+                    self.buffers.setdefault(model, []).append(self.build_instance(model, data))
+                    if len(self.buffers[model]) >= self.chunk_size:
+                        self.flush(model)
+                self.flush_all()
+            loaded_models = [apps.get_model(label) for label in self.counts]
+            connection.check_constraints(table_names=[model._meta.db_table for model in loaded_models])
+            reset_sequences(connection, loaded_models)
+        # bulk inserts do not send signals, so the cached fragments are invalidated here
+        for model in loaded_models:
+            bump_generation(model._meta.label)
+        return self.counts
+
+    def build_instance(self, model, data):
+        """Creates a model instance (not saved) from the fixture object."""
+        opts = model._meta
+        instance = model()
+        m2m_rows = []
+        if data.get('pk') is not None:
+            setattr(instance, opts.pk.attname, opts.pk.to_python(data['pk']))
+        for name, value in data.get('fields', {}).items():
+            field = opts.get_field(name)
+            if field.many_to_many:
+                m2m_rows.append(self.build_m2m_rows(field, instance, value))
+            elif field.remote_field is not None:
+                setattr(instance, field.attname, self.resolve_foreign_key(field, value))
+            else:
+                setattr(instance, field.attname, field.to_python(value))
+        if data.get('pk') is None and self.update_existing:
+            self.find_existing_pk(model, instance)
+        # buffered after all the keys are resolved (resolving may flush the buffer of this model)
+        for through, rows in m2m_rows:
+            self.m2m_buffers.setdefault(model, {}).setdefault(through, []).extend(rows)
+        return instance
+
+    def find_existing_pk(self, model, instance):
+        """Sets the primary key of the existing row with the same natural key
+        (fixtures dumped with natural primary keys have no ``pk``)."""
+        manager = model._default_manager.db_manager(self.using)
+        if not hasattr(instance, 'natural_key') or not hasattr(manager, 'get_by_natural_key'):
+            return
+        try:
+            existing = manager.get_by_natural_key(*instance.natural_key())
+        except model.DoesNotExist:
+            return
+        setattr(instance, model._meta.pk.attname, existing.pk)
+
+    def resolve_foreign_key(self, field, value):
+        """Returns the value of the foreign key column; natural keys are resolved through the cache."""
+        if value is None:
+            return None
+        if not isinstance(value, list):
+            return field.target_field.to_python(value)
+        related_model = field.remote_field.model
+        key = (related_model, tuple(value))
+        if key not in self.natural_keys:
+            # the related object may still be waiting in the buffer
+            self.flush(related_model)
+            related = related_model._default_manager.db_manager(self.using).get_by_natural_key(*value)
+            self.natural_keys[key] = getattr(related, field.target_field.attname)
+        return self.natural_keys[key]
+
+    def build_m2m_rows(self, field, instance, values):
+        """Returns the intermediate model and the rows of the many-to-many field of the object
+        (inserted after the object, see ``insert_m2m``)."""
+        through = field.remote_field.through
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        target_field = through._meta.get_field(target)
+        return through, [(instance, source, target, self.resolve_foreign_key(target_field, value))
+                         for value in values]
+
+    def flush(self, model):
+        """Inserts the buffered objects of the model (and of the models it depends on before it)."""
+        position = self.order.index(model) if model in self.order else len(self.order)
+        for dependency in self.order[:position]:
+            if self.buffers.get(dependency):
+                self.insert(dependency)
+        if self.buffers.get(model):
+            self.insert(model)
+
+    def flush_all(self):
+        """Inserts all the buffered objects and many-to-many rows."""
+        for model in list(self.order) + [model for model in self.buffers if model not in self.order]:
+            if self.buffers.get(model):
+                self.insert(model)
+
+    def insert(self, model):
+        """Inserts the buffered objects of the model with one bulk_create."""
+        objs, self.buffers[model] = self.buffers[model], []
+        options = {}
+        if self.update_existing:
+            options = {
+                'update_conflicts': True,
+                'unique_fields': [model._meta.pk.name],
+                'update_fields': [field.name for field in model._meta.concrete_fields if not field.primary_key],
+            }
+        with raw_date_fields(model):
+            model._base_manager.db_manager(self.using).bulk_create(objs, batch_size=self.chunk_size, **options)
+        self.counts[model._meta.label] = self.counts.get(model._meta.label, 0) + len(objs)
+        self.insert_m2m(model)
+
+    def insert_m2m(self, model):
+        """Inserts the buffered many-to-many rows of the inserted objects of the model."""
+        for through, rows in self.m2m_buffers.pop(model, {}).items():
+            through._default_manager.db_manager(self.using).bulk_create(
+                [through(**{f'{source}_id': instance.pk, f'{target}_id': value})
+                 for instance, source, target, value in rows],
+                batch_size=self.chunk_size,
+            )
+            self.counts[through._meta.label] = self.counts.get(through._meta.label, 0) + len(rows)
+
+
+def reset_sequences(connection, models):
+    """Resets the primary key sequences of the models after the insert of explicit keys (as loaddata does)."""
+    sequence_sql = connection.ops.sequence_reset_sql(no_style(), models)
+    if sequence_sql:
+        with connection.cursor() as cursor:
+            for line in sequence_sql:
+                cursor.execute(line)
+
+
+def load_fixture(path, using='default', chunk_size=1000, update_existing=False):
+    """Loads the fixture file. Returns the numbers of loaded objects by model label and the load time."""
+    started = time.monotonic()
+    loader = StreamingFixtureLoader(using=using, chunk_size=chunk_size, update_existing=update_existing)
+    with open_fixture(path) as stream:
+        counts = loader.load(stream)
+    return counts, time.monotonic() - started
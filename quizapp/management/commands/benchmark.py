@@ -0,0 +1,109 @@
+"""Contains custom commands for easy launch by manage.py."""
+import json
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_databases, setup_test_environment, teardown_databases, \
+    teardown_test_environment
+
+from TestQuiz.session_backend import flush_dirty_sessions
+from quizapp.answer_stats import flush_answer_stats
+from quizapp.benchmarks import CONCURRENT_FLOWS, FLOWS, check_query_plans, compare_with_baseline, \
+    run_concurrent_flows, run_flows, seed_dataset
+from quizapp.question_bank import background_compiler
+from quizapp.render_cache import RENDER_CACHE_ALIAS
+from quizapp.startup_profile import loaded_lazy_modules, measure_startup
+
+
+class Command(BaseCommand):
+    """A command for the end-to-end load and latency benchmarks.
+    The benchmarks are run against a seeded test database, the working database is not used."""
+    help = 'Runs the end-to-end benchmarks and compares the results with a saved baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1,
+                            help='Multiplier of the seeded dataset size.')
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='The number of runs of every flow.')
+        parser.add_argument('--flow', action='append', choices=list(FLOWS) + list(CONCURRENT_FLOWS),
+                            help='Run only the given flow (can be repeated).')
+        parser.add_argument('--concurrency', type=int, default=0,
+                            help='Also run the concurrent flows through the ASGI handler with this number '
+                                 'of clients at once (the views are chosen by ASYNC_VIEWS).')
+        parser.add_argument('--baseline', type=Path,
+                            help='A JSON file with the baseline results; a regression fails the command.')
+        parser.add_argument('--save-baseline', type=Path,
+                            help='Save the results to the JSON file to use them as a baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative p95 latency growth compared with the baseline.')
+        parser.add_argument('--startup-budget', type=float, default=1.0,
+                            help='Maximum startup time (django.setup and the URLconf) of a fresh process in seconds.')
+
+    def handle(self, *args, **options):
+        # measured first, in a fresh interpreter, before the test databases are created
+        startup = measure_startup()
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        # the question bank, the render cache and the metrics snapshots of the test database are kept
+        # in a temporary directory, so the benchmark data never reaches the working cache and /metrics
+        work_dir = tempfile.TemporaryDirectory()
+        render_cache_settings = dict(settings.CACHES[RENDER_CACHE_ALIAS], LOCATION=Path(work_dir.name) / 'render')
+        test_settings = override_settings(QUESTION_BANK_PATH=Path(work_dir.name) / 'question_bank.bin',
+                                          CACHES=dict(settings.CACHES, **{RENDER_CACHE_ALIAS: render_cache_settings}),
+                                          METRICS_DIR=Path(work_dir.name) / 'metrics')
+        test_settings.enable()
+        flow_names = options['flow'] or list(FLOWS) + (list(CONCURRENT_FLOWS) if options['concurrency'] else [])
+        try:
+            data = seed_dataset(options['scale'], users=max(options['iterations'], options['concurrency'], 1))
+            background_compiler.compile_pending()
+            plan_problems = check_query_plans(data)
+            results = run_flows(data, options['iterations'], [name for name in flow_names if name in FLOWS])
+            concurrent_names = [name for name in flow_names if name in CONCURRENT_FLOWS]
+            if concurrent_names:
+                results.update(run_concurrent_flows(data, options['iterations'], max(options['concurrency'], 1),
+                                                    concurrent_names))
+        finally:
+            # the sessions and the answer statistics of the benchmark exist only in the test database
+            flush_dirty_sessions()
+            flush_answer_stats()
+            test_settings.disable()
+            work_dir.cleanup()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f'Views: {"async" if settings.ASYNC_VIEWS else "sync"}')
+        self.stdout.write(f'Startup: {(startup["setup"] + startup["urlconf"]) * 1000:.1f} ms')
+        self.print_results(results)
+        if options['save_baseline']:
+            options['save_baseline'].write_text(json.dumps(results, indent=4))
+            self.stdout.write(f'Baseline saved to {options["save_baseline"]}')
+        if options['baseline']:
+            regressions = compare_with_baseline(results, json.loads(options['baseline'].read_text()),
+                                                options['tolerance'])
+            if regressions:
+                raise CommandError('Performance regressions:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions compared with the baseline'))
+        self.check_startup(startup, options['startup_budget'])
+        if plan_problems:
+            raise CommandError('Query plans without their indexes:\n' + '\n'.join(plan_problems))
+        self.stdout.write(self.style.SUCCESS('The active object queries use their indexes'))
+
+    def check_startup(self, startup, budget):
+        """Fails the command if the startup is over the budget or imports the modules that must load lazily."""
+        problems = [f'{name} is imported at startup' for name in loaded_lazy_modules(startup['imports'])]
+        startup_time = startup['setup'] + startup['urlconf']
+        if startup_time > budget:
+            problems.append(f'startup {startup_time:.3f} s > budget {budget} s')
+        if problems:
+            raise CommandError('Startup budget exceeded:\n' + '\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('Startup is within the budget'))
+
+    def print_results(self, results):
+        """Prints the results table."""
+        header = f'{"flow":<18}{"requests":>10}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"queries":>10}'
+        self.stdout.write(header)
+        for name, result in results.items():
+            self.stdout.write(f'{name:<18}{result["requests"]:>10}{result["throughput"]:>10}{result["p50_ms"]:>10}'
+                              f'{result["p95_ms"]:>10}{result["p99_ms"]:>10}{result["queries_per_request"]:>10}')
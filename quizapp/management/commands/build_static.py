@@ -0,0 +1,36 @@
+"""Contains custom commands for easy launch by manage.py."""
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from TestQuiz.staticfiles import brotli, dropped_variants_size, page_savings
+
+
+class Command(BaseCommand):
+    """A command for the static files build: ``collectstatic`` with the fingerprinting and compressing storage
+    and the report of the static bytes of every page."""
+    help = 'Collects, fingerprints and precompresses the static files and reports the byte savings per page.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete the previously collected files (e.g. the dropped variants) first.')
+        parser.add_argument('--report-only', action='store_true',
+                            help='Only print the report for the already collected files.')
+
+    def handle(self, *args, **options):
+        if not options['report_only']:
+            call_command('collectstatic', interactive=False, clear=options['clear'],
+                         verbosity=options['verbosity'])
+        self.stdout.write(f'Unused variants not collected: {dropped_variants_size() / 1024:.1f} KB')
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('The brotli package is not installed, only gzip copies are built'))
+
+        pages = page_savings(staticfiles_storage)
+        header = f'{"page":<48}{"files":>6}{"raw KB":>10}{"gzip KB":>10}{"br KB":>10}{"saved":>8}'
+        self.stdout.write(header)
+        for template_name, totals in pages.items():
+            best = min(totals['gzip'], totals['br'])
+            saved = 1 - best / totals['identity'] if totals['identity'] else 0
+            br_size = f'{totals["br"] / 1024:.1f}' if brotli is not None else '-'
+            self.stdout.write(f'{template_name:<48}{totals["files"]:>6}{totals["identity"] / 1024:>10.1f}'
+                              f'{totals["gzip"] / 1024:>10.1f}{br_size:>10}{saved:>8.0%}')
@@ -0,0 +1,29 @@
+"""Contains custom commands for easy launch by manage.py."""
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from quizapp.question_bank import QuestionBank, compile_question_bank
+
+
+class Command(BaseCommand):
+    """A command for compiling the active question sets and their questions into the read-only
+    binary file mapped by the worker processes (the file is replaced atomically)."""
+    help = 'Compiles the active question sets into the question bank file shared by the workers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=Path, default=settings.QUESTION_BANK_PATH,
+                            help='The path of the compiled question bank (QUESTION_BANK_PATH by default).')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='The database to compile the question bank from.')
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError('QUESTION_BANK_PATH is not set, use --output')
+        path, size = compile_question_bank(options['output'], using=options['database'])
+        bank = QuestionBank(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Version {bank.version}: {bank.set_count} question sets, {bank.question_count} questions '
+            f'compiled to {path} ({size / 1024:.1f} KB)'))
@@ -0,0 +1,30 @@
+"""Contains custom commands for easy launch by manage.py."""
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from quizapp.bundles import current_version, export_bundle
+
+
+class Command(BaseCommand):
+    """A command for the export of the question bank (categories, question sets and questions)
+    to a compressed, content-hashed bundle, either full or with the changes since a version."""
+    help = 'Exports the question bank (or its changes since a version) to a compressed bundle.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=int, default=0,
+                            help='Export only the changes after this version (printed by import_questions '
+                                 'on the target instance).')
+        parser.add_argument('--output-dir', default='.',
+                            help='The directory to write the bundle to.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='The database to export the question bank from.')
+
+    def handle(self, *args, **options):
+        if options['since'] >= current_version(options['database']):
+            self.stdout.write(f'No changes since version {options["since"]}')
+            return
+        path, trailer = export_bundle(options['output_dir'], since=options['since'], using=options['database'])
+        for label, count in trailer['counts'].items():
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Version {trailer["version"]} exported to {path} '
+                                             f'({path.stat().st_size / 1024:.1f} KB)'))
@@ -0,0 +1,36 @@
+"""Contains custom commands for easy launch by manage.py."""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from quizapp.bundles import BundleError, current_version, import_bundle
+from quizapp.question_bank import compile_question_bank
+
+
+class Command(BaseCommand):
+    """A command for applying question bank bundles exported by ``export_questions``
+    (each bundle in its own transaction, in the given order). The bulk writes send no signals,
+    so the compiled question bank is recompiled by the command."""
+    help = 'Applies question bank bundles and prints the resulting version of the bank.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('bundles', nargs='*',
+                            help='Paths to the bundles, the oldest first (without bundles only the version '
+                                 'of the bank is printed).')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='The database to apply the bundles to.')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='The number of rows of one model written at once.')
+
+    def handle(self, *args, **options):
+        for path in options['bundles']:
+            try:
+                trailer = import_bundle(path, using=options['database'], chunk_size=options['chunk_size'])
+            except BundleError as err:
+                raise CommandError(str(err)) from err
+            rows = ', '.join(f'{label}: {count}' for label, count in trailer['counts'].items())
+            self.stdout.write(f'{path}: {rows}')
+        if options['bundles'] and settings.QUESTION_BANK_PATH:
+            path, size = compile_question_bank(using=options['database'])
+            self.stdout.write(f'Question bank compiled to {path} ({size / 1024:.1f} KB)')
+        self.stdout.write(self.style.SUCCESS(f'Question bank version: {current_version(options["database"])}'))
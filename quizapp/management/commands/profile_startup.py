@@ -0,0 +1,45 @@
+"""Contains custom commands for easy launch by manage.py."""
+from django.core.management.base import BaseCommand, CommandError
+
+from quizapp.startup_profile import loaded_lazy_modules, measure_startup, summarize_by_package
+
+
+class Command(BaseCommand):
+    """A command for the startup profile: the import time by module and package
+    and the ``ready()`` time by app, measured in a fresh interpreter."""
+    help = 'Measures the import and app-ready time of the Django startup per module.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20,
+                            help='The number of the slowest modules and packages to show.')
+        parser.add_argument('--settings-module',
+                            help='The settings module of the profiled startup (the current one by default).')
+        parser.add_argument('--budget', type=float,
+                            help='Fail if the startup takes longer than this number of seconds.')
+
+    def handle(self, *args, **options):
+        result = measure_startup(options['settings_module'])
+        imports = result['imports']
+        limit = options['limit']
+
+        startup = result['setup'] + result['urlconf']
+        self.stdout.write(f'Startup: {startup * 1000:.1f} ms (django.setup {result["setup"] * 1000:.1f} ms, '
+                          f'URLconf {result["urlconf"] * 1000:.1f} ms), {len(imports)} modules imported '
+                          f'in {sum(item[1] for item in imports) * 1000:.1f} ms')
+
+        self.stdout.write(f'\n{"package":<40}{"self ms":>10}')
+        for package, self_time in summarize_by_package(imports)[:limit]:
+            self.stdout.write(f'{package:<40}{self_time * 1000:>10.1f}')
+
+        self.stdout.write(f'\n{"module":<60}{"self ms":>10}{"cumul. ms":>10}')
+        for name, self_time, cumulative in sorted(imports, key=lambda item: item[2], reverse=True)[:limit]:
+            self.stdout.write(f'{name:<60}{self_time * 1000:>10.1f}{cumulative * 1000:>10.1f}')
+
+        self.stdout.write(f'\n{"app":<40}{"ready ms":>10}')
+        for label, ready_time in sorted(result['ready'].items(), key=lambda item: item[1], reverse=True):
+            self.stdout.write(f'{label:<40}{ready_time * 1000:>10.1f}')
+
+        for name in loaded_lazy_modules(imports):
+            self.stdout.write(self.style.WARNING(f'{name} is imported at startup, it should load on first use'))
+        if options['budget'] is not None and startup > options['budget']:
+            raise CommandError(f'Startup took {startup:.3f} s, the budget is {options["budget"]} s')
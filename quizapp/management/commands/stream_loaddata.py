@@ -0,0 +1,36 @@
+"""Contains custom commands for easy launch by manage.py."""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from quizapp.fixture_loader import load_fixture
+from quizapp.question_bank import COMPILED_MODELS, compile_question_bank
+
+
+class Command(BaseCommand):
+    """A command for loading large JSON fixtures without reading them into memory.
+    The objects are inserted with bulk_create in chunks, so model save() and signals are not run
+    (the compiled question bank is recompiled by the command if the fixture has quiz content)."""
+    help = 'Loads a JSON (or JSON Lines, optionally gzip-compressed) fixture incrementally with bulk inserts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixture', help='Path to the fixture file (.json, .jsonl, .json.gz).')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='The database to load the fixture into.')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='The number of objects of one model inserted at once.')
+        parser.add_argument('--update-existing', action='store_true',
+                            help='Update the rows with the same primary keys instead of failing.')
+
+    def handle(self, *args, **options):
+        counts, elapsed = load_fixture(options['fixture'], using=options['database'],
+                                       chunk_size=options['chunk_size'],
+                                       update_existing=options['update_existing'])
+        for label, count in counts.items():
+            self.stdout.write(f'{label}: {count}')
+        if settings.QUESTION_BANK_PATH and {model._meta.label for model in COMPILED_MODELS} & counts.keys():
+            path, size = compile_question_bank(using=options['database'])
+            self.stdout.write(f'Question bank compiled to {path} ({size / 1024:.1f} KB)')
+        total = sum(counts.values())
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f'Loaded {total} objects in {elapsed:.2f} s ({rate:.0f} objects/s)'))
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.4 on 2026-10-19 14:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizapp', '0009_questionset_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='quizapp.question', verbose_name='вопрос')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='ответов')),
+                ('correct', models.PositiveIntegerField(default=0, verbose_name='правильных ответов')),
+                ('option_1', models.PositiveIntegerField(default=0, verbose_name='выбран ответ №1')),
+                ('option_2', models.PositiveIntegerField(default=0, verbose_name='выбран ответ №2')),
+                ('option_3', models.PositiveIntegerField(default=0, verbose_name='выбран ответ №3')),
+                ('option_4', models.PositiveIntegerField(default=0, verbose_name='выбран ответ №4')),
+            ],
+            options={
+                'verbose_name': 'Статистика вопроса',
+                'verbose_name_plural': 'Статистика вопросов',
+            },
+        ),
+    ]
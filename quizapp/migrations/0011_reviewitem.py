@@ -0,0 +1,43 @@
+# Generated by Django 4.1.4 on 2026-10-19 14:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quizapp', '0010_questionstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='время повторения')),
+                ('interval', models.FloatField(default=0, verbose_name='интервал, дней')),
+                ('ease', models.FloatField(default=2.5, verbose_name='коэффициент лёгкости')),
+                ('repetitions', models.PositiveIntegerField(default=0, verbose_name='правильных ответов подряд')),
+                ('lapses', models.PositiveIntegerField(default=0, verbose_name='ошибок')),
+                ('last_review_time', models.DateTimeField(default=django.utils.timezone.now, verbose_name='время последнего ответа')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_items', to='quizapp.question', verbose_name='вопрос')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_items', to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'verbose_name': 'Повторение вопроса',
+                'verbose_name_plural': 'Повторение вопросов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reviewitem',
+            index=models.Index(fields=['user', 'due_at'], name='review_user_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reviewitem',
+            constraint=models.UniqueConstraint(fields=('user', 'question'), name='review_user_question_unique'),
+        ),
+    ]
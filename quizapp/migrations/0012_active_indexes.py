@@ -0,0 +1,31 @@
+# Generated by Django 4.1.4 on 2026-10-19 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizapp', '0011_reviewitem'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='активен'),
+        ),
+        migrations.AlterField(
+            model_name='questionset',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='активен'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['id'], name='category_active_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='questionset',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['id'], name='questionset_active_id_idx'),
+        ),
+    ]
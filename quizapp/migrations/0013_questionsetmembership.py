@@ -0,0 +1,105 @@
+# Generated by Django 4.1.4 on 2026-10-19 14:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def convert_generic_links(apps, schema_editor):
+    """Adds the questions linked to the question sets with the generic foreign key to the sets
+    (in the order of their ids)."""
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Question = apps.get_model('quizapp', 'Question')
+    QuestionSet = apps.get_model('quizapp', 'QuestionSet')
+    QuestionSetMembership = apps.get_model('quizapp', 'QuestionSetMembership')
+    question_set_type = ContentType.objects.filter(app_label='quizapp', model='questionset').first()
+    if question_set_type is None:
+        return
+    question_set_ids = set(QuestionSet.objects.values_list('id', flat=True))
+    positions = {}
+    memberships = []
+    links = Question.objects.filter(content_type=question_set_type).order_by('object_id', 'id').values_list(
+        'id', 'object_id')
+    for question_id, question_set_id in links.iterator():
+        if question_set_id in question_set_ids:
+            positions[question_set_id] = positions.get(question_set_id, 0) + 1
+            memberships.append(QuestionSetMembership(question_set_id=question_set_id, question_id=question_id,
+                                                     position=positions[question_set_id]))
+    QuestionSetMembership.objects.bulk_create(memberships, batch_size=1000)
+
+
+def restore_generic_links(apps, schema_editor):
+    """Links every question to its first question set with the generic foreign key
+    (a question can only be linked to one set; the questions outside the sets are linked to no set,
+    such links are skipped by ``convert_generic_links``)."""
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Question = apps.get_model('quizapp', 'Question')
+    QuestionSetMembership = apps.get_model('quizapp', 'QuestionSetMembership')
+    question_set_type, _ = ContentType.objects.get_or_create(app_label='quizapp', model='questionset')
+    first_sets = {}
+    memberships = QuestionSetMembership.objects.order_by('question_set_id', 'position', 'question_id').values_list(
+        'question_id', 'question_set_id')
+    for question_id, question_set_id in memberships.iterator():
+        first_sets.setdefault(question_id, question_set_id)
+    questions = list(Question.objects.only('id'))
+    for question in questions:
+        question.content_type_id = question_set_type.pk
+        question.object_id = first_sets.get(question.id, 0)
+    Question.objects.bulk_update(questions, ['content_type', 'object_id'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('quizapp', '0012_active_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSetMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0, verbose_name='позиция')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='quizapp.question', verbose_name='вопрос')),
+                ('question_set', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='quizapp.questionset', verbose_name='набор тестов')),
+            ],
+            options={
+                'verbose_name': 'Вопрос набора',
+                'verbose_name_plural': 'Вопросы набора',
+                'ordering': ('question_set_id', 'position', 'question_id'),
+            },
+        ),
+        migrations.AddField(
+            model_name='questionset',
+            name='questions',
+            field=models.ManyToManyField(related_name='question_sets', through='quizapp.QuestionSetMembership', to='quizapp.question', verbose_name='вопросы'),
+        ),
+        migrations.AddIndex(
+            model_name='questionsetmembership',
+            index=models.Index(fields=['question_set', 'position', 'question'], name='questionset_position_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='questionsetmembership',
+            constraint=models.UniqueConstraint(fields=('question_set', 'question'), name='questionset_question_unique'),
+        ),
+        # nullable, so that the columns can be added back to the existing rows when the migration is reversed
+        migrations.AlterField(
+            model_name='question',
+            name='content_type',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='object_id',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.RunPython(convert_generic_links, restore_generic_links),
+        migrations.RemoveField(
+            model_name='question',
+            name='content_type',
+        ),
+        migrations.RemoveField(
+            model_name='question',
+            name='object_id',
+        ),
+    ]
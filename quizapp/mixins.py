@@ -1,7 +1,20 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.decorators import user_passes_test
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import InvalidPage
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.utils.translation import gettext as _
 from django.views.generic.base import ContextMixin, View
 
+from TestQuiz.database import read_from_replica
+
 
 class TitleMixin(ContextMixin):
     """Adds the page title to the view"""
@@ -17,3 +30,188 @@ class AuthorizedOnlyDispatchMixin(View):
     @method_decorator(user_passes_test(lambda u: u.is_authenticated))
     def dispatch(self, request, *args, **kwargs):
         return super().dispatch(request, *args, **kwargs)
+
+
+class ReadReplicaMixin(View):
+    """The view only reads data, so its queries are routed to the read replica (if configured).
+    The response is rendered inside the block because the querysets are evaluated by the template."""
+    def dispatch(self, request, *args, **kwargs):
+        with read_from_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
+
+
+class ValidatorQuerysetMixin(View):
+    """The validator query of the conditional GET mixins.
+
+    ``validator_queryset`` is a callable that takes the URL keyword arguments of the view and returns
+    the values queryset of one row with 'last_modified' and the other values the page depends on
+    (e.g. the number of the related objects). It is required, a view without it is not created.
+    """
+    validator_queryset = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        if cls.validator_queryset is None and initkwargs.get('validator_queryset') is None:
+            raise ImproperlyConfigured(f'{cls.__name__} is missing the validator_queryset. '
+                                       f'Define {cls.__name__}.validator_queryset.')
+        return super().as_view(**initkwargs)
+
+    def get_validator_queryset(self):
+        """Returns the validator queryset for the URL keyword arguments of the request."""
+        return self.validator_queryset(**self.kwargs)
+
+
+class ConditionalGetMixin(ValidatorQuerysetMixin):
+    """Answers GET requests with 304 Not Modified if the page has not changed since the client got it.
+
+    The validators (ETag and Last-Modified) come from one cheap query (``validator_queryset``)
+    made before the view loads or renders anything. The pages show the user and contain the CSRF token,
+    so the ETag includes both, and the responses are private and vary by Cookie.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        row = self.get_validator_queryset().first()
+        if row is None:
+            # no object, the view answers with its usual 404
+            return super().dispatch(request, *args, **kwargs)
+        etag, last_modified = make_validators(request, row, request.user.pk)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+
+class AsyncConditionalGetMixin(ValidatorQuerysetMixin):
+    """Async counterpart of ``ConditionalGetMixin`` (the validator query is made with the async ORM)."""
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await super().dispatch(request, *args, **kwargs)
+        row = await self.get_validator_queryset().afirst()
+        if row is None:
+            return await super().dispatch(request, *args, **kwargs)
+        user_pk = await sync_to_async(lambda: request.user.pk)()
+        etag, last_modified = make_validators(request, row, user_pk)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await super().dispatch(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+
+def make_validators(request, row, user_pk):
+    """Returns the ETag and the Last-Modified timestamp of the page from the validator row."""
+    last_modified = int(row['last_modified'].timestamp())
+    state = [user_pk, request.COOKIES.get(settings.CSRF_COOKIE_NAME), *sorted(row.items(), key=str)]
+    etag = '"%s"' % hashlib.md5(repr(state).encode(), usedforsecurity=False).hexdigest()
+    return etag, last_modified
+
+
+def set_validators(response, etag, last_modified):
+    """Adds the validators and the private caching headers to the response."""
+    if response.status_code in (200, 304):
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+async def aload_session(request):
+    """Loads the session of the request for an async view (the session backend may query the database)."""
+    aload = getattr(request.session, 'aload', None)
+    if aload is not None:
+        await aload()
+    else:
+        await sync_to_async(request.session.keys)()
+
+
+class AsyncAuthorizedOnlyDispatchMixin(View):
+    """Access to the async view only for authorized users."""
+    async def dispatch(self, request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncReadReplicaMixin(View):
+    """Async counterpart of ``ReadReplicaMixin``: the queries and the rendering of the view
+    are routed to the read replica (the rendering runs in a worker thread)."""
+    async def dispatch(self, request, *args, **kwargs):
+        with read_from_replica():
+            response = await super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                await sync_to_async(response.render)()
+        return response
+
+
+class AsyncListMixin:
+    """Async ``get`` of a ``ListView``: the objects of the page are loaded with the async ORM
+    before the context is built, so only the rendering touches the database synchronously."""
+
+    async def aget_queryset(self):
+        """Returns the queryset of the view; override to run async preparations."""
+        return self.get_queryset()
+
+    async def get(self, request, *args, **kwargs):
+        queryset = await self.aget_queryset()
+        page_size = self.get_paginate_by(queryset)
+        if page_size:
+            self.page = await self.apaginate_queryset(queryset, page_size)
+            self.object_list = queryset
+        else:
+            self.object_list = [obj async for obj in queryset]
+        return self.render_to_response(self.get_context_data())
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """Async counterpart of ``MultipleObjectMixin.paginate_queryset``."""
+        paginator = self.get_paginator(queryset, page_size, orphans=self.get_paginate_orphans(),
+                                       allow_empty_first_page=self.get_allow_empty())
+        paginator.count = await queryset.acount()
+        page = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            page_number = int(page)
+        except ValueError:
+            if page != 'last':
+                raise Http404(_('Page is not “last”, nor can it be converted to an int.'))
+            page_number = paginator.num_pages
+        try:
+            page = paginator.page(page_number)
+        except InvalidPage as err:
+            raise Http404(_('Invalid page (%(page_number)s): %(message)s') % {
+                'page_number': page_number, 'message': str(err)})
+        page.object_list = [obj async for obj in page.object_list]
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def paginate_queryset(self, queryset, page_size):
+        """Returns the page loaded by ``get``."""
+        return self.page
+
+
+class AsyncDetailMixin:
+    """Async ``get`` of a ``DetailView``: the object is loaded with the async ORM."""
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    async def aget_object(self):
+        """Async counterpart of ``SingleObjectMixin.get_object``."""
+        queryset = self.get_queryset()
+        pk = self.kwargs.get(self.pk_url_kwarg)
+        slug = self.kwargs.get(self.slug_url_kwarg)
+        if pk is not None:
+            queryset = queryset.filter(pk=pk)
+        if slug is not None and (pk is None or self.query_pk_and_slug):
+            queryset = queryset.filter(**{self.get_slug_field(): slug})
+        if pk is None and slug is None:
+            raise AttributeError(f'Generic detail view {self.__class__.__name__} must be called with '
+                                 f'either an object pk or a slug in the URLconf.')
+        try:
+            return await queryset.aget()
+        except queryset.model.DoesNotExist:
+            raise Http404(_('No %(verbose_name)s found matching the query') %
+                          {'verbose_name': queryset.model._meta.verbose_name})
@@ -1,26 +1,70 @@
 import logging
 from logging import Logger
 
-from django.contrib.contenttypes.fields import GenericRelation, GenericForeignKey
-from django.contrib.contenttypes.models import ContentType
+from django.conf import settings
 from django.db import IntegrityError
 from django.db import models, transaction
+from django.dispatch import Signal
 from django.urls import reverse
 from django.utils import timezone
-from pytils.translit import slugify
 from django.core.exceptions import ValidationError
 
 logger: Logger = logging.getLogger(__name__)
 
 
+#: sent once by ``SoftDeleteQuerySet.soft_delete()``/``restore()`` (the bulk UPDATE sends no ``post_save``)
+#: with the arguments ``sender`` (the model), ``ids`` (of the changed objects) and ``is_active``
+active_changed = Signal()
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    """The queryset of a model with the ``is_active`` and ``update_time`` fields
+    that deactivates (soft-deletes) and restores its objects with a set-based UPDATE."""
+
+    #: the number of objects updated by one UPDATE statement
+    batch_size = 500
+
+    def soft_delete(self):
+        """Deactivates the active objects of the queryset. Returns the number of the deactivated objects."""
+        return self.set_active(False)
+
+    def restore(self):
+        """Activates the deactivated objects of the queryset. Returns the number of the activated objects."""
+        return self.set_active(True)
+
+    def set_active(self, is_active):
+        """Sets ``is_active`` and ``update_time`` of the objects of the queryset with one UPDATE
+        per ``batch_size`` objects (no ``save()``, no slug changes) and sends ``active_changed`` once."""
+        ids = list(self.exclude(is_active=is_active).order_by().values_list('pk', flat=True))
+        now = timezone.now()
+        for start in range(0, len(ids), self.batch_size):
+            self.model._base_manager.using(self.db).filter(pk__in=ids[start:start + self.batch_size]).update(
+                is_active=is_active, update_time=now)
+        if ids:
+            active_changed.send(sender=self.model, ids=ids, is_active=is_active)
+        return len(ids)
+
+
+class ActiveManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """The manager of the active (not soft-deleted) objects.
+    The queries are served by the partial ``WHERE is_active`` indexes of the models."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_active=True)
+
+
 class BaseModel(models.Model):
     """Base class for Category and QuestionSet models."""
     title = models.CharField(max_length=250, unique=True, verbose_name='наименование')
     create_time = models.DateTimeField(default=timezone.now, verbose_name="время создания")
     update_time = models.DateTimeField(default=timezone.now, verbose_name="время изменения")
-    is_active = models.BooleanField(default=True, db_index=True, verbose_name="активен")
+    is_active = models.BooleanField(default=True, verbose_name="активен")
     slug = models.SlugField(max_length=255, unique=True, db_index=True, verbose_name="URL")
 
+    # the default manager (used by the admin and the relations) sees the deactivated objects too
+    objects = SoftDeleteQuerySet.as_manager()
+    active = ActiveManager()
+
     class Meta:
         """Specifying an abstract class."""
         abstract = True
@@ -34,6 +78,8 @@ class BaseModel(models.Model):
         """Automatic filling in 'update_time' and 'slug' fields when saving."""
         self.update_time = timezone.now()
         if slugified_field:
+            # imported on first use to keep it out of the startup
+            from pytils.translit import slugify
             try:
                 with transaction.atomic():
                     self.slug = old_slug = slugify(slugified_field)
@@ -61,8 +107,10 @@ class Category(BaseModel):
     description = models.TextField(blank=True, verbose_name="описание")
 
     class Meta:
-        """Ordering categories according to their id."""
+        """Ordering categories according to their id.
+        The index is used to list the active categories in this order."""
         ordering = ('id',)
+        indexes = [models.Index(fields=['id'], condition=models.Q(is_active=True), name='category_active_id_idx')]
         verbose_name = 'Категория'
         verbose_name_plural = 'Категории'
 
@@ -91,10 +139,6 @@ class Question(models.Model):
     answer_03 = models.CharField(max_length=150, blank=True, verbose_name="ответ №3")
     answer_04 = models.CharField(max_length=150, blank=True, verbose_name="ответ №4")
 
-    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, )
-    object_id = models.PositiveIntegerField()
-    content_object = GenericForeignKey('content_type', 'object_id')
-
     class Meta:
         """Ordering questions according to their id."""
         ordering = ('id',)
@@ -105,6 +149,11 @@ class Question(models.Model):
         """Forms and returns a printable representation of the object."""
         return str(self.text)
 
+    def save(self, *args, **kwargs):
+        """Automatic filling in the update_time field when saving."""
+        self.update_time = timezone.now()
+        super().save(*args, **kwargs)
+
     def clean(self):
         """Checking the values passed in the model field."""
         self.right_answers_processing()
@@ -137,15 +186,79 @@ class Question(models.Model):
                 {'right_answers': msg}) from err
 
 
+class QuestionStats(models.Model):
+    """Answer statistics of the question (accumulated by ``quizapp.answer_stats``)."""
+
+    #: the share of correct answers of an easy / a hard question
+    EASY_RATE = 0.85
+    HARD_RATE = 0.35
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='stats',
+                                    verbose_name="вопрос")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="ответов")
+    correct = models.PositiveIntegerField(default=0, verbose_name="правильных ответов")
+    option_1 = models.PositiveIntegerField(default=0, verbose_name="выбран ответ №1")
+    option_2 = models.PositiveIntegerField(default=0, verbose_name="выбран ответ №2")
+    option_3 = models.PositiveIntegerField(default=0, verbose_name="выбран ответ №3")
+    option_4 = models.PositiveIntegerField(default=0, verbose_name="выбран ответ №4")
+
+    class Meta:
+        verbose_name = 'Статистика вопроса'
+        verbose_name_plural = 'Статистика вопросов'
+
+    def __str__(self):
+        """Forms and returns a printable representation of the object."""
+        return f'{self.question_id}: {self.correct}/{self.attempts}'
+
+    @classmethod
+    def difficulty(cls, attempts, correct):
+        """Returns the difficulty label for the number of answers and correct answers."""
+        if not attempts:
+            return 'нет ответов'
+        rate = correct / attempts
+        if rate >= cls.EASY_RATE:
+            return 'лёгкий'
+        if rate <= cls.HARD_RATE:
+            return 'сложный'
+        return 'средний'
+
+
+class ReviewItem(models.Model):
+    """The spaced repetition schedule of the question for the user (updated by ``quizapp.reviews``)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='review_items',
+                             verbose_name='пользователь')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='review_items',
+                                 verbose_name="вопрос")
+    due_at = models.DateTimeField(default=timezone.now, verbose_name="время повторения")
+    interval = models.FloatField(default=0, verbose_name="интервал, дней")
+    ease = models.FloatField(default=2.5, verbose_name="коэффициент лёгкости")
+    repetitions = models.PositiveIntegerField(default=0, verbose_name="правильных ответов подряд")
+    lapses = models.PositiveIntegerField(default=0, verbose_name="ошибок")
+    last_review_time = models.DateTimeField(default=timezone.now, verbose_name="время последнего ответа")
+
+    class Meta:
+        """The index is used to fetch the questions due for the user in the order of their due time."""
+        constraints = [models.UniqueConstraint(fields=['user', 'question'], name='review_user_question_unique')]
+        indexes = [models.Index(fields=['user', 'due_at'], name='review_user_due_idx')]
+        verbose_name = 'Повторение вопроса'
+        verbose_name_plural = 'Повторение вопросов'
+
+    def __str__(self):
+        """Forms and returns a printable representation of the object."""
+        return f'{self.user_id}: {self.question_id} | {self.due_at:%Y-%m-%d %H:%M}'
+
+
 class QuestionSet(BaseModel):
     """The model for the question set."""
-    questions = GenericRelation('Question', content_type_field='content_type',
-                                         object_id_field='object_id')
+    questions = models.ManyToManyField(Question, through='QuestionSetMembership', related_name='question_sets',
+                                       verbose_name="вопросы")
     description = models.TextField(blank=True, verbose_name="описание")
 
     class Meta:
-        """Ordering questions according to their id."""
+        """Ordering question sets according to their id.
+        The index is used to list the active question sets in this order."""
         ordering = ('id',)
+        indexes = [models.Index(fields=['id'], condition=models.Q(is_active=True), name='questionset_active_id_idx')]
         verbose_name = 'Набор тестов'
         verbose_name_plural = 'Наборы тестов'
 
@@ -157,3 +270,33 @@ class QuestionSet(BaseModel):
     def get_absolute_url(self, urlpattern_name='questionset_read'):
         """Returns formed url for the object."""
         return super().get_absolute_url(urlpattern_name=urlpattern_name)
+
+
+class QuestionSetMembership(models.Model):
+    """The question in the question set at the given position (a question can be in several sets)."""
+    question_set = models.ForeignKey(QuestionSet, on_delete=models.CASCADE, related_name='memberships',
+                                     verbose_name="набор тестов")
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='memberships',
+                                 verbose_name="вопрос")
+    position = models.PositiveIntegerField(default=0, verbose_name="позиция")
+
+    class Meta:
+        """Ordering the questions of the set according to their position.
+        The index covers the loading of the question ids of the set in this order."""
+        ordering = ('question_set_id', 'position', 'question_id')
+        constraints = [models.UniqueConstraint(fields=['question_set', 'question'],
+                                               name='questionset_question_unique')]
+        indexes = [models.Index(fields=['question_set', 'position', 'question'],
+                                name='questionset_position_idx')]
+        verbose_name = 'Вопрос набора'
+        verbose_name_plural = 'Вопросы набора'
+
+    def __str__(self):
+        """Forms and returns a printable representation of the object."""
+        return f'{self.question_set_id}: {self.position} | {self.question_id}'
+
+    @classmethod
+    def question_ids(cls, question_set_id):
+        """Returns the queryset of the question ids of the set in the order of their positions."""
+        return cls.objects.filter(question_set_id=question_set_id).order_by('position', 'question_id').values_list(
+            'question_id', flat=True)
@@ -0,0 +1,323 @@
+"""
+Compiled question bank shared by the worker processes (built by the ``compile_questions`` command).
+
+The active question sets with their questions are compiled into one read-only binary file:
+
+* the header (``HEADER``): the magic, the format, the version of the bank (see ``quizapp.bundles``),
+  the numbers of the sets and the questions and the offsets of the sections;
+* the table of the sets (``SET_RECORD``) sorted by the UTF-8 slug: the id, the slug and the title
+  (offset and length in the strings section), the first index and the number of its question ids;
+* the question ids of the sets (unsigned 64-bit) in the order of their positions in the sets;
+* the table of the questions (``QUESTION_RECORD``) sorted by the id: the id, the text and the four
+  answers (offset and length in the strings section) and the bitmask of the right answers;
+* the packed UTF-8 strings (every distinct string is stored once).
+
+The workers ``mmap`` the file and look the sets and the questions up with a binary search over the
+tables, only the returned strings are decoded. The file is replaced atomically (a temporary file
+and ``os.replace``), a worker checks it every QUESTION_BANK_CHECK_INTERVAL seconds and maps the
+new file when it is replaced (the old mapping stays valid until it is released). Saving, deleting,
+soft deleting or restoring the content recompiles the bank in a background thread, the changes made
+within QUESTION_BANK_COMPILE_DELAY seconds are compiled at once.
+"""
+import bisect
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models.signals import post_delete, post_save
+
+from quizapp.bundles import current_version
+from quizapp.models import Question, QuestionSet, QuestionSetMembership, active_changed
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'QBNK'
+BANK_FORMAT = 1
+
+#: magic, format, reserved, version, numbers of the sets and the questions,
+#: offsets of the sets, the question ids of the sets, the questions and the strings
+HEADER = struct.Struct('<4sHHqIIIIII')
+#: id, slug (offset, length), title (offset, length), first question id index, number of the questions
+SET_RECORD = struct.Struct('<Q6I')
+#: id, text and the answers 1-4 (offset, length), bitmask of the right answers (bit 0 is the answer 1)
+QUESTION_RECORD = struct.Struct('<Q10IB7x')
+QUESTION_ID = struct.Struct('<Q')
+
+ANSWER_FIELDS = ('answer_01', 'answer_02', 'answer_03', 'answer_04')
+#: the models compiled into the bank (the bulk writes to them must recompile the bank)
+COMPILED_MODELS = (QuestionSet, Question, QuestionSetMembership)
+
+BankQuestionSet = namedtuple('BankQuestionSet', 'id slug title question_ids')
+BankQuestion = namedtuple('BankQuestion', ('id', 'text') + ANSWER_FIELDS + ('right_answers',))
+
+
+class QuestionBankError(Exception):
+    """The file is not a compiled question bank of the supported format."""
+
+
+def right_answers_mask(right_answers):
+    """Returns the bitmask of the right answers (e.g. ``'1, 3'`` => ``0b101``)."""
+    mask = 0
+    for number in re.findall(r'\d+', right_answers):
+        if 1 <= int(number) <= len(ANSWER_FIELDS):
+            mask |= 1 << (int(number) - 1)
+    return mask
+
+
+class StringPacker:
+    """Packs the distinct strings one after another. Returns their (offset, length) in the packed bytes."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.refs = {}
+
+    def add(self, value):
+        if value not in self.refs:
+            encoded = value.encode()
+            self.refs[value] = (len(self.data), len(encoded))
+            self.data += encoded
+        return self.refs[value]
+
+
+def align(data, size=8):
+    """Pads the data with zeros to the multiple of the size."""
+    data += bytes(-len(data) % size)
+
+
+def build_question_bank(using='default'):
+    """Returns the compiled question bank of the active question sets of the database (bytes)."""
+    question_sets = sorted(QuestionSet.active.using(using).values_list('id', 'slug', 'title'),
+                           key=lambda row: row[1].encode())
+    members = {}
+    for question_set_id, question_id in QuestionSetMembership.objects.using(using).filter(
+            question_set__is_active=True).order_by('question_set_id', 'position', 'question_id').values_list(
+            'question_set_id', 'question_id'):
+        members.setdefault(question_set_id, []).append(question_id)
+    questions = Question.objects.using(using).filter(
+        question_sets__is_active=True).distinct().order_by('id').values_list(
+        'id', 'text', *ANSWER_FIELDS, 'right_answers')
+
+    strings = StringPacker()
+    sets_data, members_data, questions_data = bytearray(), bytearray(), bytearray()
+    member_count = 0
+    for question_set_id, slug, title in question_sets:
+        question_ids = members.get(question_set_id, [])
+        sets_data += SET_RECORD.pack(question_set_id, *strings.add(slug), *strings.add(title),
+                                     member_count, len(question_ids))
+        for question_id in question_ids:
+            members_data += QUESTION_ID.pack(question_id)
+        member_count += len(question_ids)
+    question_count = 0
+    for question_id, text, *answers, right_answers in questions.iterator():
+        refs = [ref for value in [text, *answers] for ref in strings.add(value)]
+        questions_data += QUESTION_RECORD.pack(question_id, *refs, right_answers_mask(right_answers))
+        question_count += 1
+
+    data = bytearray(HEADER.size)
+    align(data)
+    offsets = []
+    for section in (sets_data, members_data, questions_data, strings.data):
+        offsets.append(len(data))
+        data += section
+        align(data)
+    HEADER.pack_into(data, 0, MAGIC, BANK_FORMAT, 0, current_version(using), len(question_sets), question_count,
+                     *offsets)
+    return bytes(data)
+
+
+def compile_question_bank(path=None, using='default'):
+    """Compiles the question bank of the database and atomically replaces the file with it.
+    Returns the path and the size of the file."""
+    path = Path(path or settings.QUESTION_BANK_PATH)
+    data = build_question_bank(using=using)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_name, 0o644)
+        os.replace(temp_name, path)
+    except BaseException:
+        os.unlink(temp_name)
+        raise
+    return path, len(data)
+
+
+class QuestionBank:
+    """The compiled question bank mapped into the memory (read-only).
+
+    Args:
+
+        * path(str): the path of the compiled question bank;
+
+    Raises ``QuestionBankError`` if the file is not a compiled question bank.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size < HEADER.size:
+                raise QuestionBankError(f'{path}: the file is too short')
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, bank_format, _, self.version, self.set_count, self.question_count, sets_offset, \
+            members_offset, questions_offset, strings_offset = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or bank_format != BANK_FORMAT:
+            raise QuestionBankError(f'{path}: not a compiled question bank of format {BANK_FORMAT}')
+        view = memoryview(self.buffer)
+        self.sets = view[sets_offset:sets_offset + self.set_count * SET_RECORD.size]
+        self.members = view[members_offset:questions_offset]
+        self.questions = view[questions_offset:questions_offset + self.question_count * QUESTION_RECORD.size]
+        self.strings = view[strings_offset:]
+
+    def string(self, offset, length):
+        """Decodes the string stored in the strings section."""
+        return str(self.strings[offset:offset + length], 'utf-8')
+
+    def question_set(self, slug):
+        """Returns the ``BankQuestionSet`` with the slug (None if there is no such active set)."""
+        key = slug.encode()
+        index = bisect.bisect_left(range(self.set_count), key, key=self.set_slug)
+        if index == self.set_count or self.set_slug(index) != key:
+            return None
+        question_set_id, slug_offset, slug_length, title_offset, title_length, first, count = \
+            SET_RECORD.unpack_from(self.sets, index * SET_RECORD.size)
+        question_ids = self.members[first * QUESTION_ID.size:(first + count) * QUESTION_ID.size].cast('Q').tolist()
+        return BankQuestionSet(question_set_id, slug, self.string(title_offset, title_length), question_ids)
+
+    def set_slug(self, index):
+        """Returns the UTF-8 slug of the set with the index in the table."""
+        _, offset, length = struct.unpack_from('<QII', self.sets, index * SET_RECORD.size)
+        return bytes(self.strings[offset:offset + length])
+
+    def question(self, question_id):
+        """Returns the ``BankQuestion`` with the id (None if it is not a question of an active set)."""
+        index = bisect.bisect_left(range(self.question_count), question_id, key=self.question_id)
+        if index == self.question_count or self.question_id(index) != question_id:
+            return None
+        _, *refs, mask = QUESTION_RECORD.unpack_from(self.questions, index * QUESTION_RECORD.size)
+        values = [self.string(offset, length) for offset, length in zip(refs[::2], refs[1::2])]
+        right_answers = ','.join(str(number) for number in range(1, len(ANSWER_FIELDS) + 1)
+                                 if mask & (1 << (number - 1)))
+        return BankQuestion(question_id, *values, right_answers)
+
+    def question_id(self, index):
+        """Returns the id of the question with the index in the table."""
+        return QUESTION_ID.unpack_from(self.questions, index * QUESTION_RECORD.size)[0]
+
+
+class QuestionBankLoader:
+    """Keeps the question bank of the process mapped and maps the file again when it is replaced."""
+
+    def __init__(self):
+        self.bank = None
+        self.file_key = None
+        self.checked = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        """Returns the current ``QuestionBank`` (None if it is disabled, not compiled or damaged)."""
+        path = settings.QUESTION_BANK_PATH
+        if not path:
+            return None
+        now = time.monotonic()
+        if self.checked is None or now - self.checked >= settings.QUESTION_BANK_CHECK_INTERVAL:
+            with self.lock:
+                self.checked = now
+                self.reload(path)
+        return self.bank
+
+    def reload(self, path):
+        """Maps the file if it is not the one already mapped (a new file has a new inode)."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.bank, self.file_key = None, None
+            return
+        file_key = (str(path), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_key == self.file_key:
+            return
+        try:
+            self.bank = QuestionBank(path)
+        except (OSError, ValueError, QuestionBankError) as err:
+            logger.error('Failed to load the compiled question bank: %s', err)
+            self.bank = None
+        self.file_key = file_key
+
+
+loader = QuestionBankLoader()
+
+
+def get_question_bank():
+    """Returns the compiled question bank of the process (None if it is not available)."""
+    return loader.get()
+
+
+class BackgroundCompiler:
+    """A daemon thread that recompiles the question bank after the content is changed."""
+
+    def __init__(self):
+        self.thread = None
+        self.pending = threading.Event()
+        self.start_lock = threading.Lock()
+        self.compile_lock = threading.Lock()
+
+    def request(self):
+        """Schedules the recompilation (the thread is started once per process)."""
+        self.pending.set()
+        if self.thread is None:
+            with self.start_lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name='question-bank-compiler', daemon=True)
+                    self.thread.start()
+
+    def run(self):
+        """Recompiles the bank QUESTION_BANK_COMPILE_DELAY seconds after the first of the collected changes."""
+        while True:
+            self.pending.wait()
+            time.sleep(settings.QUESTION_BANK_COMPILE_DELAY)
+            try:
+                self.compile_pending()
+            except (DatabaseError, OSError) as err:
+                logger.error('Failed to compile the question bank: %s', err)
+            finally:
+                connection.close()
+
+    def compile_pending(self):
+        """Compiles the bank now if the recompilation is scheduled. Returns whether it was compiled."""
+        with self.compile_lock:
+            if not self.pending.is_set():
+                return False
+            self.pending.clear()
+            if settings.QUESTION_BANK_PATH:
+                compile_question_bank()
+            return True
+
+
+background_compiler = BackgroundCompiler()
+
+
+def recompile_question_bank(sender, **kwargs):
+    """Schedules the recompilation of the bank after the transaction of the change is committed."""
+    if settings.QUESTION_BANK_PATH:
+        transaction.on_commit(background_compiler.request, using=kwargs.get('using'))
+
+
+def connect_recompilation(*models):
+    """Recompiles the bank whenever the objects of the models are saved, deleted, soft deleted or restored."""
+    for model in models:
+        post_save.connect(recompile_question_bank, sender=model,
+                          dispatch_uid=f'question_bank_{model._meta.label}')
+        post_delete.connect(recompile_question_bank, sender=model,
+                            dispatch_uid=f'question_bank_delete_{model._meta.label}')
+        active_changed.connect(recompile_question_bank, sender=model,
+                               dispatch_uid=f'question_bank_active_{model._meta.label}')
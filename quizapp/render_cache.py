@@ -0,0 +1,105 @@
+"""
+Versioned render cache for page fragments (see the ``render_cache`` template tag).
+
+The key of a fragment contains the generations of the models it is built from.
+Saving or deleting an object of such a model replaces the model generation (``bump_generation``),
+so all the fragments built from the model are invalidated at once without searching for their keys
+(a bulk soft delete or restore of the objects does it once, with the ``active_changed`` signal).
+The generations are kept in the same (shared between processes) cache as the fragments.
+
+While one request renders a missing fragment, the other requests wait for it
+for up to LOCK_WAIT seconds instead of rendering it at the same time.
+"""
+import hashlib
+import time
+
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+
+from quizapp.models import active_changed
+
+RENDER_CACHE_ALIAS = 'render'
+
+#: the time (in seconds) the fragment lock is held at most
+LOCK_TIMEOUT = 10
+
+#: the time (in seconds) a request waits for the fragment rendered by another request
+LOCK_WAIT = 2
+
+
+def render_cache():
+    """Returns the cache used for the fragments and the model generations."""
+    return caches[RENDER_CACHE_ALIAS]
+
+
+def generation_key(label):
+    """Returns the cache key of the model generation."""
+    return f'generation:{label}'
+
+
+def bump_generation(label):
+    """Replaces the generation of the model (given by its label, e.g. ``cards_app.Card``).
+    A new unique value is used, so the generation can not return to an old value
+    even if the counter is evicted from the cache."""
+    render_cache().set(generation_key(label), time.time_ns(), None)
+
+
+def get_generations(labels):
+    """Returns the generations of the models in the order of the labels."""
+    cache = render_cache()
+    keys = [generation_key(label) for label in labels]
+    generations = cache.get_many(keys)
+    for label, key in zip(labels, keys):
+        if key not in generations:
+            cache.add(key, time.time_ns(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def fragment_key(name, labels, vary_on):
+    """Returns the cache key of the fragment (the values it varies on are hashed,
+    so the key is short and safe for any cache backend)."""
+    generations = '.'.join(str(generation) for generation in get_generations(labels))
+    vary_on_hash = hashlib.md5(repr(list(vary_on)).encode(), usedforsecurity=False).hexdigest()
+    return ':'.join(['fragment', name, generations, vary_on_hash])
+
+
+def get_or_render(key, render, timeout=None):
+    """Returns the cached fragment or renders, caches and returns it.
+    Only one request renders a missing fragment, the others wait for the result."""
+    cache = render_cache()
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = render()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return render()
+
+
+def invalidate_model_fragments(sender, **kwargs):
+    """Signal receiver: bumps the generation of the saved, deleted or (de)activated objects model."""
+    bump_generation(sender._meta.label)
+
+
+def connect_invalidation(*models):
+    """Bumps the generations of the models whenever their objects are saved or deleted."""
+    for model in models:
+        post_save.connect(invalidate_model_fragments, sender=model, dispatch_uid=f'render_cache_{model._meta.label}')
+        post_delete.connect(invalidate_model_fragments, sender=model,
+                            dispatch_uid=f'render_cache_delete_{model._meta.label}')
+        active_changed.connect(invalidate_model_fragments, sender=model,
+                               dispatch_uid=f'render_cache_active_{model._meta.label}')
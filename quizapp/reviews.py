@@ -0,0 +1,101 @@
+"""
+Spaced repetition of the answered questions (a simplified SM-2 schedule per user and question).
+
+Every graded answer is kept in the session of the user (no database access on the answer request).
+The grades are written in one batch (``flush_grades``: one select of the schedules of the answered
+questions, one ``bulk_update`` and one ``bulk_create``) when a test or a review batch is finished
+and before the next review batch is fetched. The next batch is one range scan of the
+(user, due_at) index: the questions with ``due_at <= now`` in the order of their due time.
+"""
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from quizapp.models import Question, ReviewItem
+
+#: the lowest ease factor of a question
+MIN_EASE = 1.3
+
+SCHEDULE_FIELDS = ('due_at', 'interval', 'ease', 'repetitions', 'lapses', 'last_review_time')
+
+
+def schedule(item, correct, now):
+    """Moves the review item to its next due time after the answer.
+
+    A right answer increases the interval (1 day, 6 days, then the previous interval multiplied
+    by the ease factor), a wrong one lowers the ease and asks the question again
+    in REVIEW_RELEARN_DELAY minutes.
+
+    Args:
+
+        * item(ReviewItem): the schedule of the question for the user;
+        * correct(bool): whether the answer is right;
+        * now(datetime): the time of the answer;
+
+    """
+    if correct:
+        item.repetitions += 1
+        if item.repetitions == 1:
+            item.interval = 1
+        elif item.repetitions == 2:
+            item.interval = 6
+        else:
+            item.interval = round(item.interval * item.ease, 2)
+        item.ease += 0.1
+        item.due_at = now + timedelta(days=item.interval)
+    else:
+        item.repetitions = 0
+        item.lapses += 1
+        item.interval = 0
+        item.ease = max(MIN_EASE, item.ease - 0.2)
+        item.due_at = now + timedelta(minutes=settings.REVIEW_RELEARN_DELAY)
+    item.last_review_time = now
+
+
+def record_grade(session, question_id, correct):
+    """Keeps the grade of the answer in the session until the next ``flush_grades``."""
+    session.setdefault('review_grades', {})[str(question_id)] = correct
+    session.modified = True
+
+
+def flush_grades(session, user):
+    """Writes the grades kept in the session to the review schedules of the user.
+    Returns the number of the graded questions."""
+    grades = session.pop('review_grades', None)
+    if not grades:
+        return 0
+    now = timezone.now()
+    grades = {int(question_id): correct for question_id, correct in grades.items()}
+    with transaction.atomic():
+        items = list(ReviewItem.objects.filter(user=user, question_id__in=grades))
+        known_ids = {item.question_id for item in items}
+        # the questions deleted in the meantime are skipped
+        new_ids = Question.objects.filter(id__in=grades.keys() - known_ids).values_list('id', flat=True)
+        new_items = [ReviewItem(user=user, question_id=question_id) for question_id in new_ids]
+        for item in items + new_items:
+            schedule(item, grades[item.question_id], now)
+        ReviewItem.objects.bulk_update(items, SCHEDULE_FIELDS)
+        ReviewItem.objects.bulk_create(new_items)
+    return len(grades)
+
+
+def due_question_ids(user, limit, now=None):
+    """Returns the ids of at most ``limit`` questions due for the user, the earliest due first."""
+    return list(due_queryset(user, now).values_list('question_id', flat=True)[:limit])
+
+
+async def adue_question_ids(user, limit, now=None):
+    """Async counterpart of ``due_question_ids``."""
+    queryset = due_queryset(user, now).values_list('question_id', flat=True)[:limit]
+    return [question_id async for question_id in queryset]
+
+
+def due_queryset(user, now=None):
+    """Returns the review items of the user due by ``now`` in the order of the (user, due_at) index."""
+    return ReviewItem.objects.filter(user=user, due_at__lte=now or timezone.now()).order_by('due_at')
+
+
+aflush_grades = sync_to_async(flush_grades)
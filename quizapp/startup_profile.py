@@ -0,0 +1,84 @@
+"""
+Startup time profile (used by the ``profile_startup`` and ``benchmark`` commands).
+
+The startup is measured in a fresh interpreter: ``python -X importtime`` runs ``django.setup()``
+with the ``ready()`` of every app config timed and then loads the URLconf (with all the views),
+as a worker does before its first request. The ``-X importtime`` report is summarized
+by module and by top-level package.
+"""
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+#: the modules that are imported on first use and must not be loaded by the startup
+LAZY_MODULES = ('dateutil.relativedelta', 'pytils.translit')
+
+SETUP_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from django.apps.config import AppConfig
+ready_times = {}
+create = AppConfig.create.__func__
+
+def timed_create(cls, entry):
+    app_config = create(cls, entry)
+    ready = app_config.ready
+
+    def timed_ready():
+        ready_started = time.perf_counter()
+        ready()
+        ready_times[app_config.label] = time.perf_counter() - ready_started
+
+    app_config.ready = timed_ready
+    return app_config
+
+AppConfig.create = classmethod(timed_create)
+import django
+django.setup()
+setup_time = time.perf_counter() - started
+from django.urls import get_resolver
+get_resolver().url_patterns
+json.dump({'setup': setup_time, 'urlconf': time.perf_counter() - started - setup_time, 'ready': ready_times},
+          sys.stdout)
+'''
+
+
+def parse_importtime(lines):
+    """Returns the (module, self seconds, cumulative seconds) tuples of the ``-X importtime`` report."""
+    modules = []
+    for line in lines:
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return modules
+
+
+def measure_startup(settings_module=None):
+    """Runs ``django.setup()`` and loads the URLconf in a fresh interpreter. Returns the dict with the setup
+    and the URLconf loading times, the ``ready()`` times by app label and the import times by module."""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module or os.environ['DJANGO_SETTINGS_MODULE'])
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', SETUP_SCRIPT], cwd=settings.BASE_DIR,
+                             env=env, capture_output=True, text=True, check=True)
+    result = json.loads(process.stdout)
+    result['imports'] = parse_importtime(process.stderr.splitlines())
+    return result
+
+
+def summarize_by_package(imports):
+    """Returns the import time of every top-level package (the sum of its modules' own times),
+    the slowest first."""
+    packages = {}
+    for name, self_time, _ in imports:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_time
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+
+def loaded_lazy_modules(imports):
+    """Returns the LAZY_MODULES imported by the startup."""
+    names = {name for name, _, _ in imports}
+    return [name for name in LAZY_MODULES if name in names]
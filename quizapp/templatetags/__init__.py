@@ -0,0 +1 @@
+"""Contains custom template tags."""
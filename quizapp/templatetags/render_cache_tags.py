@@ -0,0 +1,50 @@
+"""
+Contains the ``render_cache`` template tag.
+
+Usage::
+
+    {% load render_cache_tags %}
+    {% render_cache "cards_list" page_obj.number versions="cards_app.Card" %}
+        ...
+    {% endrender_cache %}
+
+The first argument is the fragment name, the following ones are the values the fragment varies on.
+``versions`` lists the labels of the models the fragment is built from: saving or deleting
+their objects invalidates the fragment.
+"""
+from django import template
+
+from quizapp.render_cache import fragment_key, get_or_render
+
+register = template.Library()
+
+
+class RenderCacheNode(template.Node):
+    """Renders the content of the tag or takes it from the render cache."""
+
+    def __init__(self, nodelist, name, vary_on, versions):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+        self.versions = versions
+
+    def render(self, context):
+        labels = self.versions.resolve(context).split() if self.versions else []
+        vary_on = [str(value.resolve(context)) for value in self.vary_on]
+        key = fragment_key(str(self.name.resolve(context)), labels, vary_on)
+        return get_or_render(key, lambda: self.nodelist.render(context))
+
+
+@register.tag('render_cache')
+def do_render_cache(parser, token):
+    """Parses the ``render_cache`` tag."""
+    bits = token.split_contents()[1:]
+    if not bits:
+        raise template.TemplateSyntaxError("'render_cache' tag requires the fragment name.")
+    versions = None
+    if bits[-1].startswith('versions='):
+        versions = parser.compile_filter(bits.pop()[len('versions='):])
+    nodelist = parser.parse(('endrender_cache',))
+    parser.delete_first_token()
+    return RenderCacheNode(nodelist, parser.compile_filter(bits[0]),
+                           [parser.compile_filter(bit) for bit in bits[1:]], versions)
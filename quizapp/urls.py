@@ -7,12 +7,19 @@ Attributes:
                          when using the urls specified in the list.
 """
 
+from django.conf import settings
 from django.urls import path
 
-from quizapp.views import TestProcessView, AnswerQuestion
+from quizapp.views import TestProcessView, AnswerQuestion, AsyncTestProcessView, AsyncAnswerQuestion, ReviewView, \
+    AsyncReviewView
+
+test_process_view = AsyncTestProcessView if settings.ASYNC_VIEWS else TestProcessView
+answer_question_view = AsyncAnswerQuestion if settings.ASYNC_VIEWS else AnswerQuestion
+review_view = AsyncReviewView if settings.ASYNC_VIEWS else ReviewView
 
 app_name = 'questions'
 urlpatterns = [
-    path('test_body/<slug:slug>/', TestProcessView.as_view(), name='test_body'),
-    path('answers/<int:question_id>/', AnswerQuestion.as_view(), name='answers'),
+    path('test_body/<slug:slug>/', test_process_view.as_view(), name='test_body'),
+    path('answers/<int:question_id>/', answer_question_view.as_view(), name='answers'),
+    path('review/', review_view.as_view(), name='review'),
 ]
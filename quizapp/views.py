@@ -1,13 +1,149 @@
 import re
 
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404
-from django.views.generic import ListView, DetailView
+from django.template.response import TemplateResponse
+from django.views.generic import ListView, DetailView, TemplateView
 
-from quizapp.mixins import TitleMixin, AuthorizedOnlyDispatchMixin
-from quizapp.models import QuestionSet, Question
+from quizapp import answer_stats, question_bank, reviews
+from quizapp.mixins import TitleMixin, AuthorizedOnlyDispatchMixin, ReadReplicaMixin, AsyncAuthorizedOnlyDispatchMixin, \
+    AsyncListMixin, AsyncReadReplicaMixin, aload_session
+from quizapp.models import QuestionSet, Question, QuestionSetMembership
 
 
-class MainPageView(ListView, TitleMixin):
+REVIEW_TITLE = 'Повторение вопросов'
+
+
+def start_test(session, question_set, id_list):
+    """Stores the starting context of the test with the ids of its questions in the session
+    (the ids are in the order of their positions in the set, the first is asked first)."""
+    session['context'] = {
+        'title': f'{question_set.title}',
+        'counter': 0,
+        'quantity': len(id_list),
+        'right_ans': 0,
+        'wrong_ans': 0,
+        'percent_right': 0,
+        'question_set_slug': question_set.slug,
+        'question_set': id_list[::-1],
+        'review': False,
+    }
+
+
+def bank_question_set(slug):
+    """Returns the active question set with the ids of its questions from the compiled question bank
+    (None if the bank is not available or has no such set)."""
+    bank = question_bank.get_question_bank()
+    return bank.question_set(slug) if bank else None
+
+
+def load_question(question_id):
+    """Returns the question from the compiled question bank or, if it is not there, from the database."""
+    bank = question_bank.get_question_bank()
+    question = bank.question(question_id) if bank else None
+    return question or Question.objects.get(id=question_id)
+
+
+async def aload_question(question_id):
+    """Async counterpart of ``load_question`` (the bank is read without the database)."""
+    bank = question_bank.get_question_bank()
+    question = bank.question(question_id) if bank else None
+    return question or await Question.objects.aget(id=question_id)
+
+
+def start_review(session, id_list):
+    """Stores the starting context of the review of the due questions in the session
+    (the ids are in the order of their due time, the earliest is asked first)."""
+    session['context'] = {
+        'title': REVIEW_TITLE,
+        'counter': 0,
+        'quantity': len(id_list),
+        'right_ans': 0,
+        'wrong_ans': 0,
+        'percent_right': 0,
+        'question_set_slug': None,
+        'question_set': id_list[::-1],
+        'review': True,
+    }
+
+
+def in_review(session):
+    """Checks whether the test stored in the session is a review of the due questions."""
+    return session.get('context', {}).get('review', False)
+
+
+def next_question(session):
+    """Moves the test stored in the session to the next question.
+    Returns the context for the template and the id of the next question
+    (None when all the questions are answered, the test context is removed from the session then).
+    """
+    context = session['context']
+    id_list = context['question_set']
+    if not id_list:
+        del session['context']
+        return context, None
+    context['counter'] += 1
+    session.modified = True
+    context_current = context.copy()
+    return context_current, id_list.pop()
+
+
+def check_answer(session, question, chosen_answers):
+    """Checks the correctness of the answer and updates the number of correct and
+    incorrect answers stored in the session, the answer statistics of the question
+    and the review grades of the user.
+    Returns the context for the template.
+
+    Args:
+
+        * session: the session of the user passing the test;
+        * question(Question): the answered question (or its ``BankQuestion``);
+        * chosen_answers(list): the texts of the chosen answers;
+
+    """
+    guessed = False
+    right_answers_numbers = re.findall(r'\d+', question.right_answers)
+    right_answers_numbers = [int(item) for item in right_answers_numbers]
+
+    answers_map = {
+        1: question.answer_01,
+        2: question.answer_02,
+        3: question.answer_03,
+        4: question.answer_04,
+    }
+
+    chosen_answers_numbers = [key for key, value in answers_map.items() if value in chosen_answers]
+    right_answers_text = [value for key, value in answers_map.items() if key in right_answers_numbers]
+
+    right_answers_numbers.sort()
+    chosen_answers_numbers.sort()
+
+    if right_answers_numbers == chosen_answers_numbers:
+        guessed = True
+        session['context']['right_ans'] += 1
+
+        quantity = session['context']['quantity']
+        right_ans = session['context']['right_ans']
+        session['context']['percent_right'] = 100 / quantity * right_ans
+    else:
+        session['context']['wrong_ans'] += 1
+    session.modified = True
+    answer_stats.buffer.record(question.id, guessed, chosen_answers_numbers)
+    reviews.record_grade(session, question.id, guessed)
+    return {
+        'title': f'Ответ на вопрос {question.text}',
+        'question_set_title': session['context']['title'],
+        'current_question': question,
+        'chosen_answers': chosen_answers,
+        'right_answers': right_answers_text,
+        'guessed': guessed,
+        'question_set_slug': session['context']['question_set_slug'],
+        'review': session['context'].get('review', False),
+    }
+
+
+class MainPageView(ListView, TitleMixin, ReadReplicaMixin):
     """View for the sets of tests page."""
     model = QuestionSet
     template_name = 'index.html'
@@ -23,7 +159,20 @@ class MainPageView(ListView, TitleMixin):
         """
         if 'context' in self.request.session:
             del self.request.session['context']
-        return QuestionSet.objects.filter(is_active=True).exclude(questions__isnull=True)
+        return QuestionSet.active.exclude(questions__isnull=True)
+
+
+class AsyncMainPageView(AsyncListMixin, ListView, TitleMixin, AsyncReadReplicaMixin):
+    """Async version of ``MainPageView`` (used under ASGI)."""
+    model = QuestionSet
+    template_name = 'index.html'
+    title = MainPageView.title
+    paginate_by = MainPageView.paginate_by
+    get_queryset = MainPageView.get_queryset
+
+    async def aget_queryset(self):
+        await aload_session(self.request)
+        return self.get_queryset()
 
 
 class TestProcessView(DetailView, AuthorizedOnlyDispatchMixin):
@@ -40,34 +189,84 @@ class TestProcessView(DetailView, AuthorizedOnlyDispatchMixin):
         to a new question and updates stored data.
         """
         if 'context' not in request.session:
-            question_set = get_object_or_404(QuestionSet, slug=self.kwargs.get('slug'))
-            id_list = [question.id for question in question_set.questions.all()]
-            context = {
-                'title': f'{question_set.title}',
-                'counter': 0,
-                'quantity': len(id_list),
-                'right_ans': 0,
-                'wrong_ans': 0,
-                'percent_right': 0,
-                'question_set_slug': question_set.slug,
-            }
-            request.session['context'] = context
-
-        else:
-            context = request.session['context']
-            id_list = context['question_set']
-
-        if len(id_list) > 0:
-            request.session['context']['question_set'] = id_list
-            request.session['context']['counter'] += 1
-            request.session.modified = True
-            context_current = context.copy()
-            context_current['current_question'] = Question.objects.get(id=id_list.pop())
-            return render(request, 'test_body.html', context=context_current)
-        else:
-            del request.session['context']
-            context['current_question'] = 'Stop'
-            return render(request, 'test_body.html', context=context)
+            question_set = bank_question_set(self.kwargs.get('slug'))
+            if question_set is None:
+                question_set = get_object_or_404(QuestionSet, slug=self.kwargs.get('slug'))
+                start_test(request.session, question_set, list(QuestionSetMembership.question_ids(question_set.id)))
+            else:
+                start_test(request.session, question_set, question_set.question_ids)
+
+        context, question_id = next_question(request.session)
+        if question_id is None:
+            reviews.flush_grades(request.session, request.user)
+        context['current_question'] = 'Stop' if question_id is None else load_question(question_id)
+        return render(request, 'test_body.html', context=context)
+
+
+class AsyncTestProcessView(DetailView, AsyncAuthorizedOnlyDispatchMixin):
+    """Async version of ``TestProcessView`` (used under ASGI)."""
+    model = QuestionSet
+    template_name = 'test_body.html'
+
+    async def get(self, request, *args, **kwargs):
+        await aload_session(request)
+        if 'context' not in request.session:
+            question_set = bank_question_set(self.kwargs.get('slug'))
+            if question_set is None:
+                try:
+                    question_set = await QuestionSet.objects.aget(slug=self.kwargs.get('slug'))
+                except QuestionSet.DoesNotExist:
+                    raise Http404('No QuestionSet matches the given query.')
+                start_test(request.session, question_set, [
+                    question_id async for question_id in QuestionSetMembership.question_ids(question_set.id)])
+            else:
+                start_test(request.session, question_set, question_set.question_ids)
+
+        context, question_id = next_question(request.session)
+        if question_id is None:
+            await reviews.aflush_grades(request.session, request.user)
+        context['current_question'] = 'Stop' if question_id is None else await aload_question(question_id)
+        return TemplateResponse(request, 'test_body.html', context=context)
+
+
+class ReviewView(TemplateView, AuthorizedOnlyDispatchMixin):
+    """View for the spaced repetition: consistently gets the questions due for the user
+    in batches of REVIEW_BATCH_SIZE."""
+    template_name = 'test_body.html'
+
+    def get(self, request, *args, **kwargs):
+        """
+        Writes the grades of the previous answers and starts the review of the next batch
+        of the due questions (a test in progress is interrupted).
+        Retrieves the review progress from the session when switching to a new question.
+        """
+        if not in_review(request.session):
+            reviews.flush_grades(request.session, request.user)
+            start_review(request.session, reviews.due_question_ids(request.user, settings.REVIEW_BATCH_SIZE))
+
+        context, question_id = next_question(request.session)
+        if question_id is None:
+            reviews.flush_grades(request.session, request.user)
+        context['current_question'] = 'Stop' if question_id is None else load_question(question_id)
+        return render(request, 'test_body.html', context=context)
+
+
+class AsyncReviewView(TemplateView, AsyncAuthorizedOnlyDispatchMixin):
+    """Async version of ``ReviewView`` (used under ASGI)."""
+    template_name = 'test_body.html'
+
+    async def get(self, request, *args, **kwargs):
+        await aload_session(request)
+        if not in_review(request.session):
+            await reviews.aflush_grades(request.session, request.user)
+            start_review(request.session,
+                         await reviews.adue_question_ids(request.user, settings.REVIEW_BATCH_SIZE))
+
+        context, question_id = next_question(request.session)
+        if question_id is None:
+            await reviews.aflush_grades(request.session, request.user)
+        context['current_question'] = 'Stop' if question_id is None else await aload_question(question_id)
+        return TemplateResponse(request, 'test_body.html', context=context)
 
 
 class AnswerQuestion(DetailView, AuthorizedOnlyDispatchMixin):
@@ -76,54 +275,29 @@ class AnswerQuestion(DetailView, AuthorizedOnlyDispatchMixin):
     model = Question
     template_name = 'answers.html'
 
-    def get(self, request, guessed=False, *args, **kwargs):
+    def get(self, request, *args, **kwargs):
         """Checks the correctness of this answer and the number of his correct and
         incorrect answers stored in the session.
 
         Args:
 
             * request: standard parameter.
-            * guessed(bool): information about whether the question has been guessed;
             * ``*args``: standard parameter.
             * ``**kwargs``: standard parameter.
 
         """
         chosen_answers = list(request.GET.values())[1:]
+        question = load_question(kwargs['question_id'])
+        return render(request, 'answers.html', check_answer(request.session, question, chosen_answers))
 
-        question = Question.objects.get(id=kwargs['question_id'])
-        right_answers_numbers = re.findall(r'\d+', question.right_answers)
-        right_answers_numbers = [int(item) for item in right_answers_numbers]
-
-        answers_map = {
-            1: question.answer_01,
-            2: question.answer_02,
-            3: question.answer_03,
-            4: question.answer_04,
-        }
-
-        chosen_answers_numbers = [key for key, value in answers_map.items() if value in chosen_answers]
-        right_answers_text = [value for key, value in answers_map.items() if key in right_answers_numbers]
-
-        right_answers_numbers.sort()
-        chosen_answers_numbers.sort()
-
-        if right_answers_numbers == chosen_answers_numbers:
-            guessed = True
-            request.session['context']['right_ans'] += 1
-
-            quantity = request.session['context']['quantity']
-            right_ans = request.session['context']['right_ans']
-            request.session['context']['percent_right'] = 100 / quantity * right_ans
-        else:
-            request.session['context']['wrong_ans'] += 1
-        request.session.modified = True
-        context = {
-            'title': f'Ответ на вопрос {question.text}',
-            'question_set_title': request.session['context']['title'],
-            'current_question': question,
-            'chosen_answers': chosen_answers,
-            'right_answers': right_answers_text,
-            'guessed': guessed,
-            'question_set_slug': request.session['context']['question_set_slug'],
-        }
-        return render(request, 'answers.html', context)
+
+class AsyncAnswerQuestion(DetailView, AsyncAuthorizedOnlyDispatchMixin):
+    """Async version of ``AnswerQuestion`` (used under ASGI)."""
+    model = Question
+    template_name = 'answers.html'
+
+    async def get(self, request, *args, **kwargs):
+        await aload_session(request)
+        chosen_answers = list(request.GET.values())[1:]
+        question = await aload_question(kwargs['question_id'])
+        return TemplateResponse(request, 'answers.html', check_answer(request.session, question, chosen_answers))
@@ -1,7 +1,7 @@
 """Provides package integration into the admin panel."""
 
 from django.contrib import admin
-from .models import QuizUser
+from .models import QuizUser, OutboxEmail, LoginThrottle, Broadcast
 
 class QuizUserAdmin(admin.ModelAdmin):
     """A class for working with the QuizUser model in the admin panel."""
@@ -13,4 +13,37 @@ class QuizUserAdmin(admin.ModelAdmin):
     readonly_fields = ('email', 'date_joined',)
 
 
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """A class for viewing the queued transactional emails in the admin panel."""
+    list_display = ('recipient', 'template_name', 'status', 'attempts', 'create_time', 'sent_time')
+    search_fields = ('recipient',)
+    list_filter = ('status', 'template_name',)
+    readonly_fields = ('user', 'recipient', 'from_email', 'subject', 'subject_template_name', 'template_name',
+                       'html_template_name', 'attempts', 'last_error', 'create_time', 'sent_time')
+    fields = (('recipient', 'user'), 'from_email', 'subject', 'subject_template_name',
+              ('template_name', 'html_template_name'), ('status', 'attempts', 'next_attempt_time'),
+              'last_error', ('create_time', 'sent_time'))
+
+
+class LoginThrottleAdmin(admin.ModelAdmin):
+    """A class for viewing (and resetting by deletion) the shared login limits in the admin panel."""
+    list_display = ('key', 'tokens', 'update_time')
+    search_fields = ('key',)
+
+
+class BroadcastAdmin(admin.ModelAdmin):
+    """A class for viewing the broadcasts and their progress in the admin panel."""
+    list_display = ('subject', 'status', 'sent', 'failed', 'create_time', 'finish_time')
+    search_fields = ('subject',)
+    list_filter = ('status',)
+    readonly_fields = ('from_email', 'subject', 'template_name', 'html_template_name', 'context', 'language',
+                       'last_user_id', 'sent', 'failed', 'last_error', 'lease_time', 'create_time', 'finish_time')
+    fields = ('subject', 'from_email', ('template_name', 'html_template_name'), ('context', 'language'),
+              ('status', 'last_user_id', 'lease_time'), ('sent', 'failed'), 'last_error',
+              ('create_time', 'finish_time'))
+
+
 admin.site.register(QuizUser, QuizUserAdmin)
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
+admin.site.register(LoginThrottle, LoginThrottleAdmin)
+admin.site.register(Broadcast, BroadcastAdmin)
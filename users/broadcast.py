@@ -0,0 +1,201 @@
+"""
+Email broadcasts to all the active users (sent by the ``send_broadcasts`` command).
+
+The templates of a broadcast are rendered once, in the language of the broadcast, with
+placeholders (``${username}``, ``${first_name}``, ...) in place of the ``user`` fields; every email
+only substitutes the fields of its recipient. The recipients are streamed with ``.iterator()``
+in the order of their ids, and the emails are sent one by one over one backend connection reused
+for the whole broadcast (an email refused by the server is counted as failed and the rest are sent).
+
+After every chunk of BROADCAST_CHUNK_SIZE emails the id of its last user is saved as the checkpoint
+of the broadcast, so a broadcast interrupted by a crash or a connection error is resumed after the last
+sent chunk (the emails of the chunk being sent at the moment of the crash can be sent twice).
+A sender leases the broadcast with a conditional UPDATE, so a broadcast is sent by one sender at a time;
+the lease of a crashed sender expires after SEND_LEASE.
+"""
+import logging
+from datetime import timedelta
+from smtplib import SMTPException, SMTPServerDisconnected
+from string import Template
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.utils.html import escape
+
+from users.models import Broadcast, QuizUser
+
+logger = logging.getLogger(__name__)
+
+#: the fields of the recipient available to the templates as ``user.<field>``
+USER_FIELDS = ('username', 'first_name', 'last_name', 'email')
+PLACEHOLDERS = {name: f'${{{name}}}' for name in USER_FIELDS}
+
+#: while the broadcast is being sent, it is not given to other senders (renewed after every chunk)
+SEND_LEASE = timedelta(minutes=10)
+
+
+def escape_placeholders(value):
+    """Escapes ``$`` in the strings of the value (``$$``), so that the content is not taken for placeholders."""
+    if isinstance(value, str):
+        return value.replace('$', '$$')
+    if isinstance(value, dict):
+        return {key: escape_placeholders(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [escape_placeholders(item) for item in value]
+    return value
+
+
+def queue_broadcast(subject, template_name, context=None, html_template_name='', from_email=None, language=None):
+    """Creates the broadcast to all the active users. Returns the created Broadcast object.
+
+    Args:
+
+        * subject(str): the subject of the emails (may contain the placeholders of the user fields,
+          a literal ``$`` is written as ``$$``, see ``escape_placeholders``);
+        * template_name(str): the template of the email body;
+        * context(dict): JSON-serializable context of the templates (its ``$`` are escaped when rendered);
+        * html_template_name(str): the template of the html alternative of the email body;
+        * from_email(str): the sender, EMAIL_HOST_USER by default;
+        * language(str): the language the templates are rendered in, LANGUAGE_CODE by default;
+
+    """
+    return Broadcast.objects.create(
+        subject=subject, template_name=template_name, html_template_name=html_template_name,
+        context=context or {}, from_email=from_email or settings.EMAIL_HOST_USER,
+        language=language or settings.LANGUAGE_CODE,
+    )
+
+
+def queue_question_set_broadcast(question_set):
+    """Creates the broadcast about the published question set. Returns the created Broadcast object."""
+    context = {
+        'title': question_set.title,
+        'description': question_set.description,
+        'my_site_name': settings.DOMAIN_NAME,
+        'my_link': f'{settings.DOMAIN_NAME}{reverse("quizapp:test_body", args=[question_set.slug])}',
+    }
+    subject = f'Новый набор тестов «{escape_placeholders(question_set.title)}» на сайте {settings.DOMAIN_NAME}'
+    return queue_broadcast(subject, 'broadcast/question_set.txt', context,
+                           html_template_name='broadcast/question_set.html')
+
+
+class RenderedBroadcast:
+    """The templates of the broadcast rendered once with the placeholders of the user fields.
+
+    Args:
+
+        * broadcast(Broadcast): the rendered broadcast;
+
+    """
+
+    def __init__(self, broadcast):
+        self.broadcast = broadcast
+        # the content of the context is escaped, so only the placeholders of the user fields are substituted
+        context = dict(escape_placeholders(broadcast.context), user=PLACEHOLDERS)
+        with translation.override(broadcast.language):
+            self.body = Template(render_to_string(broadcast.template_name, context))
+            self.html = Template(render_to_string(broadcast.html_template_name, context)) \
+                if broadcast.html_template_name else None
+        # email subject *must not* contain newlines
+        self.subject = Template(''.join(broadcast.subject.splitlines()))
+
+    def message(self, values):
+        """Returns the email (without connection) for the recipient with the values of the user fields."""
+        message = EmailMultiAlternatives(self.subject.safe_substitute(values), self.body.safe_substitute(values),
+                                         self.broadcast.from_email, [values['email']])
+        if self.html is not None:
+            message.attach_alternative(
+                self.html.safe_substitute({name: escape(value) for name, value in values.items()}), 'text/html')
+        return message
+
+
+def recipients(broadcast, chunk_size):
+    """Streams the ids and the field values of the active users after the checkpoint of the broadcast."""
+    queryset = QuizUser.objects.filter(is_active=True).exclude(email='').order_by('id')
+    if broadcast.last_user_id is not None:
+        queryset = queryset.filter(id__gt=broadcast.last_user_id)
+    for user_id, *values in queryset.values_list('id', *USER_FIELDS).iterator(chunk_size=chunk_size):
+        yield user_id, dict(zip(USER_FIELDS, values))
+
+
+def claim_broadcast(broadcast):
+    """Leases the unfinished broadcast to the current sender with a conditional UPDATE.
+    Returns False if it is finished or leased to another sender."""
+    now = timezone.now()
+    claimed = Broadcast.objects.filter(Q(lease_time__isnull=True) | Q(lease_time__lte=now), id=broadcast.id).\
+        exclude(status=Broadcast.DONE).update(status=Broadcast.SENDING, lease_time=now + SEND_LEASE)
+    if claimed:
+        broadcast.refresh_from_db()
+    return bool(claimed)
+
+
+def send_broadcast(broadcast, chunk_size=None):
+    """Sends the broadcast from its checkpoint in chunks over one backend connection.
+    Returns the numbers of the emails sent and failed by this call
+    (None if the broadcast is finished or being sent by another sender).
+    The emails refused by the server are counted as failed; a connection error stops the sending
+    (the broadcast is resumed from the last sent chunk next time).
+    """
+    if not claim_broadcast(broadcast):
+        return None
+    chunk_size = chunk_size or settings.BROADCAST_CHUNK_SIZE
+    rendered = RenderedBroadcast(broadcast)
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        chunk = []
+        for user_id, values in recipients(broadcast, chunk_size):
+            chunk.append((user_id, rendered.message(values)))
+            if len(chunk) >= chunk_size:
+                chunk_sent = send_chunk(broadcast, connection, chunk)
+                sent, failed, chunk = sent + chunk_sent, failed + len(chunk) - chunk_sent, []
+        if chunk:
+            chunk_sent = send_chunk(broadcast, connection, chunk)
+            sent, failed = sent + chunk_sent, failed + len(chunk) - chunk_sent
+    except Exception as err:
+        broadcast.last_error = f'{type(err).__name__}: {err}'
+        broadcast.lease_time = None
+        broadcast.save(update_fields=['last_error', 'lease_time'])
+        logger.error('Broadcast %s was interrupted after %s emails, it will be resumed: %s', broadcast.id,
+                     broadcast.sent + broadcast.failed, broadcast.last_error)
+        raise
+    finally:
+        connection.close()
+
+    broadcast.status = Broadcast.DONE
+    broadcast.finish_time = timezone.now()
+    broadcast.lease_time = None
+    broadcast.save(update_fields=['status', 'finish_time', 'lease_time'])
+    return sent, failed
+
+
+def send_chunk(broadcast, connection, chunk):
+    """Sends the emails of the chunk of (user id, email) pairs one by one, then moves the checkpoint
+    of the broadcast past the chunk and renews its lease. Returns the number of sent emails."""
+    chunk_sent = 0
+    for _, message in chunk:
+        try:
+            chunk_sent += connection.send_messages([message]) or 0
+        except SMTPServerDisconnected:
+            raise
+        except SMTPException as err:
+            # the email is refused (e.g. the recipient), the rest of the chunk is sent
+            broadcast.last_error = f'{type(err).__name__}: {err}'
+            logger.warning('Broadcast %s email to %s was not sent: %s', broadcast.id, message.to[0],
+                           broadcast.last_error)
+    broadcast.last_user_id = chunk[-1][0]
+    broadcast.sent += chunk_sent
+    broadcast.failed += len(chunk) - chunk_sent
+    broadcast.lease_time = timezone.now() + SEND_LEASE
+    broadcast.save(update_fields=['last_user_id', 'sent', 'failed', 'last_error', 'lease_time'])
+    return chunk_sent
+
+
+def unfinished_broadcasts():
+    """Returns the queued and the interrupted broadcasts, the oldest first."""
+    return Broadcast.objects.exclude(status=Broadcast.DONE).order_by('create_time')
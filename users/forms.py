@@ -13,6 +13,7 @@ from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
 from users.models import QuizUser
+from users.outbox import queue_email
 
 logger = logging.getLogger(__name__)
 
@@ -174,3 +175,16 @@ class UserPasswordResetForm(PasswordResetForm):
             msg = ValidationError(self.error_messages['invalid_email'], code='invalid_email')
             self.add_error('email', msg)
         return email
+
+    def send_mail(self, subject_template_name, email_template_name, context, from_email, to_email,
+                  html_email_template_name=None):
+        """Puts the password recovery email into the outbox instead of sending it during the request.
+        The user object is not serializable, so it is passed to the outbox separately;
+        the uid and the token of the link are not stored, they are generated when the email is sent."""
+        context = dict(context)
+        user = context.pop('user', None)
+        context.pop('uid', None)
+        context.pop('token', None)
+        queue_email(to_email, email_template_name, context, subject_template_name=subject_template_name,
+                    html_template_name=html_email_template_name or '', from_email=from_email, user=user,
+                    secret_context='password_reset')
@@ -0,0 +1 @@
+"""Contains custom commands for easy launch by manage.py."""
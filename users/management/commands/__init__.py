@@ -0,0 +1 @@
+"""Contains custom commands for easy launch by manage.py."""
\ No newline at end of file
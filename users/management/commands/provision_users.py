@@ -0,0 +1,50 @@
+"""Contains custom commands for easy launch by manage.py."""
+import itertools
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from users.provisioning import CSV_FIELDS, ProvisioningError, UserProvisioner, read_users
+
+
+class Command(BaseCommand):
+    """A command for the bulk creation of active users from a CSV file.
+    The passwords are hashed in a process pool, the users are inserted in chunks."""
+    help = f'Creates active users from a CSV file with the columns {", ".join(CSV_FIELDS)}.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file',
+                            help='The CSV file with the header line (username and email are required).')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='The number of users inserted at once.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='The number of password hashing processes (the number of cores by default).')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='The database to create the users in.')
+
+    def handle(self, *args, **options):
+        created = chunks = 0
+        started = time.monotonic()
+        with open(options['csv_file'], newline='', encoding='utf-8-sig') as file, \
+                UserProvisioner(workers=options['workers'], using=options['database']) as provisioner:
+            rows = read_users(file)
+            try:
+                while chunk := list(itertools.islice(rows, options['chunk_size'])):
+                    chunk_started = time.monotonic()
+                    chunk_created = provisioner.provision(chunk)
+                    created += chunk_created
+                    chunks += 1
+                    elapsed = time.monotonic() - chunk_started
+                    self.stdout.write(f'Chunk {chunks}: {chunk_created} users in {elapsed:.3f} s '
+                                      f'({chunk_created / elapsed if elapsed else 0:.0f} users/s)')
+            except ProvisioningError as err:
+                raise CommandError(str(err)) from err
+
+        for line, reason in provisioner.skipped:
+            self.stderr.write(f'Line {line} skipped: {reason}')
+        elapsed = time.monotonic() - started
+        rate = created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f'Users created: {created}, skipped: {len(provisioner.skipped)}, '
+                                             f'{elapsed:.3f} s with {provisioner.workers} hashing processes '
+                                             f'({rate:.0f} users/s)'))
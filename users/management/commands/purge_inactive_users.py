@@ -0,0 +1,77 @@
+"""Contains custom commands for easy launch by manage.py."""
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.models import QuizUser
+
+
+class Command(BaseCommand):
+    """A command for purging the users who never activated their profile before the activation key expired.
+    The users are deleted (or anonymized) in chunks, each chunk in its own short transaction."""
+    help = 'Deletes or anonymizes the never activated users with expired activation keys.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anonymize', action='store_true',
+                            help='Anonymize the users instead of deleting them.')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='The number of users processed in one transaction.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the users that would be purged.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Repeat the purge every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=3600,
+                            help='Seconds between the purges (with --loop).')
+
+    def handle(self, *args, **options):
+        while True:
+            self.purge(options)
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def purge(self, options):
+        """Purges the expired registrations chunk by chunk and reports the counts and timings."""
+        if options['dry_run']:
+            count = QuizUser.expired_registrations().count()
+            self.stdout.write(f'Users to purge: {count}')
+            return
+
+        processed = chunks = 0
+        started = time.monotonic()
+        while True:
+            chunk_started = time.monotonic()
+            with transaction.atomic():
+                ids = list(QuizUser.expired_registrations().values_list('id', flat=True)[:options['chunk_size']])
+                if not ids:
+                    break
+                if options['anonymize']:
+                    self.anonymize(ids)
+                else:
+                    QuizUser.objects.filter(id__in=ids).delete()
+            processed += len(ids)
+            chunks += 1
+            self.stdout.write(f'Chunk {chunks}: {len(ids)} users in {time.monotonic() - chunk_started:.3f} s')
+
+        elapsed = time.monotonic() - started
+        action = 'anonymized' if options['anonymize'] else 'deleted'
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f'Users {action}: {processed} in {chunks} chunks, '
+                                             f'{elapsed:.3f} s ({rate:.0f} users/s)'))
+
+    @staticmethod
+    def anonymize(ids):
+        """Removes the personal data of the users. Anonymized users have no activation key
+        and are not selected by the purge again."""
+        users = list(QuizUser.objects.filter(id__in=ids))
+        unusable_password = make_password(None)
+        for user in users:
+            user.username = f'deleted_{user.id.hex}'
+            user.email = f'{user.id.hex}@deleted.invalid'
+            user.first_name = user.last_name = ''
+            user.password = unusable_password
+            user.activation_key, user.activation_key_created = None, None
+        QuizUser.objects.bulk_update(users, ['username', 'email', 'first_name', 'last_name', 'password',
+                                             'activation_key', 'activation_key_created'])
@@ -0,0 +1,45 @@
+"""Contains custom commands for easy launch by manage.py."""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from quizapp.models import QuestionSet
+from users.broadcast import queue_question_set_broadcast, send_broadcast, unfinished_broadcasts
+
+
+class Command(BaseCommand):
+    """A command for sending the queued broadcasts to all the active users
+    (the interrupted broadcasts are resumed from their checkpoints)."""
+    help = 'Sends the queued and resumes the interrupted email broadcasts to all the active users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--question-set', metavar='SLUG',
+                            help='Queue the broadcast about the published question set first.')
+        parser.add_argument('--chunk-size', type=int, default=settings.BROADCAST_CHUNK_SIZE,
+                            help='The number of emails sent with one send_messages call.')
+
+    def handle(self, *args, **options):
+        if options['question_set']:
+            try:
+                question_set = QuestionSet.active.get(slug=options['question_set'])
+            except QuestionSet.DoesNotExist:
+                raise CommandError(f'No active question set with the slug {options["question_set"]}')
+            queue_question_set_broadcast(question_set)
+
+        for broadcast in unfinished_broadcasts():
+            started = time.monotonic()
+            resumed = broadcast.status == broadcast.SENDING
+            try:
+                result = send_broadcast(broadcast, options['chunk_size'])
+            except Exception as err:
+                raise CommandError(f'Broadcast "{broadcast.subject}" was interrupted, '
+                                   f'run the command again to resume it: {err}') from err
+            if result is None:
+                self.stdout.write(f'Skipped "{broadcast.subject}": it is being sent by another sender')
+                continue
+            sent, failed = result
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'{"Resumed" if resumed else "Sent"} "{broadcast.subject}": sent {sent}, '
+                              f'failed {failed} in {elapsed:.3f} s ({sent / elapsed if elapsed else 0:.0f} emails/s)')
+        self.stdout.write(self.style.SUCCESS('The queued broadcasts are processed'))
@@ -0,0 +1,33 @@
+"""Contains custom commands for easy launch by manage.py."""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.outbox import send_queued_emails
+
+
+class Command(BaseCommand):
+    """A command for sending the queued emails from the outbox in batches."""
+    help = 'Renders and sends the queued emails from the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+                            help='The number of emails sent over one backend connection.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the outbox instead of exiting when it is empty.')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to wait before polling the empty outbox again (with --loop).')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_queued_emails(batch_size=options['batch_size'])
+            total_sent, total_failed = total_sent + sent, total_failed + failed
+            if sent or failed:
+                self.stdout.write(f'Sent: {sent}, failed: {failed}')
+            elif options['loop']:
+                time.sleep(options['interval'])
+            else:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Total sent: {total_sent}, failed: {total_failed}'))
@@ -0,0 +1,45 @@
+# Generated by Django 4.1.4 on 2026-10-19 14:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254, verbose_name='получатель')),
+                ('from_email', models.CharField(max_length=254, verbose_name='отправитель')),
+                ('subject', models.CharField(blank=True, max_length=250, verbose_name='тема')),
+                ('subject_template_name', models.CharField(blank=True, max_length=250, verbose_name='шаблон темы')),
+                ('template_name', models.CharField(max_length=250, verbose_name='шаблон письма')),
+                ('html_template_name', models.CharField(blank=True, max_length=250, verbose_name='html-шаблон письма')),
+                ('context', models.JSONField(blank=True, default=dict, verbose_name='контекст шаблона')),
+                ('status', models.CharField(choices=[('QU', 'в очереди'), ('SE', 'отправлено'), ('FA', 'не отправлено')], default='QU', max_length=2, verbose_name='статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='попыток отправки')),
+                ('last_error', models.TextField(blank=True, verbose_name='последняя ошибка')),
+                ('create_time', models.DateTimeField(default=django.utils.timezone.now, verbose_name='время создания')),
+                ('next_attempt_time', models.DateTimeField(default=django.utils.timezone.now, verbose_name='время следующей попытки')),
+                ('sent_time', models.DateTimeField(blank=True, null=True, verbose_name='время отправки')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'verbose_name': 'Исходящее письмо',
+                'verbose_name_plural': 'Исходящие письма',
+                'ordering': ('-create_time',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboxemail',
+            index=models.Index(fields=['status', 'next_attempt_time'], name='outbox_status_next_attempt_idx'),
+        ),
+    ]
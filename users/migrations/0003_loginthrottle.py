@@ -0,0 +1,27 @@
+# Generated by Django 4.1.4 on 2026-10-19 14:32
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoginThrottle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200, unique=True, verbose_name='ключ')),
+                ('tokens', models.FloatField(verbose_name='доступные попытки')),
+                ('update_time', models.DateTimeField(default=django.utils.timezone.now, verbose_name='время изменения')),
+            ],
+            options={
+                'verbose_name': 'Ограничение попыток входа',
+                'verbose_name_plural': 'Ограничения попыток входа',
+            },
+        ),
+    ]
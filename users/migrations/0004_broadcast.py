@@ -0,0 +1,38 @@
+# Generated by Django 4.1.4 on 2026-10-19 15:07
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_loginthrottle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Broadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_email', models.CharField(max_length=254, verbose_name='отправитель')),
+                ('subject', models.CharField(max_length=250, verbose_name='тема')),
+                ('template_name', models.CharField(max_length=250, verbose_name='шаблон письма')),
+                ('html_template_name', models.CharField(blank=True, max_length=250, verbose_name='html-шаблон письма')),
+                ('context', models.JSONField(blank=True, default=dict, verbose_name='контекст шаблона')),
+                ('language', models.CharField(default='ru-ru', max_length=10, verbose_name='язык')),
+                ('status', models.CharField(choices=[('QU', 'в очереди'), ('SE', 'отправляется'), ('DO', 'отправлена')], default='QU', max_length=2, verbose_name='статус')),
+                ('last_user_id', models.UUIDField(blank=True, null=True, verbose_name='последний получатель')),
+                ('sent', models.PositiveIntegerField(default=0, verbose_name='отправлено')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='не отправлено')),
+                ('last_error', models.TextField(blank=True, verbose_name='последняя ошибка')),
+                ('create_time', models.DateTimeField(default=django.utils.timezone.now, verbose_name='время создания')),
+                ('finish_time', models.DateTimeField(blank=True, null=True, verbose_name='время завершения')),
+            ],
+            options={
+                'verbose_name': 'Рассылка',
+                'verbose_name_plural': 'Рассылки',
+                'ordering': ('create_time',),
+            },
+        ),
+    ]
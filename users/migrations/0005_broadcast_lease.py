@@ -0,0 +1,18 @@
+# Generated by Django 4.1.4 on 2026-10-19 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_broadcast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcast',
+            name='lease_time',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='занята отправителем до'),
+        ),
+    ]
@@ -4,10 +4,14 @@ Stores the user model that is necessary for the interaction of site visitors wit
 from datetime import timedelta
 from uuid import uuid4
 
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils.timezone import now
 
+#: the time during which the user has to activate the profile with the link from the email
+ACTIVATION_KEY_LIFETIME = timedelta(hours=48)
+
 
 class QuizUser(AbstractUser):
     """The model for the user."""
@@ -27,6 +31,117 @@ class QuizUser(AbstractUser):
         """If the user has not managed to activate his profile during this time,
         he will have to register again.
         """
-        if now() <= self.activation_key_created + timedelta(hours=48):
+        if now() <= self.activation_key_created + ACTIVATION_KEY_LIFETIME:
             return False
         return True
+
+    @classmethod
+    def expired_registrations(cls):
+        """Returns a queryset of the never activated users whose activation key has expired."""
+        return cls.objects.filter(is_active=False, last_login__isnull=True,
+                                  activation_key_created__lt=now() - ACTIVATION_KEY_LIFETIME)
+
+
+class OutboxEmail(models.Model):
+    """The model for a queued transactional email.
+    Views only save the template names and the context of the email,
+    the email is rendered and sent by the ``send_outbox`` command.
+    """
+
+    QUEUED = 'QU'
+    SENT = 'SE'
+    FAILED = 'FA'
+
+    #: options for the email status
+    STATUS_CHOICES = (
+        (QUEUED, 'в очереди'),
+        (SENT, 'отправлено'),
+        (FAILED, 'не отправлено'),
+    )
+
+    user = models.ForeignKey(QuizUser, on_delete=models.CASCADE, blank=True, null=True,
+                             verbose_name='пользователь')
+    recipient = models.EmailField(verbose_name='получатель')
+    from_email = models.CharField(max_length=254, verbose_name='отправитель')
+    subject = models.CharField(max_length=250, blank=True, verbose_name='тема')
+    subject_template_name = models.CharField(max_length=250, blank=True, verbose_name='шаблон темы')
+    template_name = models.CharField(max_length=250, verbose_name='шаблон письма')
+    html_template_name = models.CharField(max_length=250, blank=True, verbose_name='html-шаблон письма')
+    context = models.JSONField(default=dict, blank=True, verbose_name='контекст шаблона')
+    status = models.CharField(choices=STATUS_CHOICES, max_length=2, default=QUEUED, verbose_name='статус')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='попыток отправки')
+    last_error = models.TextField(blank=True, verbose_name='последняя ошибка')
+    create_time = models.DateTimeField(default=now, verbose_name='время создания')
+    next_attempt_time = models.DateTimeField(default=now, verbose_name='время следующей попытки')
+    sent_time = models.DateTimeField(blank=True, null=True, verbose_name='время отправки')
+
+    class Meta:
+        """Ordering emails according to their creation time.
+        The index is used by the sender to find the emails ready to be sent."""
+        ordering = ('-create_time',)
+        indexes = [models.Index(fields=['status', 'next_attempt_time'], name='outbox_status_next_attempt_idx')]
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+
+    def __str__(self):
+        """Forms and returns a printable representation of the object."""
+        return f'Письмо для {self.recipient} | {self.get_status_display()}'
+
+
+class LoginThrottle(models.Model):
+    """The model for the shared state of a login attempts token bucket
+    (so that the limits hold across worker processes)."""
+    key = models.CharField(max_length=200, unique=True, verbose_name='ключ')
+    tokens = models.FloatField(verbose_name='доступные попытки')
+    update_time = models.DateTimeField(default=now, verbose_name='время изменения')
+
+    class Meta:
+        verbose_name = 'Ограничение попыток входа'
+        verbose_name_plural = 'Ограничения попыток входа'
+
+    def __str__(self):
+        """Forms and returns a printable representation of the object."""
+        return f'{self.key} | {self.tokens:.1f}'
+
+
+class Broadcast(models.Model):
+    """The model for an email sent to all the active users (see ``users.broadcast``).
+    The templates are rendered once in the language of the broadcast, the users are sent
+    in the order of their ids and the id of the last user of the last sent chunk is the checkpoint
+    the sending is resumed from. While a sender sends the broadcast, it is leased to the sender until lease_time.
+    """
+
+    QUEUED = 'QU'
+    SENDING = 'SE'
+    DONE = 'DO'
+
+    #: options for the broadcast status
+    STATUS_CHOICES = (
+        (QUEUED, 'в очереди'),
+        (SENDING, 'отправляется'),
+        (DONE, 'отправлена'),
+    )
+
+    from_email = models.CharField(max_length=254, verbose_name='отправитель')
+    subject = models.CharField(max_length=250, verbose_name='тема')
+    template_name = models.CharField(max_length=250, verbose_name='шаблон письма')
+    html_template_name = models.CharField(max_length=250, blank=True, verbose_name='html-шаблон письма')
+    context = models.JSONField(default=dict, blank=True, verbose_name='контекст шаблона')
+    language = models.CharField(max_length=10, default=settings.LANGUAGE_CODE, verbose_name='язык')
+    status = models.CharField(choices=STATUS_CHOICES, max_length=2, default=QUEUED, verbose_name='статус')
+    last_user_id = models.UUIDField(blank=True, null=True, verbose_name='последний получатель')
+    sent = models.PositiveIntegerField(default=0, verbose_name='отправлено')
+    failed = models.PositiveIntegerField(default=0, verbose_name='не отправлено')
+    last_error = models.TextField(blank=True, verbose_name='последняя ошибка')
+    lease_time = models.DateTimeField(blank=True, null=True, verbose_name='занята отправителем до')
+    create_time = models.DateTimeField(default=now, verbose_name='время создания')
+    finish_time = models.DateTimeField(blank=True, null=True, verbose_name='время завершения')
+
+    class Meta:
+        ordering = ('create_time',)
+        verbose_name = 'Рассылка'
+        verbose_name_plural = 'Рассылки'
+
+    def __str__(self):
+        """Forms and returns a printable representation of the object."""
+        return f'{self.subject} | {self.get_status_display()}'
@@ -0,0 +1,174 @@
+"""
+Transactional email outbox.
+
+Views put emails into the outbox table (``queue_email``), which takes the mail backend
+out of the request. The ``send_outbox`` command renders the queued emails and sends them
+in batches over one reused backend connection (``send_queued_emails``).
+Failed emails are retried with exponential backoff until the attempts run out.
+
+The links with secrets (password reset tokens, activation keys) are not stored in the outbox:
+the email only names its secret context (``SECRET_CONTEXTS``), which is built for the user at send time.
+The context of an email is cleared once it is sent or failed.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from users.models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+#: while the batch is being sent, its emails are not given to other senders
+SEND_LEASE = timedelta(minutes=10)
+
+
+def password_reset_context(user):
+    """Returns the uid and the token of the password reset link of the user."""
+    return {'uid': urlsafe_base64_encode(force_bytes(user.pk)), 'token': default_token_generator.make_token(user)}
+
+
+def activation_context(user):
+    """Returns the activation link of the user."""
+    return {'my_link': f'{settings.DOMAIN_NAME}{reverse("users:verify", args=[user.email, user.activation_key])}'}
+
+
+#: the builders of the secret parts of the context, called with the recipient user when the email is rendered
+SECRET_CONTEXTS = {
+    'password_reset': password_reset_context,
+    'activation': activation_context,
+}
+
+
+def queue_email(recipient, template_name, context=None, subject='', subject_template_name='',
+                html_template_name='', from_email=None, user=None, secret_context=''):
+    """Puts the email into the outbox. Returns the created OutboxEmail object.
+
+    Args:
+
+        * recipient(str): the email address of the recipient;
+        * template_name(str): the template of the email body;
+        * context(dict): JSON-serializable context of the templates;
+        * subject(str): the subject of the email (if subject_template_name is not specified);
+        * subject_template_name(str): the template of the email subject;
+        * html_template_name(str): the template of the html alternative of the email body;
+        * from_email(str): the sender, EMAIL_HOST_USER by default;
+        * user(QuizUser): the recipient user, passed to the templates as ``user``;
+        * secret_context(str): the name of the secret context built for the user at send time
+          (see ``SECRET_CONTEXTS``), the context itself must not contain secrets;
+
+    """
+    context = dict(context or {})
+    if secret_context:
+        if secret_context not in SECRET_CONTEXTS or user is None:
+            raise ValueError(f'Unknown secret context {secret_context!r} or no user to build it for')
+        context['secret_context'] = secret_context
+    return OutboxEmail.objects.create(
+        user=user, recipient=recipient, from_email=from_email or settings.EMAIL_HOST_USER,
+        subject=subject, subject_template_name=subject_template_name, template_name=template_name,
+        html_template_name=html_template_name, context=context,
+    )
+
+
+def render_email(outbox_email):
+    """Renders the queued email. Returns an EmailMultiAlternatives object (without connection)."""
+    context = dict(outbox_email.context)
+    if outbox_email.user_id:
+        context['user'] = outbox_email.user
+    secret_context = context.pop('secret_context', '')
+    if secret_context:
+        context.update(SECRET_CONTEXTS[secret_context](outbox_email.user))
+    if outbox_email.subject_template_name:
+        subject = render_to_string(outbox_email.subject_template_name, context)
+    else:
+        subject = outbox_email.subject
+    # email subject *must not* contain newlines
+    subject = ''.join(subject.splitlines())
+    body = render_to_string(outbox_email.template_name, context)
+
+    message = EmailMultiAlternatives(subject, body, outbox_email.from_email, [outbox_email.recipient])
+    if outbox_email.html_template_name:
+        message.attach_alternative(render_to_string(outbox_email.html_template_name, context), 'text/html')
+    return message
+
+
+def retry_delay(attempts):
+    """Returns the delay before the next attempt (doubles with every failed attempt)."""
+    return timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim_batch(batch_size):
+    """Selects the queued emails that are due and leases them to the current sender."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(OutboxEmail.objects.select_for_update(skip_locked=True).select_related('user').
+                     filter(status=OutboxEmail.QUEUED, next_attempt_time__lte=now).
+                     order_by('next_attempt_time')[:batch_size])
+        OutboxEmail.objects.filter(id__in=[item.id for item in batch]).update(next_attempt_time=now + SEND_LEASE)
+    return batch
+
+
+def register_failure(outbox_email, err, max_attempts):
+    """Records the failed attempt: schedules the next attempt or marks the email as failed."""
+    outbox_email.attempts += 1
+    outbox_email.last_error = f'{type(err).__name__}: {err}'
+    if outbox_email.attempts >= max_attempts:
+        outbox_email.status = OutboxEmail.FAILED
+        outbox_email.context = {}
+        logger.error('Email %s to %s was not sent after %s attempts: %s', outbox_email.id,
+                     outbox_email.recipient, outbox_email.attempts, outbox_email.last_error)
+    else:
+        outbox_email.next_attempt_time = timezone.now() + retry_delay(outbox_email.attempts)
+        logger.warning('Email %s to %s was not sent, it will be retried: %s', outbox_email.id,
+                       outbox_email.recipient, outbox_email.last_error)
+
+
+def send_queued_emails(batch_size=None, max_attempts=None):
+    """Renders and sends one batch of the queued emails over one backend connection.
+    Returns a tuple of the numbers of sent and failed emails.
+    """
+    batch = claim_batch(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not batch:
+        return 0, 0
+    max_attempts = max_attempts or settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as err:
+        logger.error('Failed to open the mail backend connection: %s', err)
+        for outbox_email in batch:
+            register_failure(outbox_email, err, max_attempts)
+        failed = len(batch)
+    else:
+        try:
+            for outbox_email in batch:
+                try:
+                    message = render_email(outbox_email)
+                    message.connection = connection
+                    message.send()
+                except Exception as err:
+                    failed += 1
+                    register_failure(outbox_email, err, max_attempts)
+                else:
+                    sent += 1
+                    outbox_email.attempts += 1
+                    outbox_email.status = OutboxEmail.SENT
+                    outbox_email.context = {}
+                    outbox_email.sent_time = timezone.now()
+                    outbox_email.last_error = ''
+        finally:
+            connection.close()
+
+    OutboxEmail.objects.bulk_update(batch, ['status', 'attempts', 'last_error', 'next_attempt_time', 'sent_time',
+                                            'context'])
+    return sent, failed
@@ -0,0 +1,134 @@
+"""
+Bulk provisioning of the users from a CSV file (used by the ``provision_users`` command).
+
+The PBKDF2 hashing of the passwords takes most of the time, so the passwords of a chunk of users
+are hashed in a pool of processes (one per core by default). The users of the chunk are checked
+against the existing ones with one query and inserted with one ``bulk_create`` (the UUID keys
+are generated by the application, no key is fetched back). The provisioned users are active
+at once, without the activation email.
+"""
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Q
+
+from users.models import QuizUser
+
+#: the columns of the CSV file (the header line is required), the password may be empty
+#: (the user gets an unusable password and sets it with the password recovery)
+CSV_FIELDS = ('username', 'email', 'password', 'first_name', 'last_name')
+REQUIRED_FIELDS = ('username', 'email')
+
+
+class ProvisioningError(Exception):
+    """The CSV file can not be used for the provisioning."""
+
+
+def read_users(file):
+    """Yields the line numbers and the rows (dicts of CSV_FIELDS) of the CSV file with the users."""
+    reader = csv.DictReader(file)
+    missing = [name for name in REQUIRED_FIELDS if name not in (reader.fieldnames or ())]
+    if missing:
+        raise ProvisioningError(f'The CSV header has no columns: {", ".join(missing)}')
+    for row in reader:
+        yield reader.line_num, {name: (row.get(name) or '').strip() for name in CSV_FIELDS}
+
+
+def hash_password(password):
+    """Returns the hash of the password (an unusable password for an empty one). Run in the pool."""
+    return make_password(password or None)
+
+
+def init_worker():
+    """Sets up Django in a pool process started without a copy of the parent (spawn)."""
+    if not apps.ready:
+        django.setup()
+
+
+class UserProvisioner:
+    """Creates the active users chunk by chunk, the passwords are hashed in a process pool.
+    Used as a context manager (the pool is shut down on exit).
+
+    Args:
+
+        * workers(int): the number of the hashing processes (the number of cores by default);
+        * using(str): the database alias;
+
+    """
+
+    def __init__(self, workers=None, using='default'):
+        self.workers = workers or os.cpu_count() or 1
+        self.using = using
+        self.pool = None
+        self.usernames = set()
+        self.emails = set()
+        self.skipped = []
+
+    def __enter__(self):
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pool.shutdown(cancel_futures=True)
+
+    def check(self, row):
+        """Checks and normalizes the row. Returns the reason to skip it (None for a valid row)."""
+        if not row['username'] or not row['email']:
+            return 'no username or email'
+        for name in CSV_FIELDS:
+            if name != 'password' and len(row[name]) > QuizUser._meta.get_field(name).max_length:
+                return f'{name} is too long'
+        row['username'] = QuizUser.normalize_username(row['username'])
+        row['email'] = QuizUser.objects.normalize_email(row['email'])
+        try:
+            QuizUser.username_validator(row['username'])
+            validate_email(row['email'])
+        except ValidationError as err:
+            return ' '.join(err.messages)
+        if row['username'] in self.usernames or row['email'] in self.emails:
+            return 'duplicate username or email in the file'
+        self.usernames.add(row['username'])
+        self.emails.add(row['email'])
+        return None
+
+    def provision(self, rows):
+        """Creates the users of the chunk of (line number, row) pairs. Returns the number of created users.
+        The invalid rows and the users that already exist are added to ``skipped``."""
+        valid = []
+        for line, row in rows:
+            reason = self.check(row)
+            if reason is None:
+                valid.append((line, row))
+            else:
+                self.skipped.append((line, reason))
+        existing = QuizUser.objects.using(self.using).filter(
+            Q(username__in=[row['username'] for _, row in valid]) | Q(email__in=[row['email'] for _, row in valid])
+        ).values_list('username', 'email')
+        existing_usernames, existing_emails = set(), set()
+        for username, email in existing:
+            existing_usernames.add(username)
+            existing_emails.add(email)
+        new_rows = []
+        for line, row in valid:
+            if row['username'] in existing_usernames or row['email'] in existing_emails:
+                self.skipped.append((line, 'the user already exists'))
+            else:
+                new_rows.append(row)
+        if not new_rows:
+            return 0
+
+        passwords = self.pool.map(hash_password, [row['password'] for row in new_rows],
+                                  chunksize=max(1, len(new_rows) // (self.workers * 4)))
+        users = [QuizUser(username=row['username'], email=row['email'], first_name=row['first_name'],
+                          last_name=row['last_name'], password=password, is_active=True, activation_key=None)
+                 for row, password in zip(new_rows, passwords)]
+        with transaction.atomic(using=self.using):
+            QuizUser.objects.using(self.using).bulk_create(users)
+        return len(users)
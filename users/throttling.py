@@ -0,0 +1,162 @@
+"""
+Login attempts throttling.
+
+Every login attempt consumes a token from the buckets of the entered username
+and of the client IP address. The attempts over the limit are rejected before the password
+is checked, so a burst of credential stuffing does not occupy the workers with password hashing.
+
+Each process keeps in-memory token buckets that reject bursts without any queries.
+The attempts allowed by them are also counted in the shared buckets in the database
+(``LoginThrottle``), so the limits hold across worker processes. A missing shared bucket is full:
+a bucket is created with its first attempt, and the refilled buckets are deleted by the login attempts
+themselves, at most once per PRUNE_INTERVAL seconds in every process (``SharedBucketPruner``).
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from users.models import LoginThrottle
+
+logger = logging.getLogger(__name__)
+
+#: seconds between the deletions of the refilled shared buckets by one process
+PRUNE_INTERVAL = 300
+
+
+class TokenBucket:
+    """In-memory token buckets of one process.
+
+    Args:
+
+        * capacity(int): the maximum number of attempts in a burst;
+        * refill_time(float): seconds to restore one attempt;
+        * max_keys(int): full buckets are dropped when the number of keys exceeds this value;
+
+    """
+
+    def __init__(self, capacity, refill_time, max_keys=10000):
+        self.capacity = capacity
+        self.refill_time = refill_time
+        self.max_keys = max_keys
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def consume(self, key):
+        """Takes a token from the bucket of the key. Returns False if the bucket is empty."""
+        now = time.monotonic()
+        with self.lock:
+            tokens, timestamp = self.buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - timestamp) / self.refill_time)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                return False
+            self.buckets[key] = (tokens - 1, now)
+            if len(self.buckets) > self.max_keys:
+                self.prune(now)
+            return True
+
+    def prune(self, now):
+        """Removes the buckets that have been refilled completely."""
+        full_time = self.capacity * self.refill_time
+        self.buckets = {key: value for key, value in self.buckets.items() if now - value[1] < full_time}
+
+
+def consume_shared(key, capacity, refill_time):
+    """Takes a token from the shared bucket of the key stored in the database.
+    Returns False if the bucket is empty."""
+    now = timezone.now()
+    with transaction.atomic():
+        bucket = LoginThrottle.objects.select_for_update().filter(key=key).first()
+        if bucket is None:
+            try:
+                with transaction.atomic():
+                    # a missing bucket is full, it is created with the token already taken
+                    LoginThrottle.objects.create(key=key, tokens=capacity - 1, update_time=now)
+                return True
+            except IntegrityError:
+                # created by another process meanwhile
+                bucket = LoginThrottle.objects.select_for_update().get(key=key)
+        tokens = min(capacity, bucket.tokens + (now - bucket.update_time).total_seconds() / refill_time)
+        if tokens < 1:
+            return False
+        bucket.tokens, bucket.update_time = tokens - 1, now
+        bucket.save(update_fields=['tokens', 'update_time'])
+    return True
+
+
+def prune_shared_buckets():
+    """Deletes the shared buckets that have been refilled completely (a missing bucket is full).
+    Returns the number of the deleted buckets."""
+    now = timezone.now()
+    refilled = Q()
+    for kind, (capacity, refill_time) in settings.LOGIN_THROTTLE_RATES.items():
+        refilled |= Q(key__startswith=f'{kind}:', update_time__lte=now - timedelta(seconds=capacity * refill_time))
+    if not refilled:
+        return 0
+    deleted, _ = LoginThrottle.objects.filter(refilled).delete()
+    return deleted
+
+
+class SharedBucketPruner:
+    """Deletes the refilled shared buckets at most once per interval in the process.
+
+    Args:
+
+        * interval(float): seconds between the deletions;
+
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def prune_if_due(self):
+        """Deletes the refilled shared buckets if the interval has passed since the last deletion."""
+        now = time.monotonic()
+        with self.lock:
+            if now < self.next_time:
+                return
+            self.next_time = now + self.interval
+        deleted = prune_shared_buckets()
+        if deleted:
+            logger.debug('Refilled shared login limits deleted: %s', deleted)
+
+
+pruner = SharedBucketPruner(PRUNE_INTERVAL)
+
+#: in-memory buckets of the current process for every key type
+local_buckets = {kind: TokenBucket(*rate) for kind, rate in settings.LOGIN_THROTTLE_RATES.items()}
+
+
+def login_attempt_allowed(request):
+    """Checks the limits of login attempts for the entered username and the client IP address.
+    Returns False if the attempt has to be rejected."""
+    try:
+        pruner.prune_if_due()
+    except DatabaseError as err:
+        logger.error('Failed to delete the refilled shared login limits: %s', err)
+    values = {
+        'username': request.POST.get('username', '').strip().lower(),
+        'ip': request.META.get('REMOTE_ADDR', ''),
+    }
+    for kind, value in values.items():
+        if kind not in local_buckets or not value:
+            continue
+        key = f'{kind}:{value[:150]}'
+        if not local_buckets[kind].consume(key):
+            logger.warning('Login attempt rejected by the local limit for %s', key)
+            return False
+        try:
+            if not consume_shared(key, *settings.LOGIN_THROTTLE_RATES[kind]):
+                logger.warning('Login attempt rejected by the shared limit for %s', key)
+                return False
+        except DatabaseError as err:
+            logger.error('Shared login limits are unavailable, only local limits are applied: %s', err)
+    return True
@@ -9,20 +9,19 @@ Here are the views:
 
 """
 import logging
-from smtplib import SMTPAuthenticationError
 
 from django.contrib import auth, messages
 from django.contrib.auth.views import PasswordResetConfirmView, PasswordResetCompleteView, LoginView, LogoutView, \
     PasswordResetView
-from django.core.mail import send_mail
 from django.shortcuts import render, HttpResponseRedirect
-from django.template.loader import render_to_string
 from django.urls import reverse
 from django.views.generic import TemplateView, FormView
 
 from quizapp.views import TitleMixin
 from users.forms import UserLoginForm, UserRegisterForm, UserPasswordResetForm
 from users.models import QuizUser
+from users.outbox import queue_email
+from users.throttling import login_attempt_allowed
 
 logger = logging.getLogger(__name__)
 
@@ -38,15 +37,19 @@ class UserLoginView(LoginView, TitleMixin):
 
     def post(self, request, *args, **kwargs):
         """Performs user authorization. Authorization is performed only for active users
-        (who have verified their profile with a link received by email)."""
+        (who have verified their profile with a link received by email).
+        Attempts over the limit for the username or IP address are rejected before the password is checked."""
+        if not login_attempt_allowed(request):
+            messages.error(request, 'Слишком много попыток входа. Пожалуйста, попробуйте позже.')
+            form = self.form_class(initial={'username': request.POST.get('username', '')})
+            return render(request, 'registration/login.html', context={'form': form, }, status=429)
+
         form = self.form_class(data=request.POST)
         if form.is_valid():
-            user = auth.authenticate(username=request.POST['username'], password=request.POST['password'])
-            if user.is_active:
-                auth.login(request, user)
-                return HttpResponseRedirect(reverse('index'))
-        else:
-            return render(request, 'registration/login.html', context={'form': form, })
+            # the form has already authenticated the user (only active users pass the check)
+            auth.login(request, form.get_user())
+            return HttpResponseRedirect(reverse('index'))
+        return render(request, 'registration/login.html', context={'form': form, })
 
 
 class RegisterView(FormView, TitleMixin):
@@ -63,22 +66,10 @@ class RegisterView(FormView, TitleMixin):
         form = self.form_class(data=request.POST)
         if form.is_valid():
             user = form.save()
-            try:
-                if self.send_verify_link(user):
-                    messages.success(request, 'Для завершения регистрации используйте ссылку из письма, отправленного '
-                                              'на email, указанный при регистрации.')
-
-                else:
-                    msg = f'К сожалению, произошел сбой, письмо для завершения регистрации не было отослано. ' \
-                          f'Для активации вашего профиля напишите письмо на адрес {EMAIL_HOST_USER}'
-                    messages.error(request, msg)
-                return HttpResponseRedirect(reverse('users:register'))
-            except SMTPAuthenticationError:
-                messages.error(request, 'К сожалению, произошел сбой. Пользователь с указанными данными не был'
-                                        'зарегистрирован.')
-                logger.error('SMTPAuthenticationError while user registration')
-                user.delete()
-                return render(request, 'registration/register.html', context={'form': form, })
+            self.send_verify_link(user)
+            messages.success(request, 'Для завершения регистрации используйте ссылку из письма, отправленного '
+                                      'на email, указанный при регистрации.')
+            return HttpResponseRedirect(reverse('users:register'))
         else:
             messages.error(request, 'Убедитесь, что вы ввели корректные данные.')
             logger.warning('Неудачная попытка регистрации пользователя')
@@ -86,23 +77,23 @@ class RegisterView(FormView, TitleMixin):
 
     @staticmethod
     def send_verify_link(user):
-        """Send to user an email with verification link.
+        """Puts an email with verification link into the outbox
+        (it will be sent by the send_outbox command).
 
         Args:
 
             * user(QuizUser): the user object that was created during registration;
 
         """
-        verify_link = reverse('users:verify', args=[user.email, user.activation_key])
         subject = f"Подтверждение регистрации на сайте {DOMAIN_NAME}"
+        # the verification link (my_link) is built when the email is sent, the key is not stored in the outbox
         context = {
             'my_user': user.username,
             'my_site_name': DOMAIN_NAME,
-            'my_link': f'{DOMAIN_NAME}{verify_link}',
         }
-        message = render_to_string('registration/activation_msg.html', context)
-        return send_mail(subject, message, EMAIL_HOST_USER, [user.email],
-                         html_message=message, fail_silently=False)
+        return queue_email(user.email, 'registration/activation_msg.html', context, subject=subject,
+                           html_template_name='registration/activation_msg.html', user=user,
+                           secret_context='activation')
 
 
 class Verify(TemplateView, TitleMixin):
@@ -122,7 +113,7 @@ class Verify(TemplateView, TitleMixin):
                 msg = f'Ваш ключ активации устарел. ' \
                       f'Для активации вашего профиля напишите письмо на адрес {EMAIL_HOST_USER} ' \
                       f'или зарегистрируйте новый профиль, используя другой email.'
-                logger.error(f'Сбой активации нового пользователя - устаревший ключ активации')
+                logger.error('Сбой активации нового пользователя - устаревший ключ активации')
                 return HttpResponseRedirect(reverse('users:failed', kwargs={'error': msg}))
 
             elif user and user.activation_key == kwargs['activation_key']:
@@ -136,7 +127,7 @@ class Verify(TemplateView, TitleMixin):
                 raise ValueError('Несовпадение ключа активации из письма с присвоенным пользователю')
 
         except Exception as e:
-            logger.error(f'Сбой активации нового пользователя - {e}')
+            logger.error('Сбой активации нового пользователя - %s', e)
             msg = f'Сбой активации. Попробуйте использовать ссылку, полученную в письме, повторною. ' \
                   f'В случае неудачи напишите на адрес {EMAIL_HOST_USER}, указав причину обращения.'
             return HttpResponseRedirect(reverse('users:failed', kwargs={'error': msg}))
@@ -169,7 +160,7 @@ class UserPasswordResetView(PasswordResetView, TitleMixin):
     from_email = EMAIL_HOST_USER
 
     def post(self, request, *args, **kwargs):
-        """Generates and sends the user an email with a link to restore the password."""
+        """Generates an email with a link to restore the password and puts it into the outbox."""
         form = self.form_class(data=request.POST)
         if form.is_valid():
             email = request.POST['email']